@@ -0,0 +1,77 @@
+import logging
+from Backend.dbconfig.config import ADMISSION_CONFIG
+from Backend.dbconfig.db_connection import pg_connection_pool, request_priority
+from Backend.executors import pools
+from Backend.metrics import Counter, register_metric
+
+logger = logging.getLogger(__name__)
+
+admission_rejected_total = register_metric(Counter(
+    "admission_rejected_total", "Requests shed with 503 by admission control, by priority.", ("priority",)))
+admission_admitted_total = register_metric(Counter(
+    "admission_admitted_total", "Requests admitted by admission control, by priority.", ("priority",)))
+
+# Executor pools whose tasks hold database connections
+DB_POOLS = ("db_read", "db_write", "export")
+
+
+def priority_for_path(path):
+    return ADMISSION_CONFIG["route_priorities"].get(path, ADMISSION_CONFIG["default_priority"])
+
+
+def queued_db_tasks():
+    return sum(pools[name].queued for name in DB_POOLS)
+
+
+def should_admit(priority):
+    """
+    Decides whether a request of the given priority is accepted now.
+
+    A request is admitted while its class still has free connections beyond the reserve for
+    higher classes. Once it hasn't, it is only admitted if the DB executor queues are shorter than
+    the class's max_queued_tasks. High priority has no limit and is never shed here.
+    """
+    limit = ADMISSION_CONFIG["max_queued_tasks"].get(priority)
+    if limit is None:
+        return True
+    if pg_connection_pool.free_connections() > ADMISSION_CONFIG["reserved_connections"].get(priority, 0):
+        return True
+    return queued_db_tasks() < limit
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware that classifies each request by path into a priority class, makes the class
+    visible to connection checkouts through a context variable, and sheds low-priority work with
+    503 + Retry-After while the database pool is saturated.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_CONFIG["enabled"]:
+            await self.app(scope, receive, send)
+            return
+
+        priority = priority_for_path(scope["path"])
+        if not should_admit(priority):
+            admission_rejected_total.inc(priority)
+            logger.warning(f"Shedding {priority} priority request {scope['method']} {scope['path']}: database pool saturated")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(ADMISSION_CONFIG["retry_after_seconds"]).encode())
+                ]
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server busy, please retry shortly"}'})
+            return
+
+        admission_admitted_total.inc(priority)
+        token = request_priority.set(priority)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_priority.reset(token)
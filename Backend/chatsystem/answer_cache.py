@@ -0,0 +1,177 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from Backend.dbconfig.config import CHAT_ANSWER_CACHE_CONFIG
+from Backend.metrics import Counter, Gauge, register_metric, register_collector
+
+chat_answer_cache_lookups_total = register_metric(Counter(
+    "chat_answer_cache_lookups_total", "Chat answer cache lookups, by outcome (hit, near_hit or miss).", ("outcome",)))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+")
+
+# Words that flip what a question asks for ("which is not ...", "all except ..."); apostrophes are
+# already removed by normalize_question
+_POLARITY_WORDS = frozenset({
+    "not", "no", "never", "none", "nor", "except", "incorrect", "false", "least", "wrong",
+    "isnt", "arent", "doesnt", "dont", "cannot", "cant", "wont", "wasnt", "werent"
+})
+# Words that can differ between rewordings of the same question
+_FUNCTION_WORDS = frozenset({
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "from", "by", "with", "and", "or", "as",
+    "is", "are", "was", "were", "be", "been", "do", "does", "did", "what", "which", "who", "whom",
+    "whose", "why", "how", "when", "where", "this", "that", "these", "those", "it", "its", "there",
+    "following", "given", "please", "tell", "me", "about", "can", "could", "you", "i", "us", "we"
+})
+
+
+def normalize_question(question):
+    """
+    Case, Unicode form, punctuation and whitespace folded, so "What is Bohr's model?" and
+    "what is bohrs model" share a key.
+    """
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _PUNCTUATION.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def history_digest(messages):
+    """
+    Hash of the context an answer depends on: the messages build_messages sends ahead of the
+    new question, i.e. the system prompt with its summary of dropped questions and the kept history.
+    """
+    payload = json.dumps([(message["role"], message["content"]) for message in messages])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def shingles(normalized):
+    size = CHAT_ANSWER_CACHE_CONFIG["shingle_size"]
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + size] for i in range(max(len(padded) - size + 1, 1)))
+
+
+def question_signature(normalized):
+    """
+    What two questions must share to be near duplicates: their numbers in order, their content
+    words and their polarity words. "which is not a greenhouse gas" never matches "which is a
+    greenhouse gas", however similar their shingles are.
+    """
+    words = normalized.split()
+    polarity = frozenset(word for word in words if word in _POLARITY_WORDS)
+    content = frozenset(word for word in words if word not in _FUNCTION_WORDS and word not in _POLARITY_WORDS)
+    return tuple(_NUMBER.findall(normalized)), content, polarity
+
+
+class AnswerCache:
+    """
+    LRU of chat answers with per-entry expiry, keyed by (history digest, normalized question).
+
+    Near-duplicate lookup: every entry's question is indexed by its character shingles. A miss
+    looks at entries with the same history digest that share the query's rarest shingles and
+    takes the best Jaccard similarity at or above the threshold. Only questions with the same
+    question_signature match: the same numbers ("class 11" is not "class 12"), content words and
+    polarity words ("not", "except", ...).
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (expires at, answer, shingles, signature)
+        self._postings = {}             # shingle -> set of keys
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, digest, normalized):
+        """
+        :return: The cached answer and whether it came from a near-duplicate question, or (None, False).
+        """
+        key = (digest, normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                chat_answer_cache_lookups_total.inc("hit")
+                return entry[1], False
+            if entry is not None:
+                self._remove(key)
+
+            if CHAT_ANSWER_CACHE_CONFIG["near_duplicates"]:
+                answer = self._near_duplicate(digest, normalized, now)
+                if answer is not None:
+                    chat_answer_cache_lookups_total.inc("near_hit")
+                    return answer, True
+        chat_answer_cache_lookups_total.inc("miss")
+        return None, False
+
+    def _near_duplicate(self, digest, normalized, now):
+        query = shingles(normalized)
+        if len(query) < CHAT_ANSWER_CACHE_CONFIG["min_shingles"]:
+            return None
+        signature = question_signature(normalized)
+        threshold = CHAT_ANSWER_CACHE_CONFIG["near_duplicate_threshold"]
+        # An entry with Jaccard >= threshold lacks at most (1 - threshold) * |query| of the query's
+        # shingles, so it is in the postings of any one more than that. Taking the rarest ones keeps
+        # the candidate set small when common shingles ("what", " is ") have long lists.
+        needed = int((1 - threshold) * len(query)) + 1
+        rarest = sorted(query, key=lambda shingle: len(self._postings.get(shingle, ())))
+        candidates = set()
+        for shingle in rarest[:needed]:
+            candidates.update(self._postings.get(shingle, ()))
+
+        best_key, best_score = None, threshold
+        for key in candidates:
+            expires_at, _, entry_shingles, entry_signature = self._entries[key]
+            if key[0] != digest or expires_at <= now or entry_signature != signature:
+                continue
+            overlap = len(query & entry_shingles)
+            score = overlap / (len(query) + len(entry_shingles) - overlap)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key][1]
+
+    def put(self, digest, normalized, answer):
+        key = (digest, normalized)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry_shingles = shingles(normalized)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, answer, entry_shingles, question_signature(normalized))
+            for shingle in entry_shingles:
+                self._postings.setdefault(shingle, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, _, entry_shingles, _ = self._entries.pop(key)
+        for shingle in entry_shingles:
+            keys = self._postings.get(shingle)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[shingle]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+
+
+answer_cache = AnswerCache(CHAT_ANSWER_CACHE_CONFIG["max_entries"], CHAT_ANSWER_CACHE_CONFIG["ttl_seconds"])
+
+
+@register_collector
+def _answer_cache_metrics():
+    entries = Gauge("chat_answer_cache_entries", "Answers held in this worker's chat answer cache.")
+    entries.set(value=len(answer_cache))
+    return [entries]
@@ -1,39 +1,175 @@
-import openai
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from Backend.chatsystem.answer_cache import answer_cache, history_digest, normalize_question
+from Backend.chatsystem.history import build_messages, observe_prompt
+from Backend.dbconfig.config import CHAT_CONFIG, CHAT_ANSWER_CACHE_CONFIG
+from Backend.metrics import Counter, Gauge, Histogram, register_metric, register_collector
+from Backend.singleflight import SingleFlight
 
 # Set your OpenAI API key here
-openai.api_key = 'your_openai_api_key'
+OPENAI_API_KEY = 'your_openai_api_key'
 
-def chat_with_neet_instructor(user_input, history=[]):
+NO_ANSWER = "Sorry, I couldn't generate a response. Please try again."
+
+SYSTEM_PROMPT = "You are a helpful assistant acting as a NEET instructor. You are knowledgeable in Physics, Chemistry, Biology, and NEET exam strategies. Your goal is to assist students in preparing for the NEET examination by providing accurate, clear, and helpful answers to their questions. You should stay focused on topics relevant to the NEET syllabus and exam preparation."
+
+chat_requests_total = register_metric(Counter(
+    "chat_requests_total", "Chat requests by mode (json or stream) and outcome.", ("mode", "outcome")))
+chat_upstream_seconds = register_metric(Histogram(
+    "chat_upstream_seconds", "Time from sending a chat request upstream to the first token (stream) or the full answer (json).",
+    ("mode",), buckets=[0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0]))
+
+
+class ChatBusyError(Exception):
+    """
+    Raised when the worker already has CHAT_CONFIG["max_waiting_requests"] chats waiting for an
+    upstream slot, or a chat waited longer than CHAT_CONFIG["queue_timeout_seconds"] for one.
+    """
+
+    def __init__(self):
+        super().__init__("The chat service is busy, please retry shortly")
+
+
+class UpstreamLimiter:
+    """
+    Caps concurrent upstream chat calls per worker. Waiting happens on the event loop, so
+    queued chats hold neither threads nor database connections.
+    """
+
+    def __init__(self, max_concurrent, max_waiting):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = None
+        self._loop = None
+
+    def check_capacity(self):
+        """
+        :raises ChatBusyError: If the wait queue is already full, so callers can answer 503 before streaming.
+        """
+        if self.waiting >= self.max_waiting:
+            raise ChatBusyError()
+
+    @asynccontextmanager
+    async def slot(self, timeout):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # asyncio primitives belong to one event loop; each worker runs one, tests may start several
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+        semaphore = self._semaphore
+        self.check_capacity()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise ChatBusyError() from None
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+
+upstream_limiter = UpstreamLimiter(CHAT_CONFIG["max_concurrent_requests"], CHAT_CONFIG["max_waiting_requests"])
+_answers_in_flight = SingleFlight()
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        # The OpenAI client is heavy to import and only needed by the chat endpoint
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(
+            api_key=CHAT_CONFIG["api_key"] or OPENAI_API_KEY,
+            timeout=CHAT_CONFIG["request_timeout_seconds"],
+            max_retries=CHAT_CONFIG["max_retries"]
+        )
+    return _client
+
+
+def _instructor_messages(user_input, history):
+    # System prompt, the part of the history that fits CHAT_HISTORY_CONFIG, and the new user input
+    return build_messages(SYSTEM_PROMPT, history or [], user_input)
+
+
+async def chat_with_neet_instructor(user_input, history=None):
     """
     Function to interact with OpenAI's ChatGPT model as a NEET instructor.
-    
+
     Parameters:
     - user_input (str): The user's question or message.
-    - history (list): The conversation history formatted as required by OpenAI's API.
-    
+    - history (list): Past messages with 'role' and 'content', oldest first; compacted to the token budget.
+
     Returns:
     - response (str): The assistant's reply.
     """
-    
-    system_prompt = {
-        "role": "system",
-        "content": "You are a helpful assistant acting as a NEET instructor. You are knowledgeable in Physics, Chemistry, Biology, and NEET exam strategies. Your goal is to assist students in preparing for the NEET examination by providing accurate, clear, and helpful answers to their questions. You should stay focused on topics relevant to the NEET syllabus and exam preparation."
-    }
-    
-    # Prepare messages including system prompt, past history, and the new user input
-    messages = [system_prompt] + history + [{"role": "user", "content": user_input}]
-    
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=messages
-    )
-    
+    return await _chat(_instructor_messages(user_input, history))
+
+
+async def _chat(messages):
+    observe_prompt(messages)
+    async with upstream_limiter.slot(CHAT_CONFIG["queue_timeout_seconds"]):
+        started = time.perf_counter()
+        response = await _get_client().chat.completions.create(
+            model=CHAT_CONFIG["model"],
+            messages=messages
+        )
+        chat_upstream_seconds.observe("json", value=time.perf_counter() - started)
+
     # Assuming the response is successful and contains the expected data
-    return response.choices[0].message['content'] if response.choices else "Sorry, I couldn't generate a response. Please try again."
+    return response.choices[0].message.content if response.choices else NO_ANSWER
+
+
+def stream_chat_with_neet_instructor(user_input, history):
+    """
+    Streams the NEET instructor's reply as it is generated.
+
+    Parameters:
+    - user_input (str): The user's question or message.
+    - history (list): Past messages with 'role' and 'content', oldest first; compacted to the token budget.
+
+    Returns:
+    - Async generator of successive fragments of the assistant's reply.
+
+    Closing the generator early (e.g. when the client disconnects) closes the upstream
+    response, which stops generation there and frees the upstream slot.
+    """
+    return _stream(_instructor_messages(user_input, history))
+
 
-def prepare_and_chat_with_neet_instructor(new_question, past_history):
+async def _stream(messages):
+    observe_prompt(messages)
+    async with upstream_limiter.slot(CHAT_CONFIG["queue_timeout_seconds"]):
+        started = time.perf_counter()
+        stream = await _get_client().chat.completions.create(
+            model=CHAT_CONFIG["model"],
+            messages=messages,
+            stream=True
+        )
+        try:
+            first = True
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    if first:
+                        chat_upstream_seconds.observe("stream", value=time.perf_counter() - started)
+                        first = False
+                    yield content
+        finally:
+            await stream.close()
+
+
+async def prepare_and_chat_with_neet_instructor(new_question, past_history):
     """
-    Prepares the chat history in the required format and calls the chat_with_neet_instructor function.
+    Answers from the answer cache, or calls the chat_with_neet_instructor function.
 
     Parameters:
     - new_question (str): The new question from the user.
@@ -42,26 +178,59 @@ def prepare_and_chat_with_neet_instructor(new_question, past_history):
     Returns:
     - str: The response from the NEET instructor.
     """
-    # System message to guide the conversation, only add if starting a new conversation
-    if not past_history:
-        system_message = {
-            "role": "system",
-            "content": "You are a NEET instructor, knowledgeable in Physics, Chemistry, and Biology, focusing on NEET examination preparation. Answer queries based on the NEET syllabus, maintaining relevance and accuracy."
-        }
-        formatted_history = [system_message]
-    else:
-        formatted_history = []
-
-    # Add past history to the formatted history
-    for message in past_history:
-        formatted_history.append({
-            "role": message["role"],
-            "content": message["content"]
-        })
-
-    # Call the NEET instructor chat function with the new question and prepared history
-    response = chat_with_neet_instructor(new_question, formatted_history)
-    return response
+    if not CHAT_ANSWER_CACHE_CONFIG["enabled"]:
+        return await chat_with_neet_instructor(new_question, past_history)
+
+    # Keyed by the compacted history the model is sent, so the key covers everything the answer depends on
+    messages = _instructor_messages(new_question, past_history)
+    digest, normalized = history_digest(messages[:-1]), normalize_question(new_question)
+    response, _ = answer_cache.get(digest, normalized)
+    if response is not None:
+        return response
+
+    async def ask():
+        # Call the NEET instructor chat function with the new question and prepared history
+        response = await _chat(messages)
+        if response and response != NO_ANSWER:
+            answer_cache.put(digest, normalized, response)
+        return response
+
+    # The same question asked again while the first is being answered waits for that answer
+    return await _answers_in_flight.do(("chat_answer", digest, normalized), ask)
+
+
+async def prepare_and_stream_neet_instructor(new_question, past_history):
+    """
+    Like prepare_and_chat_with_neet_instructor, but yields the reply in fragments. A cached
+    answer is yielded whole; a streamed one is cached only once it has been received completely.
+    """
+    if not CHAT_ANSWER_CACHE_CONFIG["enabled"]:
+        async for delta in stream_chat_with_neet_instructor(new_question, past_history):
+            yield delta
+        return
+
+    messages = _instructor_messages(new_question, past_history)
+    digest, normalized = history_digest(messages[:-1]), normalize_question(new_question)
+    response, _ = answer_cache.get(digest, normalized)
+    if response is not None:
+        yield response
+        return
+
+    fragments = []
+    async for delta in _stream(messages):
+        fragments.append(delta)
+        yield delta
+    if fragments:
+        answer_cache.put(digest, normalized, "".join(fragments))
+
+
+@register_collector
+def _chat_metrics():
+    in_flight = Gauge("chat_upstream_in_flight", "Upstream chat calls running in this worker.")
+    in_flight.set(value=upstream_limiter.in_flight)
+    waiting = Gauge("chat_upstream_waiting", "Chats waiting for an upstream slot in this worker.")
+    waiting.set(value=upstream_limiter.waiting)
+    return [in_flight, waiting]
 
 # Example usage
 # past_history = [
@@ -73,5 +242,5 @@ def prepare_and_chat_with_neet_instructor(new_question, past_history):
 # new_question = "Can you explain the process of photosynthesis?"
 
 # # Call the helper function
-# response = prepare_and_chat_with_neet_instructor(new_question, past_history)
+# response = asyncio.run(prepare_and_chat_with_neet_instructor(new_question, past_history))
 # print(response)
@@ -0,0 +1,129 @@
+import math
+from Backend.dbconfig.config import CHAT_CONFIG, CHAT_HISTORY_CONFIG
+from Backend.metrics import Counter, Histogram, register_metric
+
+chat_prompt_tokens = register_metric(Histogram(
+    "chat_prompt_tokens", "Estimated tokens of each prompt sent upstream.",
+    buckets=[250, 500, 1000, 1500, 2000, 3000, 4000, 8000]))
+chat_history_messages_total = register_metric(Counter(
+    "chat_history_messages_total", "Messages of past_history by what happened to them (kept, truncated, dropped or ignored).",
+    ("outcome",)))
+
+_encoding = None
+
+
+def _get_encoding():
+    """
+    Returns the tiktoken encoding of CHAT_CONFIG["model"], or False when the estimate is configured
+    or tiktoken is unavailable. Loaded on first use, since tiktoken may fetch its tables over the network.
+    """
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if CHAT_HISTORY_CONFIG["tokenizer"] == "tiktoken":
+            try:
+                import tiktoken
+                _encoding = tiktoken.encoding_for_model(CHAT_CONFIG["model"])
+            except Exception as e:
+                print(f"tiktoken unavailable, estimating chat tokens instead: {e}")
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Tokens of a message's content: exact with tiktoken, else UTF-8 bytes / bytes_per_token, which
+    over-counts English a little and under-counts scripts such as Devanagari.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return math.ceil(len(text.encode("utf-8")) / CHAT_HISTORY_CONFIG["bytes_per_token"])
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + CHAT_HISTORY_CONFIG["message_overhead_tokens"]
+
+
+def _truncate(text, tokens):
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text)[:tokens])
+    text = text[:tokens * CHAT_HISTORY_CONFIG["bytes_per_token"]]
+    while text and count_tokens(text) > tokens:
+        text = text[:len(text) * tokens // count_tokens(text)]
+    return text
+
+
+def _summary(questions):
+    limit = CHAT_HISTORY_CONFIG["summary_question_chars"]
+    lines = [q if len(q) <= limit else q[:limit].rstrip() + "..." for q in reversed(questions)]
+    return "Earlier in this conversation the student asked:\n" + "\n".join(f"- {line}" for line in lines)
+
+
+def build_messages(system_prompt, past_history, user_input):
+    """
+    Builds the messages for one upstream call within CHAT_HISTORY_CONFIG["max_prompt_tokens"].
+
+    Only non-empty user and assistant messages of past_history are used: the system prompt is the
+    server's, so system messages echoed back by clients are ignored instead of being sent twice. History
+    is kept newest first while it fits; if even the newest message does not, it is truncated. The
+    questions of dropped turns are listed in the system prompt, so follow-ups keep their topic.
+    The walk stops once the budget and summary are full, so the cost does not grow with the session.
+    A question too long to fit with the system prompt alone is truncated and sent without history.
+
+    :param system_prompt: Content of the system message.
+    :param past_history: List of dictionaries with 'role' and 'content', oldest first.
+    :param user_input: The new question.
+    :return: List of messages for the chat completions API.
+    """
+    budget = (CHAT_HISTORY_CONFIG["max_prompt_tokens"] - count_tokens(system_prompt)
+              - 2 * CHAT_HISTORY_CONFIG["message_overhead_tokens"])
+    question_tokens = count_tokens(user_input)
+    if question_tokens > budget:
+        user_input = _truncate(user_input, max(budget, 0))
+        question_tokens = count_tokens(user_input)
+    budget -= question_tokens
+    kept, dropped_questions = [], []
+    summary_questions = CHAT_HISTORY_CONFIG["summary_questions"]
+    full = False
+    counts = {"kept": 0, "truncated": 0, "dropped": 0, "ignored": 0}
+
+    for index in range(len(past_history) - 1, -1, -1):
+        message = past_history[index]
+        if not isinstance(message, dict) or message.get("role") not in ("user", "assistant") or not message.get("content"):
+            counts["ignored"] += 1
+            continue
+        content = str(message["content"])
+        if not full:
+            tokens = count_tokens(content) + CHAT_HISTORY_CONFIG["message_overhead_tokens"]
+            if tokens <= budget:
+                kept.append({"role": message["role"], "content": content})
+                budget -= tokens
+                counts["kept"] += 1
+                continue
+            full = True
+            if not kept and budget > CHAT_HISTORY_CONFIG["message_overhead_tokens"]:
+                kept.append({"role": message["role"],
+                             "content": _truncate(content, budget - CHAT_HISTORY_CONFIG["message_overhead_tokens"])})
+                counts["truncated"] += 1
+                continue
+        if len(dropped_questions) >= summary_questions:
+            counts["dropped"] += index + 1
+            break
+        counts["dropped"] += 1
+        if message["role"] == "user":
+            dropped_questions.append(content)
+
+    for outcome, count in counts.items():
+        if count:
+            chat_history_messages_total.inc(outcome, amount=count)
+
+    if dropped_questions:
+        # The summary is the only part allowed past the budget; it is bounded by the summary settings
+        system_prompt = f"{system_prompt}\n\n{_summary(dropped_questions)}"
+    return [{"role": "system", "content": system_prompt}] + kept[::-1] + [{"role": "user", "content": user_input}]
+
+
+def observe_prompt(messages):
+    # Called for prompts actually sent upstream, not for those answered from the cache
+    chat_prompt_tokens.observe(value=sum(message_tokens(message) for message in messages))
@@ -1,6 +1,9 @@
 import json
+import time
 # from Backend.dbconfig.db_connection import redis_client
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.invalidation import publish
+from Backend.dbconfig.shared_cache import cache_key, cache_get, cache_set, cache_fill, cache_clear, evict_used_questions
 
 # def get_cached_questions(student_id):
 #     """
@@ -35,6 +38,13 @@ from Backend.dbconfig.db_connection import create_pg_connection, release_pg_conn
 
 
 def get_cached_questions(student_id, test_type):
+    # question_cache stays the record; the shared cache tier serves repeat reads
+    key = cache_key("used_questions", student_id, test_type)
+    used_questions = cache_get("used_questions", key)
+    if used_questions is not None:
+        return used_questions
+
+    read_started = time.monotonic()
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return []
@@ -42,17 +52,17 @@ def get_cached_questions(student_id, test_type):
         with conn.cursor() as cur:
             cur.execute("SELECT cached_questions FROM question_cache WHERE student_id = %s AND test_type = %s", (student_id, test_type))
             result = cur.fetchone()
-            if result and result[0]:
-                # Assuming the structure to be a flat list of question IDs
-                return result[0]
-            else:
-                return []
+            # Assuming the structure to be a flat list of question IDs
+            used_questions = result[0] if result and result[0] else []
     except Exception as e:
         print(f"Error retrieving cached questions for student_id {student_id} and test_type {test_type}: {e}")
         return []
     finally:
         release_pg_connection(pg_connection_pool, conn)
 
+    cache_fill("used_questions", key, used_questions, read_started)
+    return used_questions
+
 def cache_questions(student_id, test_type, used_questions):
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
@@ -67,9 +77,13 @@ def cache_questions(student_id, test_type, used_questions):
                 ON CONFLICT (student_id, test_type) DO UPDATE
                 SET cached_questions = EXCLUDED.cached_questions, last_updated = CURRENT_TIMESTAMP
             """, (student_id, test_type, json_used_questions))
+            # Other workers' in-process copies are dropped; a shared cache is written through below
+            publish(cur, "question_cache", student_id)
             conn.commit()
     finally:
         release_pg_connection(pg_connection_pool, conn)
+    # After the release: the postgres backend checks out a connection of its own
+    cache_set("used_questions", cache_key("used_questions", student_id, test_type), used_questions)
 
 
 
@@ -85,10 +99,13 @@ def clear_student_cache(student_id=None, test_type=None):
                 cur.execute("DELETE FROM question_cache WHERE student_id = %s", (student_id,))
             else:
                 cur.execute("DELETE FROM question_cache WHERE student_id = %s AND test_type = %s", (student_id, test_type))
+            # Delivered to every worker's listener once the delete commits
+            publish(cur, "question_cache", student_id)
             conn.commit()
-            return "Cache cleared successfully."
     finally:
         release_pg_connection(pg_connection_pool, conn)
+    evict_used_questions(student_id)
+    return "Cache cleared successfully."
 
 
 
@@ -103,7 +120,7 @@ def delete_all_test_data():
             tables_to_clear = [
                 "PracticeTests", "PracticeTestSubjects", "PracticeTestQuestions",
                 "PracticeTestCompletion", "NEETMockTests", "NEETMockTestQuestions", "StudentMockTestHistory",
-                "testinstances", "StudentResponses", "TestHistory", "ChapterProficiency",
+                "testinstances", "StudentResponses", "StudentResponsesArchive", "TestHistory", "ChapterProficiency",
                 "SubtopicProficiency", "StudentTestTargets", "PracticeTestProficiency",
                 "MockTestProficiency"
             ]
@@ -112,14 +129,18 @@ def delete_all_test_data():
             for table in tables_to_clear:
                 cur.execute(f"TRUNCATE {table} CASCADE")
             print(f"Cleared data from all tables")
+            for namespace in ("test_payload", "analytics"):
+                publish(cur, "shared_cache_namespace", namespace)
 
             # Commit the changes
             conn.commit()
-            return "All test data cleared successfully"
 
     except Exception as e:
         conn.rollback()
         return f"An error occurred: {str(e)}"
     finally:
         if conn:
-            release_pg_connection(pg_connection_pool, conn)
\ No newline at end of file
+            release_pg_connection(pg_connection_pool, conn)
+    for namespace in ("test_payload", "analytics"):
+        cache_clear(namespace)
+    return "All test data cleared successfully"
\ No newline at end of file
@@ -1,14 +1,280 @@
 # config.py
+import os
+
+# DB_* environment variables override the defaults, e.g. to point the API at a local load-test database.
 DB_CONFIG = {
-    "host": "20.244.33.58",
-    "database": "neuflolearndb",
-    "user": "neufloneet",
-    "password": "LearnNEET321",
-    "port": "5432"
+    "host": os.getenv("DB_HOST", "20.244.33.58"),
+    "database": os.getenv("DB_NAME", "neuflolearndb"),
+    "user": os.getenv("DB_USER", "neufloneet"),
+    "password": os.getenv("DB_PASSWORD", "LearnNEET321"),
+    "port": os.getenv("DB_PORT", "5432")
 }
 
 # REDIS_CONFIG = {
 #     "azure_redis_host": "neuflolearnrediscache.redis.cache.windows.net",
 #     "azure_redis_port": 6380,
 #     "azure_redis_password": "xT8WLg2cOiNM3lFCICOipXWPnJNFP5ecKAzCaGrrgPE="
-# }
\ No newline at end of file
+# }
+
+# Mock test leaderboard. Scores are bucketed at 1 / buckets_per_point resolution
+# between min_score and max_score (a full mock test is 200 questions, +4 / -1).
+LEADERBOARD_CONFIG = {
+    "min_score": -200,
+    "max_score": 800,
+    "buckets_per_point": 10,
+    "sync_interval_seconds": 30,    # How often a worker pulls other workers' updates from the table.
+    "sync_overlap_seconds": 300,    # Re-read window to cover transactions that committed late.
+    "max_top_n": 100
+}
+
+# Per-question item statistics (QuestionStatistics table).
+ITEM_STATISTICS_CONFIG = {
+    "difficulty_balanced_selection": False,  # Balance generated tests by observed difficulty.
+    "difficulty_mix": {"easy": 0.3, "medium": 0.4, "hard": 0.3},
+    "easy_correct_rate": 0.7,       # At or above: easy
+    "hard_correct_rate": 0.4,       # At or below: hard
+    "min_answered_for_difficulty": 20,  # Fewer answered attempts than this counts as medium.
+    "selection_oversample": 2,      # Candidate pool size, as a multiple of the questions needed.
+    "backfill_workers": 4,
+    "backfill_chunk_size": 2000     # QuestionIDs per backfill transaction.
+}
+
+# Practice and mock test generation. "python" selects questions in the API process; "database" calls
+# the generate_practice_test / generate_mock_test functions (migrations/0003_test_generation_functions.sql),
+# which select and write a test in one round trip. `python tools/check_generation_parity.py` compares them.
+TEST_GENERATION_CONFIG = {
+    "engine": os.getenv("TEST_GENERATION_ENGINE", "python"),   # "python" or "database"
+    "practice_subjects": {
+        1: {"name": "Physics", "total_questions": 30},
+        2: {"name": "Chemistry", "total_questions": 30},
+        3: {"name": "Biology", "total_questions": 30}
+    },
+    "mock_subject_ids": [1, 2, 3, 4],
+    "mock_section_questions": {"A": 35, "B": 15},
+    "chapter_weightage_cache_seconds": 60,  # In-process MockTestChapterWeightage cache, per subject.
+    "parity_runs": 20,                  # Tests generated per engine by the parity check.
+    "parity_max_chapter_distance": 0.15  # Largest total variation distance between the engines' chapter shares.
+}
+
+# In-process Chapters/Subtopics catalog cache, invalidated by CatalogVersion.
+CATALOG_CONFIG = {
+    "version_check_seconds": 30,        # Max age of the cached version before re-checking the database.
+    "chapter_names_max_age": 300,       # Cache-Control max-age for /get-chapter-names/.
+}
+
+# Cross-worker cache invalidation over PostgreSQL LISTEN/NOTIFY (Backend/dbconfig/invalidation.py).
+# Content triggers and writers notify; every worker listens on a dedicated connection.
+INVALIDATION_CONFIG = {
+    "enabled": True,
+    "poll_seconds": 5,              # Listener wake-up interval; an idle session is checked with SELECT 1.
+    "reconnect_seconds": 5,
+    "startup_wait_seconds": 5,      # How long a starting worker waits for LISTEN before loading its caches.
+    "listening_ttl_seconds": 3600   # Re-check interval of invalidated caches while the listener is connected.
+}
+
+# Cache tier in front of the database for the used-question history (question_cache), test question
+# payloads and analytics rollups (Backend/dbconfig/shared_cache.py). "local" is an in-process LRU per worker;
+# "redis" and "postgres" (UNLOGGED SharedCache table) are shared by all workers; "fakeredis" is an
+# in-memory Redis for tests and local runs (needs `pip install fakeredis`). Backend errors are served as misses.
+SHARED_CACHE_CONFIG = {
+    "enabled": True,
+    "backend": os.getenv("SHARED_CACHE_BACKEND", "local"),   # "local", "redis", "postgres" or "fakeredis"
+    "redis_url": os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    "redis_socket_timeout": 0.25,
+    "key_prefix": "neet:",              # Redis only
+    "local_max_entries": 20000,
+    "ttl_seconds": {
+        "used_questions": 86400,        # Written through on every generated test
+        "test_payload": 21600,          # Keyed by QuestionBankVersion, so content changes never hit old entries
+        "analytics": 600                # Evicted when the student's next test is scored
+    },
+    "local_ttl_seconds": 60,            # "local" entries expire after this while the invalidation listener is down.
+    "retry_after_error_seconds": 30,    # A failing backend is bypassed for this long.
+    "postgres_purge_probability": 0.01  # Share of writes that also delete expired SharedCache rows.
+}
+
+# Read-only question bank snapshot memory-mapped by every worker on the host
+# (`python -m Backend.testmanagement.question_bank` builds it), invalidated by QuestionBankVersion.
+QUESTION_BANK_CONFIG = {
+    "enabled": True,
+    "path": os.getenv("QUESTION_BANK_PATH", "question_bank.snapshot"),
+    "version_check_seconds": 30,        # Max age of the snapshot version check against the database.
+    "rebuild_when_stale": True,         # Workers rebuild a missing or outdated snapshot in the background.
+    "build_fetch_size": 2000            # Questions per fetch while building.
+}
+
+# Keyset pagination for test listings and history.
+PAGINATION_CONFIG = {
+    "default_page_size": 20,
+    "max_page_size": 100
+}
+
+# Hot/cold split of StudentResponses (`python -m Backend.testmanagement.response_archive`).
+RESPONSE_ARCHIVE_CONFIG = {
+    "archive_after_months": 6,      # Scored responses older than this move to StudentResponsesArchive.
+    "batch_size": 5000              # Responses moved per transaction.
+}
+
+# PostgreSQL connection pool, created per worker process on startup
+DB_POOL_CONFIG = {
+    "min_connections": 1,
+    "max_connections": 10,
+    "warmup_connections": 4    # Connections opened before the worker accepts traffic
+}
+
+# Server-side prepared statements for hot lookups (Backend/dbconfig/prepared_statements.py).
+# Disable when connecting through a transaction-pooling proxy, which does not keep sessions.
+PREPARED_STATEMENT_CONFIG = {
+    "enabled": True,
+    "prepare_on_warm_up": True,     # Prepare every registered statement on the warm-up connections.
+    "stats_sample_every": 200       # Connection releases between plan cache samples for /metrics.
+}
+
+# Bounded thread pools per workload class used by the API handlers.
+# DB-bound pools together should not exceed the PostgreSQL connection pool size.
+EXECUTOR_CONFIG = {
+    "db_read": {"max_workers": 6, "max_queue": 200},
+    "db_write": {"max_workers": 3, "max_queue": 100},
+    "export": {"max_workers": 1, "max_queue": 10}
+}
+
+# NEET instructor chat (Backend/chatsystem/chatbot.py). Upstream calls are async and limited per worker,
+# so chat traffic holds no threads and queues on the event loop instead of the test endpoints' pools.
+CHAT_CONFIG = {
+    "model": "gpt-3.5-turbo",
+    "api_key": os.getenv("OPENAI_API_KEY"),     # Falls back to OPENAI_API_KEY in chatbot.py.
+    "max_concurrent_requests": 4,       # Upstream calls in flight per worker.
+    "max_waiting_requests": 20,         # More chats waiting than this are answered 503 at once.
+    "queue_timeout_seconds": 10.0,      # Longest a chat waits for an upstream slot.
+    "request_timeout_seconds": 60.0,
+    "max_retries": 1
+}
+
+# Per-worker cache of chat answers (Backend/chatsystem/answer_cache.py), keyed by the normalized question
+# and a hash of the compacted history sent with it. Near-duplicates are matched by character shingle similarity.
+CHAT_ANSWER_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 5000,
+    "ttl_seconds": 86400,
+    "near_duplicates": False,           # Also serve answers of reworded questions with the same content words.
+    "near_duplicate_threshold": 0.85,   # Jaccard similarity of the questions' shingle sets.
+    "shingle_size": 4,                  # Characters per shingle.
+    "min_shingles": 8                   # Shorter questions only match exactly.
+}
+
+# Conversation history sent upstream (Backend/chatsystem/history.py). The newest turns that fit the budget
+# are kept; older user questions are listed in the system prompt instead.
+CHAT_HISTORY_CONFIG = {
+    "max_prompt_tokens": 3000,          # System prompt, kept history and the new question together.
+    "tokenizer": "estimate",            # "estimate" (bytes per token) or "tiktoken", if installed.
+    "bytes_per_token": 4,               # UTF-8 bytes per token for the estimate.
+    "message_overhead_tokens": 4,       # Role and separators the API adds per message.
+    "summary_questions": 5,             # Most recent dropped user questions listed in the system prompt.
+    "summary_question_chars": 120       # Each summarized question is cut to this length.
+}
+
+# Tracing. TELEMETRY_EXPORTER in the environment takes precedence over "exporter". The "azure" exporter
+# reads its connection string from APPLICATIONINSIGHTS_CONNECTION_STRING only and is disabled without it.
+TELEMETRY_CONFIG = {
+    "exporter": "none",                 # "azure", "console", "file" or "none"
+    "file_path": "traces.jsonl",        # Used by the "file" exporter.
+    "configure_in_background": True,    # Don't hold up worker readiness while the exporter starts.
+    # Head sampling: share of requests recorded, per route template, decided when the request starts.
+    # Unrecorded requests cost almost nothing, but are not exported even when they fail.
+    "head_sample_rate": 1.0,
+    "head_route_sample_rates": {
+        "/admin/host/ping": 0.0,
+        "/metrics": 0.0,
+        "/favicon.ico": 0.0,
+        "/robots933456.txt": 0.0,
+        "/robots.txt": 0.0
+    },
+    # Tail sampling of recorded traces, decided when the root span ends: errors and slow requests
+    # are always exported, the rest at the rate of their route template in tail_route_sample_rates,
+    # else at tail_sample_rate.
+    "tail_sample_rate": 0.1,
+    "tail_route_sample_rates": {},
+    "slow_trace_seconds": 1.0,
+    "max_buffered_traces": 1000,
+    # Export queue. When full, spans are dropped rather than blocking request threads.
+    "max_queue_size": 2048,
+    "max_export_batch_size": 256,
+    "export_interval_seconds": 5.0
+}
+
+# Budget for `python tools/startup_benchmark.py`, which fails when importing service.py takes longer.
+STARTUP_CONFIG = {
+    "import_budget_seconds": 1.0,
+    "report_top_modules": 15
+}
+
+# `python tools/check_query_plans.py`: tables with at least large_table_rows rows must not be
+# scanned sequentially. allowed_seq_scans maps "path:function" to tables it may scan in full.
+QUERY_PLAN_CONFIG = {
+    "large_table_rows": 10000,
+    "allowed_seq_scans": {
+        # Intentional full reads
+        "Backend/mock/mock_test_management.py:fetch_existing_ids": ["neetmocktests", "testinstances"],
+        "Backend/testmanagement/question_management.py:get_unique_student_ids": ["testinstances"],
+        "Backend/testmanagement/catalog_cache.py:_load_catalog": ["chapters", "subtopics"],
+        # Generic plans only: StudentResponses partitions are pruned at run time, so the per-student row
+        # estimate covers every partition. With the StudentID known the join uses questions_pkey.
+        "Backend/testmanagement/student_proficiency.py:get_student_test_history": ["questions"],
+        "Backend/testmanagement/student_proficiency.py:student_test_history_in_excel": ["questions"]
+    }
+}
+
+# `python tools/microbenchmarks.py`: timing rounds and the slowdown `compare` reports as a regression.
+MICROBENCHMARK_CONFIG = {
+    "rounds": 15,
+    "min_round_seconds": 0.02,      # Each round repeats the call until it takes at least this long.
+    "regression_threshold": 0.10,   # Median slower than the baseline by more than this share.
+    "results_dir": "tools/benchmark_results"
+}
+
+# Request metrics exposed on /metrics.
+METRICS_CONFIG = {
+    "latency_buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+    "log_sample_rate": 0.01,        # Share of requests logged by the metrics middleware.
+    "slow_request_seconds": 1.0     # Requests slower than this are always logged.
+}
+
+# Per-request SQL instrumentation (query count, DB time, rows and statement fingerprints).
+SQL_INSTRUMENTATION_CONFIG = {
+    "enabled": True,
+    "debug_headers": False,             # Add X-DB-* headers to responses.
+    "repeat_warning_threshold": 10      # Warn when one statement runs more often than this in a request (N+1).
+}
+
+# Admission control. Requests are classed by path; connections are reserved for the higher classes,
+# so submissions and test fetches still get through when the pool is saturated.
+ADMISSION_CONFIG = {
+    "enabled": True,
+    # A class may only take a connection while more than this many are free.
+    "reserved_connections": {"high": 0, "normal": 2, "low": 4},
+    # Requests are rejected up front when their class has no free connection and more than
+    # at least this many tasks are already waiting in the DB executor queues.
+    "max_queued_tasks": {"normal": 40, "low": 0},
+    # Longest a request thread waits for a connection before failing.
+    "checkout_timeout_seconds": {"high": 15.0, "normal": 5.0, "low": 1.0},
+    "retry_after_seconds": 2,
+    "default_priority": "normal",
+    "route_priorities": {
+        "/submit-practice-test-answers/": "high",
+        "/submit-mock-test-answers": "high",
+        "/practice-test/questions": "high",
+        "/get-practice-test-questions": "high",
+        "/get-mock-questions": "high",
+        "/get-mock-test-questions": "high",
+        "/get-question": "high",
+        "/check-test-completion": "high",
+        "/student-test-history": "low",
+        "/get-student-test-history-excel": "low",
+        "/chapter-proficiency": "low",
+        "/subtopic-proficiency": "low",
+        "/leaderboard/rank": "low",
+        "/leaderboard/top": "low",
+        "/unique-student-ids/": "low",
+        "/chat/": "low"
+    }
+}
\ No newline at end of file
@@ -1,16 +1,165 @@
 # db_connection.py
+import contextvars
+import os
+import threading
+import time
 import psycopg2
 from psycopg2 import pool
 # import redis
-from Backend.dbconfig.config import DB_CONFIG
+from Backend.dbconfig.config import DB_CONFIG, DB_POOL_CONFIG, ADMISSION_CONFIG, PREPARED_STATEMENT_CONFIG
+from Backend.dbconfig.prepared_statements import PreparedStatementConnection, prepare_all, sample_plan_cache
+from Backend.dbconfig.sql_instrumentation import InstrumentedCursor
+from Backend.metrics import Counter, Gauge, db_pool_wait_seconds, db_connection_hold_seconds, db_pool_checkout_errors_total, register_collector
+
+# Priority class ('high', 'normal' or 'low') of the work running in the current context; set per request
+# by the admission control middleware and carried into executor threads with the request's context
+request_priority = contextvars.ContextVar("request_priority", default=ADMISSION_CONFIG["default_priority"])
+
+db_pool_checkout_timeouts_total = Counter(
+    "db_pool_checkout_timeouts_total", "Connection checkouts that timed out waiting for capacity, by priority.", ("priority",))
 
 # Initialize the connection pool for PostgreSQL
 def init_pg_connection_pool():
-    connection_pool = pool.SimpleConnectionPool(1, 10, **DB_CONFIG)
+    # Threaded pool, since handlers run their database work on worker threads.
+    # Every cursor records its statements in the current request's SQL statistics, and every
+    # connection tracks the statements prepared in its session.
+    connection_pool = pool.ThreadedConnectionPool(
+        DB_POOL_CONFIG["min_connections"], DB_POOL_CONFIG["max_connections"],
+        connection_factory=PreparedStatementConnection, cursor_factory=InstrumentedCursor, **DB_CONFIG
+    )
     if connection_pool.closed:
         print("Failed to create the PostgreSQL connection pool")
     return connection_pool
 
+
+class LazyConnectionPool:
+    """
+    Process-local handle to the PostgreSQL connection pool.
+
+    The real pool is only created on open() or on first use, so importing this module never
+    connects to the database. The pool remembers the process that created it; a forked
+    child (e.g. a gunicorn worker after a preloading master) never reuses the parent's
+    sockets and builds its own pool instead.
+
+    Checkouts honour ADMISSION_CONFIG["reserved_connections"]: a request of a given priority only
+    gets a connection while more than its class's reserve is free, and otherwise waits (bounded)
+    for one to be released, so the last connections are kept for high-priority work.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._available = threading.Condition()
+        self._in_use = 0
+        self._waiting = 0
+
+    def _get_pool(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    # An inherited pool is dropped without closing: closing would terminate
+                    # the sessions still in use by the parent process
+                    self._pool = init_pg_connection_pool()
+                    self._pid = os.getpid()
+                    self._available = threading.Condition()
+                    self._in_use = 0
+                    self._waiting = 0
+        return self._pool
+
+    @property
+    def closed(self):
+        return self._pool is None or self._pid != os.getpid() or self._pool.closed
+
+    def open(self):
+        return self._get_pool()
+
+    def warm_up(self, connections):
+        """
+        Opens up to `connections` connections up front so the first requests do not pay for connecting
+        (or for preparing the registered statements).
+
+        :return: Number of connections that were opened and checked.
+        """
+        connection_pool = self._get_pool()
+        connections = min(connections, DB_POOL_CONFIG["max_connections"])
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = connection_pool.getconn()
+                opened.append(conn)
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+                if PREPARED_STATEMENT_CONFIG["prepare_on_warm_up"]:
+                    prepare_all(conn)
+        finally:
+            for conn in opened:
+                connection_pool.putconn(conn)
+        return len(opened)
+
+    def _reserve(self, priority):
+        max_connections = DB_POOL_CONFIG["max_connections"]
+        reserved = ADMISSION_CONFIG["reserved_connections"].get(priority, 0) if ADMISSION_CONFIG["enabled"] else 0
+        deadline = time.monotonic() + ADMISSION_CONFIG["checkout_timeout_seconds"].get(priority, 5.0)
+        with self._available:
+            while max_connections - self._in_use <= reserved:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    db_pool_checkout_timeouts_total.inc(priority)
+                    raise pool.PoolError(f"Timed out waiting for a database connection ({priority} priority)")
+                self._waiting += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+    def _release(self):
+        with self._available:
+            self._in_use -= 1
+            self._available.notify_all()
+
+    def getconn(self, key=None):
+        connection_pool = self._get_pool()
+        self._reserve(request_priority.get())
+        try:
+            return connection_pool.getconn(key)
+        except Exception:
+            self._release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        if self._pool is None or self._pid != os.getpid():
+            # Connection from a pool that no longer exists in this process
+            conn.close()
+            return
+        try:
+            self._pool.putconn(conn, key, close)
+        finally:
+            self._release()
+
+    def free_connections(self):
+        """
+        Returns the number of connections that can still be checked out without waiting.
+        """
+        return DB_POOL_CONFIG["max_connections"] - self._in_use
+
+    def usage(self):
+        """
+        Returns (connections in use, idle connections, waiting threads) for this process's pool.
+        """
+        if self._pool is None or self._pid != os.getpid() or self._pool.closed:
+            return 0, 0, 0
+        return len(self._pool._used), len(self._pool._pool), self._waiting
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid() and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+            self._pid = None
+
 # Initialize Redis client
 # def init_redis_client():
 #     # Replace these with your Azure Redis configuration details
@@ -28,17 +177,41 @@ def init_pg_connection_pool():
 #     )
 # Function to create and return a new PostgreSQL connection
 def create_pg_connection(connection_pool):
+    start = time.perf_counter()
     try:
-        return connection_pool.getconn()
+        connection = connection_pool.getconn()
     except (Exception, psycopg2.DatabaseError) as error:
+        db_pool_checkout_errors_total.inc()
         print(error)
         return None
+    now = time.perf_counter()
+    db_pool_wait_seconds.observe(value=now - start)
+    _checked_out_at[id(connection)] = now
+    return connection
 
 # Function to release a PostgreSQL connection back to the pool
 def release_pg_connection(connection_pool, connection):
     if connection:
+        checked_out_at = _checked_out_at.pop(id(connection), None)
+        if checked_out_at is not None:
+            db_connection_hold_seconds.observe(value=time.perf_counter() - checked_out_at)
+        sample_plan_cache(connection)
         connection_pool.putconn(connection)
 
-# Initialize connection pools and clients
-pg_connection_pool = init_pg_connection_pool()
+# Checkout time per connection, for the hold-time histogram
+_checked_out_at = {}
+
+# Connections are opened lazily, per process; the API opens and warms the pool in its lifespan hook
+pg_connection_pool = LazyConnectionPool()
+
+
+@register_collector
+def _pool_metrics():
+    in_use, idle, waiting = pg_connection_pool.usage()
+    connections = Gauge("db_pool_connections", "PostgreSQL pool connections by state.", ("state",))
+    connections.set("in_use", value=in_use)
+    connections.set("idle", value=idle)
+    waiters = Gauge("db_pool_waiting_threads", "Threads waiting for a PostgreSQL connection.")
+    waiters.set(value=waiting)
+    return [connections, waiters, db_pool_checkout_timeouts_total]
 # redis_client = init_redis_client()
@@ -0,0 +1,159 @@
+import select
+import threading
+import psycopg2
+from Backend.dbconfig.config import DB_CONFIG, INVALIDATION_CONFIG
+from Backend.metrics import Counter, Gauge, register_metric, register_collector
+
+# Channel shared with the database triggers in Script.sql / migrations that notify on content changes.
+CHANNEL = "cache_invalidation"
+
+cache_invalidations_published_total = register_metric(Counter(
+    "cache_invalidations_published_total", "Invalidations sent by this worker, by kind.", ("kind",)))
+cache_invalidations_received_total = register_metric(Counter(
+    "cache_invalidations_received_total", "Invalidations received by this worker's listener, by kind.", ("kind",)))
+
+# Invalidation kind -> handlers called with the key (None: every entry of that kind)
+_handlers = {}
+
+
+def subscribe(kind, handler):
+    """
+    Registers handler(key) to be called in this worker when an invalidation of the given kind
+    arrives. key is None when every entry of the kind must go, which is also what handlers get
+    after the listener reconnects, since notifications sent meanwhile are lost.
+    Modules subscribe at import time.
+    """
+    _handlers.setdefault(kind, []).append(handler)
+    return handler
+
+
+def publish(cur, kind, key=None):
+    """
+    Queues an invalidation in the cursor's transaction. PostgreSQL delivers it to every listening
+    worker, this one included, when the transaction commits, and drops it on rollback.
+
+    :param cur: Cursor of the transaction that makes the change.
+    :param kind: Kind of cached data, e.g. 'catalog' or 'question_cache'.
+    :param key: Entry within the kind, e.g. a student ID; None for all entries.
+    """
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, kind if key is None else f"{kind}:{key}"))
+    cache_invalidations_published_total.inc(kind)
+
+
+def _dispatch(kind, key):
+    for handler in _handlers.get(kind, []):
+        try:
+            handler(key)
+        except Exception as e:
+            print(f"Error handling {kind} invalidation: {e}")
+
+
+def dispatch_payload(payload):
+    kind, _, key = payload.partition(":")
+    cache_invalidations_received_total.inc(kind)
+    _dispatch(kind, key or None)
+
+
+class InvalidationListener:
+    """
+    Background thread holding a dedicated (unpooled) connection that LISTENs on CHANNEL and
+    runs the subscribed handlers. One per worker process, started from the lifespan hook.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self.listening = threading.Event()  # Set while LISTEN is active
+        self._stop = threading.Event()
+        self._thread = None
+        self._sessions = 0
+        self._missed_start = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not INVALIDATION_CONFIG["enabled"] or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def wait_until_listening(self, timeout):
+        """
+        Waits up to timeout seconds for LISTEN to be active, so caches loaded afterwards miss no
+        change. If it is not, the first session drops every subscribed cache, as after a reconnect.
+
+        :return: True if the listener is listening.
+        """
+        if not INVALIDATION_CONFIG["enabled"]:
+            return False
+        if self.listening.wait(timeout):
+            return True
+        with self._lock:
+            if self.listening.is_set():
+                return True
+            self._missed_start = True
+        return False
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=INVALIDATION_CONFIG["poll_seconds"] + 1)
+
+    def _listen(self, conn):
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        with self._lock:
+            resync = self._sessions > 0 or self._missed_start
+            self._sessions += 1
+            self.listening.set()
+        if resync:
+            # Notifications sent while disconnected, or before the first LISTEN, were lost
+            print("Cache invalidation listener (re)connected, dropping all subscribed caches")
+            for kind in list(_handlers):
+                _dispatch(kind, None)
+        self.connected = True
+
+        while not self._stop.is_set():
+            if select.select([conn], [], [], INVALIDATION_CONFIG["poll_seconds"]) == ([], [], []):
+                # Idle: make sure the session is still alive
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            conn.poll()
+            while conn.notifies:
+                dispatch_payload(conn.notifies.pop(0).payload)
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                self._listen(conn)
+            except Exception as e:
+                print(f"Cache invalidation listener disconnected: {e}")
+            finally:
+                self.connected = False
+                self.listening.clear()
+                if conn is not None:
+                    conn.close()
+            self._stop.wait(INVALIDATION_CONFIG["reconnect_seconds"])
+
+
+invalidation_listener = InvalidationListener()
+
+
+def cache_ttl(seconds):
+    """
+    How long a worker may trust cached data without re-checking the database: the given
+    TTL, extended to INVALIDATION_CONFIG["listening_ttl_seconds"] while the listener is connected
+    and changes are pushed to this worker.
+    """
+    if invalidation_listener.connected:
+        return max(seconds, INVALIDATION_CONFIG["listening_ttl_seconds"])
+    return seconds
+
+
+@register_collector
+def _listener_metrics():
+    connected = Gauge("cache_invalidation_listener_connected", "1 while this worker listens for cache invalidations.")
+    connected.set(value=1 if invalidation_listener.connected else 0)
+    return [connected]
@@ -0,0 +1,177 @@
+import re
+import threading
+import weakref
+import psycopg2.extensions
+from Backend.dbconfig.config import PREPARED_STATEMENT_CONFIG
+from Backend.metrics import Counter, Gauge, register_metric, register_collector
+
+prepared_statement_executions_total = register_metric(Counter(
+    "prepared_statement_executions_total", "Registered statements executed, by statement and mode (prepared or fallback).",
+    ("statement", "mode")))
+prepared_statement_prepares_total = register_metric(Counter(
+    "prepared_statement_prepares_total", "PREPAREs sent to the server, by statement and outcome.", ("statement", "outcome")))
+
+_PLACEHOLDER = re.compile(r"%s")
+_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# Statement name -> (SQL with %s placeholders, PREPARE statement)
+_statements = {}
+
+# Latest pg_prepared_statements sample per pooled connection: {statement: (generic_plans, custom_plans)}
+_plan_samples = weakref.WeakKeyDictionary()
+_plan_samples_lock = threading.Lock()
+_releases = 0
+
+
+class PreparedStatementConnection(psycopg2.extensions.connection):
+    """
+    Connection that remembers which registered statements are prepared in its session.
+    Installed as the connection_factory of the pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+        self.failed_statements = set()
+
+
+def register_statement(name, query):
+    """
+    Registers a hot statement to be prepared once per pooled connection and executed by name.
+    Statements are registered at import time by the modules that run them.
+
+    :param name: Server-side statement name (lower case identifier).
+    :param query: SQL with %s placeholders, as it would be passed to cursor.execute().
+    :return: The name, to be passed to execute_prepared().
+    """
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid prepared statement name: {name}")
+    if name in _statements and _statements[name][0] != query:
+        raise ValueError(f"Prepared statement {name} is already registered with different SQL")
+
+    placeholders = iter(range(1, query.count("%s") + 1))
+    server_query = _PLACEHOLDER.sub(lambda _: f"${next(placeholders)}", query)
+    _statements[name] = (query, f"PREPARE {name} AS {server_query}")
+    return name
+
+
+def _prepare(cur, conn, name):
+    # A failed PREPARE must not abort the caller's transaction, hence the savepoint.
+    # PREPARE itself is not transactional: the statement outlives a later rollback.
+    cur.execute("SAVEPOINT prepare_statement")
+    try:
+        cur.execute(_statements[name][1])
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+        conn.failed_statements.add(name)
+        prepared_statement_prepares_total.inc(name, "failed")
+        print(f"Could not prepare statement {name}, executing it unprepared: {e}")
+        return False
+    finally:
+        cur.execute("RELEASE SAVEPOINT prepare_statement")
+    conn.prepared_statements.add(name)
+    prepared_statement_prepares_total.inc(name, "prepared")
+    return True
+
+
+def execute_prepared(cur, name, params=()):
+    """
+    Executes a registered statement on cur, preparing it on the cursor's connection first if needed.
+    Falls back to a plain execute of the same SQL when prepared statements are disabled, the
+    connection is not a pooled PreparedStatementConnection or the statement could not be prepared.
+
+    :param cur: Open cursor.
+    :param name: Name returned by register_statement().
+    :param params: Parameter values, in placeholder order.
+    """
+    query = _statements[name][0]
+    conn = getattr(cur, "connection", None)
+    if (not PREPARED_STATEMENT_CONFIG["enabled"] or not isinstance(conn, PreparedStatementConnection)
+            or name in conn.failed_statements):
+        prepared_statement_executions_total.inc(name, "fallback")
+        return cur.execute(query, params)
+
+    if name not in conn.prepared_statements and not _prepare(cur, conn, name):
+        prepared_statement_executions_total.inc(name, "fallback")
+        return cur.execute(query, params)
+
+    prepared_statement_executions_total.inc(name, "prepared")
+    if params:
+        return cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    return cur.execute(f"EXECUTE {name}")
+
+
+def prepare_all(conn):
+    """
+    Prepares every registered statement on conn, e.g. while warming up the pool.
+
+    :return: Number of statements prepared.
+    """
+    if not PREPARED_STATEMENT_CONFIG["enabled"] or not isinstance(conn, PreparedStatementConnection):
+        return 0
+    prepared = 0
+    with conn.cursor() as cur:
+        for name in list(_statements):
+            if name not in conn.prepared_statements and name not in conn.failed_statements:
+                prepared += _prepare(cur, conn, name)
+    conn.commit()
+    return prepared
+
+
+def plan_cache_stats(conn):
+    """
+    Reads the plan cache counters of the registered statements prepared in conn's session.
+
+    :return: {statement: (generic_plans, custom_plans)}
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT name, generic_plans, custom_plans FROM pg_prepared_statements")
+        return {name: (generic, custom) for name, generic, custom in cur.fetchall() if name in _statements}
+
+
+def sample_plan_cache(conn):
+    """
+    Called when a connection goes back to the pool. Every stats_sample_every releases, records the
+    connection's plan cache counters for /metrics. The transaction is rolled back afterwards, as
+    the pool would do anyway; connections in a failed transaction are skipped.
+    """
+    global _releases
+    if not PREPARED_STATEMENT_CONFIG["enabled"] or not isinstance(conn, PreparedStatementConnection) or conn.closed:
+        return
+    with _plan_samples_lock:
+        _releases += 1
+        if _releases % PREPARED_STATEMENT_CONFIG["stats_sample_every"]:
+            return
+    if not conn.prepared_statements or conn.info.transaction_status not in (
+            psycopg2.extensions.TRANSACTION_STATUS_IDLE, psycopg2.extensions.TRANSACTION_STATUS_INTRANS):
+        return
+    try:
+        stats = plan_cache_stats(conn)
+        conn.rollback()
+    except psycopg2.Error as e:
+        print(f"Could not sample the plan cache: {e}")
+        return
+    with _plan_samples_lock:
+        _plan_samples[conn] = stats
+
+
+@register_collector
+def _plan_cache_metrics():
+    plans = Gauge("prepared_statement_plans", "Plans built for prepared statements on sampled pooled connections, "
+                                              "by statement and kind (generic or custom).", ("statement", "kind"))
+    with _plan_samples_lock:
+        samples = list(_plan_samples.values())
+    for stats in samples:
+        for name, (generic, custom) in stats.items():
+            plans.inc(name, "generic", amount=generic)
+            plans.inc(name, "custom", amount=custom)
+    return [plans]
+
+
+# Hot statements shared by several modules. Statements used by one module are registered there.
+TEST_INSTANCE = register_statement(
+    "test_instance", "SELECT TestType, TestID FROM TestInstances WHERE TestInstanceID = %s AND StudentID = %s")
+PRACTICE_TEST_COMPLETION = register_statement(
+    "practice_test_completion", "SELECT IsCompleted FROM PracticeTestCompletion WHERE PracticeTestID = %s AND StudentID = %s")
+MOCK_TEST_COMPLETION = register_statement(
+    "mock_test_completion", "SELECT IsCompleted FROM MockTestCompletion WHERE MockTestID = %s AND StudentID = %s")
@@ -0,0 +1,363 @@
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+import psycopg2.extras
+from Backend.dbconfig.config import SHARED_CACHE_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.invalidation import cache_ttl, subscribe
+from Backend.metrics import Counter, Histogram, register_metric
+
+shared_cache_requests_total = register_metric(Counter(
+    "shared_cache_requests_total", "Shared cache key lookups, by namespace and outcome (hit or miss).",
+    ("namespace", "outcome")))
+shared_cache_errors_total = register_metric(Counter(
+    "shared_cache_errors_total", "Failed shared cache operations, by backend. Failures are served as misses.",
+    ("backend",)))
+shared_cache_operation_seconds = register_metric(Histogram(
+    "shared_cache_operation_seconds", "Shared cache round trips, by backend and operation.",
+    ("backend", "operation"), buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]))
+
+
+class LocalCache:
+    """
+    In-process LRU with per-entry expiry. Entries are private to the worker, so writers
+    publish invalidations that every worker's listener applies (see _evict_local).
+    """
+
+    name = "local"
+    shared = False
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires at, value)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def set_many(self, items, ttl, only_missing=False):
+        now = time.monotonic()
+        with self._lock:
+            for key, value in items.items():
+                if only_missing:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] > now:
+                        continue
+                self._entries[key] = (now + ttl, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class RedisCache:
+    """
+    Redis (or fakeredis) backend shared by every worker. Lookups are one MGET; writes are
+    pipelined without MULTI, so a batch costs one round trip.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, client, key_prefix):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get_many(self, keys):
+        values = self.client.mget([self.key_prefix + key for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items, ttl, only_missing=False):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self.key_prefix + key, value, ex=max(int(ttl), 1), nx=only_missing)
+        pipe.execute()
+
+    def delete_many(self, keys):
+        if keys:
+            self.client.delete(*[self.key_prefix + key for key in keys])
+
+    def clear(self, prefix):
+        keys = list(self.client.scan_iter(match=self.key_prefix + prefix + "*", count=1000))
+        for start in range(0, len(keys), 1000):
+            self.client.delete(*keys[start:start + 1000])
+
+
+class PostgresCache:
+    """
+    UNLOGGED SharedCache table, for deployments without Redis. Entries survive worker restarts
+    but not a database crash. Expired rows are ignored on read and purged by a sample of writes.
+    Each call checks out a pooled connection, so callers use the cache only while holding none.
+    """
+
+    name = "postgres"
+    shared = True
+
+    def _run(self, work):
+        conn = create_pg_connection(pg_connection_pool)
+        if not conn:
+            raise RuntimeError("Database connection failed")
+        try:
+            with conn.cursor() as cur:
+                result = work(cur)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            release_pg_connection(pg_connection_pool, conn)
+
+    def get_many(self, keys):
+        def work(cur):
+            cur.execute("SELECT Key, Value FROM SharedCache WHERE Key = ANY(%s) AND ExpiresAt > now()", (list(keys),))
+            return dict(cur.fetchall())
+        return self._run(work)
+
+    def set_many(self, items, ttl, only_missing=False):
+        def work(cur):
+            psycopg2.extras.execute_values(cur, f"""
+                INSERT INTO SharedCache AS SC (Key, Value, ExpiresAt)
+                VALUES %s
+                ON CONFLICT (Key) DO UPDATE SET Value = EXCLUDED.Value, ExpiresAt = EXCLUDED.ExpiresAt
+                {"WHERE SC.ExpiresAt <= now()" if only_missing else ""}
+            """, [(key, value, ttl) for key, value in items.items()],
+                template="(%s, %s, now() + make_interval(secs => %s))")
+            if random.random() < SHARED_CACHE_CONFIG["postgres_purge_probability"]:
+                cur.execute("""
+                    DELETE FROM SharedCache WHERE Key IN (
+                        SELECT Key FROM SharedCache WHERE ExpiresAt <= now() LIMIT 1000)
+                """)
+        self._run(work)
+
+    def delete_many(self, keys):
+        self._run(lambda cur: cur.execute("DELETE FROM SharedCache WHERE Key = ANY(%s)", (list(keys),)))
+
+    def clear(self, prefix):
+        self._run(lambda cur: cur.execute("DELETE FROM SharedCache WHERE starts_with(Key, %s)", (prefix,)))
+
+
+def _create_backend():
+    backend = SHARED_CACHE_CONFIG["backend"]
+    try:
+        if backend == "redis":
+            import redis
+            client = redis.Redis.from_url(
+                SHARED_CACHE_CONFIG["redis_url"],
+                socket_timeout=SHARED_CACHE_CONFIG["redis_socket_timeout"],
+                socket_connect_timeout=SHARED_CACHE_CONFIG["redis_socket_timeout"])
+            return RedisCache(client, SHARED_CACHE_CONFIG["key_prefix"])
+        if backend == "fakeredis":
+            # In-memory Redis stand-in for tests and local runs; shared by the threads of one process only
+            import fakeredis
+            return RedisCache(fakeredis.FakeRedis(), SHARED_CACHE_CONFIG["key_prefix"])
+        if backend == "postgres":
+            return PostgresCache()
+    except ImportError as e:
+        print(f"Shared cache backend {backend} unavailable, using the in-process cache: {e}")
+    return LocalCache(SHARED_CACHE_CONFIG["local_max_entries"])
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_failing_until = 0.0
+
+# Namespace -> time of the last eviction in this worker, so read-through fills of values read
+# before it are skipped (see cache_fill)
+_invalidated_at = {}
+_fill_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns the configured backend, created on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replaces the backend, e.g. with RedisCache(fakeredis.FakeRedis(), prefix) in tests.
+    """
+    global _backend, _failing_until
+    with _backend_lock:
+        _backend = backend
+        _failing_until = 0.0
+
+
+def _call(operation, work, default=None):
+    """
+    Runs one backend operation. A failing backend is skipped for
+    SHARED_CACHE_CONFIG["retry_after_error_seconds"], so an outage costs callers one timeout, not one per request.
+    """
+    global _failing_until
+    backend = get_backend()
+    if _failing_until and time.monotonic() < _failing_until:
+        return default
+    start = time.perf_counter()
+    try:
+        result = work(backend)
+    except Exception as e:
+        shared_cache_errors_total.inc(backend.name)
+        _failing_until = time.monotonic() + SHARED_CACHE_CONFIG["retry_after_error_seconds"]
+        print(f"Shared cache {backend.name} {operation} failed: {e}")
+        return default
+    _failing_until = 0.0
+    shared_cache_operation_seconds.observe(backend.name, operation, value=time.perf_counter() - start)
+    return result
+
+
+def cache_key(namespace, *parts):
+    return ":".join([namespace, *map(str, parts)])
+
+
+def cache_get_many(namespace, keys):
+    """
+    Looks several keys of one namespace up in a single round trip.
+
+    :param namespace: Namespace of the keys, e.g. 'used_questions'; used for metrics and the TTL.
+    :param keys: Keys built with cache_key(namespace, ...).
+    :return: Dictionary of key to cached value for the keys found; missing and unreadable keys are left out.
+    """
+    keys = list(keys)
+    if not keys or not SHARED_CACHE_CONFIG["enabled"]:
+        return {}
+    raw = _call("get", lambda backend: backend.get_many(keys), {})
+    values = {}
+    for key, value in raw.items():
+        try:
+            values[key] = json.loads(value)
+        except (TypeError, ValueError):
+            continue
+    shared_cache_requests_total.inc(namespace, "hit", amount=len(values))
+    shared_cache_requests_total.inc(namespace, "miss", amount=len(keys) - len(values))
+    return values
+
+
+def cache_get(namespace, key):
+    """
+    :return: The cached value of one key, or None on a miss.
+    """
+    return cache_get_many(namespace, [key]).get(key)
+
+
+def cache_set_many(namespace, items, only_missing=False):
+    """
+    Stores values for SHARED_CACHE_CONFIG["ttl_seconds"][namespace]. Values must be JSON serializable.
+
+    :param items: Dictionary of key to value.
+    :param only_missing: Keep entries that already exist. Read-through fills use it, so a value read
+                         from the database before a concurrent write cannot overwrite the writer's newer value.
+    """
+    if not items or not SHARED_CACHE_CONFIG["enabled"]:
+        return
+    encoded = {key: json.dumps(value, separators=(",", ":")) for key, value in items.items()}
+    ttl = SHARED_CACHE_CONFIG["ttl_seconds"][namespace]
+    if not get_backend().shared:
+        # In-process entries only learn about other workers' writes through the invalidation listener
+        ttl = min(ttl, cache_ttl(SHARED_CACHE_CONFIG["local_ttl_seconds"]))
+    _call("set", lambda backend: backend.set_many(encoded, ttl, only_missing))
+
+
+def cache_set(namespace, key, value, only_missing=False):
+    cache_set_many(namespace, {key: value}, only_missing)
+
+
+def cache_fill(namespace, key, value, read_started):
+    """
+    Read-through fill: stores a value read from the database unless an entry exists already or the
+    namespace was evicted in this worker since the read started. Otherwise a read that raced a
+    write could store the old value after the write's invalidation went by.
+
+    :param read_started: time.monotonic() taken before the database read.
+    """
+    with _fill_lock:
+        if read_started > _invalidated_at.get(namespace, 0.0):
+            cache_set(namespace, key, value, only_missing=True)
+
+
+def _mark_invalidated(namespaces):
+    with _fill_lock:
+        now = time.monotonic()
+        for namespace in namespaces:
+            _invalidated_at[namespace] = now
+
+
+def cache_delete(*keys):
+    if keys and SHARED_CACHE_CONFIG["enabled"]:
+        _mark_invalidated({key.partition(":")[0] for key in keys})
+        _call("delete", lambda backend: backend.delete_many(keys))
+
+
+def cache_clear(namespace):
+    """
+    Drops every entry of a namespace. Meant for rare administrative resets: Redis has to scan for the keys.
+    """
+    if SHARED_CACHE_CONFIG["enabled"]:
+        _mark_invalidated([namespace])
+        _call("clear", lambda backend: backend.clear(namespace + ":"))
+
+
+def _evict_local(evict):
+    """
+    Wraps an invalidation handler so it only runs for the in-process backend. Shared backends
+    are updated by the writer itself, right after its commit.
+    """
+    def handler(key):
+        if SHARED_CACHE_CONFIG["enabled"] and not get_backend().shared:
+            evict(key)
+    return handler
+
+
+def evict_used_questions(student_id):
+    """
+    Drops a student's cached used-question history (every student's when student_id is None).
+    """
+    if student_id is None:
+        cache_clear("used_questions")
+    else:
+        cache_delete(*(cache_key("used_questions", student_id, test_type) for test_type in ("practice", "mock")))
+
+
+def _evict_key(key):
+    # Writers that cannot act after their commit publish the key instead; every backend evicts it
+    if key is not None:
+        cache_delete(key)
+
+
+def _evict_namespace(namespace):
+    if namespace is not None:
+        cache_clear(namespace)
+
+
+subscribe("question_cache", _evict_local(evict_used_questions))
+subscribe("shared_cache", _evict_key)
+subscribe("shared_cache_namespace", _evict_local(_evict_namespace))
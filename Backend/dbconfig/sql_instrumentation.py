@@ -0,0 +1,181 @@
+import contextvars
+import functools
+import logging
+import re
+import time
+from collections import Counter
+import psycopg2.extensions
+from opentelemetry import trace
+from Backend.dbconfig.config import SQL_INSTRUMENTATION_CONFIG
+from Backend.metrics import Counter as MetricCounter, Histogram, register_metric, route_template
+
+logger = logging.getLogger(__name__)
+
+db_queries_per_request = register_metric(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.",
+    buckets=[1, 2, 5, 10, 20, 50, 100, 200, 500]))
+db_time_per_request_seconds = register_metric(Histogram(
+    "db_time_per_request_seconds", "Time spent executing SQL per HTTP request."))
+db_repeated_statements_total = register_metric(MetricCounter(
+    "db_repeated_statements_total", "Requests in which one statement repeated past the N+1 threshold, by route.", ("route",)))
+
+
+class RequestQueryStats:
+    """
+    SQL statistics for one request. Shared by reference with the worker threads the request
+    dispatches to (they run in a copy of the request's context), hence the plain counters
+    are only ever updated by the thread currently doing the request's work.
+    """
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.fingerprints = Counter()
+
+    def record(self, fingerprint, duration, rows):
+        self.query_count += 1
+        self.db_time += duration
+        if rows is not None and rows > 0:
+            self.rows += rows
+        self.fingerprints[fingerprint] += 1
+
+    def repeated_statements(self, threshold):
+        return [(fingerprint, count) for fingerprint, count in self.fingerprints.items() if count > threshold]
+
+
+_request_stats = contextvars.ContextVar("request_query_stats", default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(query):
+    """
+    Normalizes a statement to its shape: literals and placeholders become '?', lists of
+    placeholders collapse to one and whitespace is squeezed, so the same statement executed
+    with different values (or a different number of IN items) gets the same fingerprint.
+    """
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = normalized.replace("%s", "?")
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("?", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def _query_text(query):
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if isinstance(query, str):
+        return query
+    return str(query)
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that records every statement in the current request's RequestQueryStats.
+    Installed as the cursor_factory of pooled connections, so all conn.cursor() callers use it.
+    """
+
+    def execute(self, query, vars=None):
+        stats = _request_stats.get()
+        if stats is None:
+            return super().execute(query, vars)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            stats.record(fingerprint(_query_text(query)), time.perf_counter() - start, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        stats = _request_stats.get()
+        if stats is None:
+            return super().executemany(query, vars_list)
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            stats.record(fingerprint(_query_text(query)), time.perf_counter() - start, self.rowcount)
+
+
+def start_request_stats():
+    """
+    Starts collecting SQL statistics for the current context.
+
+    :return: The new stats object and a token for reset_request_stats.
+    """
+    stats = RequestQueryStats()
+    return stats, _request_stats.set(stats)
+
+
+def reset_request_stats(token):
+    _request_stats.reset(token)
+
+
+def current_request_stats():
+    return _request_stats.get()
+
+
+class SQLInstrumentationMiddleware:
+    """
+    ASGI middleware that collects SQL statistics per request. It reports them as attributes of
+    the request's OpenTelemetry span and as metrics, optionally as X-DB-* response headers, and
+    logs a warning when a statement repeats more than the configured threshold (an N+1 pattern).
+    Must be added inside the OpenTelemetry middleware so the request span is current.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_INSTRUMENTATION_CONFIG["enabled"]:
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request_stats()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # The request span ends together with the response, so it is annotated here
+                self._annotate_span(stats)
+                if SQL_INSTRUMENTATION_CONFIG["debug_headers"]:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(stats.query_count).encode()))
+                    headers.append((b"x-db-time-ms", f"{stats.db_time * 1000:.2f}".encode()))
+                    headers.append((b"x-db-rows", str(stats.rows).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_request_stats(token)
+            self._report(scope, stats)
+
+    def _annotate_span(self, stats):
+        span = trace.get_current_span()
+        if stats.query_count == 0 or not span.is_recording():
+            return
+        span.set_attribute("db.query_count", stats.query_count)
+        span.set_attribute("db.time_ms", round(stats.db_time * 1000, 3))
+        span.set_attribute("db.rows", stats.rows)
+        span.set_attribute("db.distinct_statements", len(stats.fingerprints))
+        repeated = stats.repeated_statements(SQL_INSTRUMENTATION_CONFIG["repeat_warning_threshold"])
+        if repeated:
+            span.set_attribute("db.repeated_statements", len(repeated))
+
+    def _report(self, scope, stats):
+        if stats.query_count == 0:
+            return
+        db_queries_per_request.observe(value=stats.query_count)
+        db_time_per_request_seconds.observe(value=stats.db_time)
+
+        repeated = stats.repeated_statements(SQL_INSTRUMENTATION_CONFIG["repeat_warning_threshold"])
+        if repeated:
+            route = route_template(scope)
+            db_repeated_statements_total.inc(route)
+            for statement, count in repeated:
+                logger.warning(f"Possible N+1 in {scope['method']} {route}: statement executed {count} times: {statement[:300]}")
@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Backend.dbconfig.config import EXECUTOR_CONFIG
+from Backend.metrics import Counter, Gauge, register_collector
+
+
+class PoolSaturatedError(Exception):
+    """
+    Raised when a workload pool's queue is full and the work is rejected.
+    """
+
+    def __init__(self, pool_name):
+        super().__init__(f"The {pool_name} pool is saturated, please retry shortly")
+        self.pool_name = pool_name
+
+
+class WorkloadPool:
+    """
+    A bounded thread pool for one class of blocking work (DB reads, DB writes, exports).
+
+    Each class gets its own threads and its own queue limit, so a burst of slow work in one
+    class cannot take the threads another class needs. Queue depth, wait and run times are
+    tracked for monitoring.
+    """
+
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _run(self, submitted_at, context, func, args, kwargs):
+        started_at = time.perf_counter()
+        wait = started_at - submitted_at
+        with self.lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+        failed = False
+        try:
+            # Run inside the caller's context so request-scoped context variables are visible
+            return context.run(func, *args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.completed += 1
+                self.failed += failed
+                self.total_run_seconds += time.perf_counter() - started_at
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs func(*args, **kwargs) on this pool and awaits its result without blocking the event loop.
+
+        :raises PoolSaturatedError: If max_queue tasks are already waiting for a thread.
+        """
+        with self.lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PoolSaturatedError(self.name)
+            self.queued += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor, self._run, time.perf_counter(), contextvars.copy_context(), func, args, kwargs
+            )
+        except RuntimeError:
+            # The executor refused the task (e.g. during shutdown), so _run never took it off the queue
+            with self.lock:
+                self.queued -= 1
+            raise
+
+    def stats(self):
+        with self.lock:
+            started = self.completed + self.active
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "average_wait_ms": round(self.total_wait_seconds * 1000 / started, 3) if started else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+                "average_run_ms": round(self.total_run_seconds * 1000 / self.completed, 3) if self.completed else 0.0
+            }
+
+
+pools = {name: WorkloadPool(name, **settings) for name, settings in EXECUTOR_CONFIG.items()}
+
+
+async def run_in_pool(pool_name, func, *args, **kwargs):
+    """
+    Dispatches blocking work to the named workload pool ('db_read', 'db_write' or 'export').
+    """
+    return await pools[pool_name].run(func, *args, **kwargs)
+
+
+def executor_stats():
+    """
+    Returns queue and timing statistics for every workload pool.
+    """
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+@register_collector
+def _executor_metrics():
+    queued = Gauge("executor_queued_tasks", "Tasks waiting for a thread, per workload pool.", ("pool",))
+    active = Gauge("executor_active_tasks", "Tasks running, per workload pool.", ("pool",))
+    completed = Counter("executor_completed_tasks_total", "Tasks finished, per workload pool.", ("pool",))
+    rejected = Counter("executor_rejected_tasks_total", "Tasks rejected because the queue was full, per workload pool.", ("pool",))
+    wait = Counter("executor_wait_seconds_total", "Total time tasks spent queued, per workload pool.", ("pool",))
+    for name, pool in pools.items():
+        with pool.lock:
+            queued.set(name, value=pool.queued)
+            active.set(name, value=pool.active)
+            completed.inc(name, amount=pool.completed)
+            rejected.inc(name, amount=pool.rejected)
+            wait.inc(name, amount=pool.total_wait_seconds)
+    return [queued, active, completed, rejected, wait]
+
+
+def shutdown_executors(wait=True):
+    for pool in pools.values():
+        pool.executor.shutdown(wait=wait)
@@ -0,0 +1,208 @@
+import bisect
+import logging
+import random
+import threading
+import time
+from Backend.dbconfig.config import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class Metric:
+    """
+    Base class for a labelled metric. Values are kept per tuple of label values.
+    Updates take a lock because handlers record from worker threads as well as the event loop.
+    """
+
+    type_name = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _format_labels(self, label_values, extra=None):
+        pairs = list(zip(self.labels, label_values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{self._format_labels(label_values)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self.lock:
+            self.values[label_values] = value
+
+
+class Histogram(Metric):
+    """
+    Cumulative-bucket histogram in the Prometheus style: per label set, a count per upper bound plus sum and count.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=None):
+        super().__init__(name, description, labels)
+        self.buckets = sorted(buckets or METRICS_CONFIG["latency_buckets"])
+
+    def observe(self, *label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                # Non-cumulative counts per bucket (last slot is +Inf), sum, count
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        with self.lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items())
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._format_labels(label_values, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(label_values)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(label_values)} {count}")
+        return lines
+
+
+_registry = []
+_collectors = []
+
+
+def register_metric(metric):
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(collector):
+    """
+    Registers a function called on every scrape that returns a list of metrics to render,
+    for values that are cheaper to read on demand than to update continuously.
+    """
+    _collectors.append(collector)
+    return collector
+
+
+def render_metrics():
+    """
+    Renders all registered metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            for metric in collector():
+                lines.extend(metric.render())
+        except Exception as e:
+            logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+http_requests_total = register_metric(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status code.", ("method", "route", "status")))
+http_request_duration_seconds = register_metric(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")))
+http_requests_in_flight = register_metric(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."))
+db_pool_wait_seconds = register_metric(Histogram(
+    "db_pool_wait_seconds", "Time spent checking a connection out of the PostgreSQL pool."))
+db_connection_hold_seconds = register_metric(Histogram(
+    "db_connection_hold_seconds", "Time a PostgreSQL connection was held before being released to the pool."))
+db_pool_checkout_errors_total = register_metric(Counter(
+    "db_pool_checkout_errors_total", "Failed PostgreSQL pool checkouts."))
+
+
+_route_templates = {}
+
+
+def route_template(scope):
+    """
+    Returns the path template of the route that handled the request (e.g. /get-question), or
+    'unmatched'. Only valid once the router has run, since it reads the matched endpoint from the scope.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _route_templates.get(endpoint)
+    if template is None:
+        template = "unmatched"
+        for route in getattr(scope.get("app"), "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        _route_templates[endpoint] = template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, in-flight requests and status codes per route template.
+
+    The route template (e.g. /get-question) rather than the raw path is used as the label, so
+    label cardinality stays bounded. Only a sample of requests, plus every slow one, is logged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            route = route_template(scope)
+            method = scope["method"]
+            http_request_duration_seconds.observe(method, route, value=duration)
+            http_requests_total.inc(method, route, str(status[0]))
+            if duration >= METRICS_CONFIG["slow_request_seconds"] or random.random() < METRICS_CONFIG["log_sample_rate"]:
+                logger.info(f"Request: {method} {route} {status[0]} completed in {duration:.4f} seconds")
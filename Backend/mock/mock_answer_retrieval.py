@@ -1,6 +1,7 @@
 import random
 from psycopg2.extensions import AsIs
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.prepared_statements import TEST_INSTANCE, execute_prepared
 
 def get_mock_test_answers_only(test_instance_id, student_id):
     """
@@ -14,14 +15,11 @@ def get_mock_test_answers_only(test_instance_id, student_id):
     try:
         with conn.cursor() as cur:
             # Retrieve MockTestID from TestInstances
-            cur.execute("""
-                SELECT TestID FROM TestInstances
-                WHERE TestInstanceID = %s AND StudentID = %s
-            """, (test_instance_id, student_id))
+            execute_prepared(cur, TEST_INSTANCE, (test_instance_id, student_id))
             mock_test_result = cur.fetchone()
             if mock_test_result is None:
                 return None, "Mock test not found"
-            mock_test_id = mock_test_result[0]
+            mock_test_id = mock_test_result[1]
 
             # Retrieve the answers, including subject and section information
             cur.execute("""
@@ -1,13 +1,45 @@
 import random
-import psycopg2.extras
-import numpy as np
+import threading
+import time
 from Backend.dbconfig.cache_management import get_cached_questions, cache_questions
+from Backend.dbconfig.config import ITEM_STATISTICS_CONFIG, TEST_GENERATION_CONFIG
+from Backend.testmanagement.item_statistics import get_item_statistics, select_balanced_by_difficulty
+from Backend.testmanagement.question_bank import get_question_payloads, question_bank_version
+from Backend.dbconfig.shared_cache import cache_key, cache_get, cache_set
+from Backend.testmanagement.test_generation import use_database_engine, generate_mock_test_in_database
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.prepared_statements import TEST_INSTANCE, execute_prepared
+from Backend.dbconfig.invalidation import cache_ttl, subscribe
+
+# Writes a generated mock test in one statement: the test, its questions with their sections, the
+# completion row and the test instance. Nothing is written when either ID is already taken.
+INSERT_MOCK_TEST_SQL = """
+    WITH mock_test AS (
+        INSERT INTO NEETMockTests (MockTestID, StudentID)
+        SELECT %(mock_test_id)s, %(student_id)s
+        WHERE NOT EXISTS (SELECT 1 FROM NEETMockTests WHERE MockTestID = %(mock_test_id)s)
+          AND NOT EXISTS (SELECT 1 FROM TestInstances WHERE TestInstanceID = %(test_instance_id)s)
+        RETURNING MockTestID
+    ), questions AS (
+        INSERT INTO NEETMockTestQuestions (MockTestID, QuestionID, Section)
+        SELECT mock_test.MockTestID, Q.QuestionID, Q.Section
+        FROM mock_test, unnest(%(question_ids)s::INT[], %(sections)s::TEXT[]) WITH ORDINALITY AS Q(QuestionID, Section, Position)
+        ORDER BY Q.Position
+    ), completion AS (
+        INSERT INTO MockTestCompletion (MockTestID, StudentID, IsCompleted)
+        SELECT MockTestID, %(student_id)s, FALSE FROM mock_test
+    )
+    INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
+    SELECT %(test_instance_id)s, %(student_id)s, MockTestID, 'Mock' FROM mock_test
+    RETURNING TestInstanceID
+"""
 
 def generate_mock_test(student_id):
-    conn = create_pg_connection(pg_connection_pool)
-    if not conn:
-        return {"message": "Database connection failed"}
+    if use_database_engine():
+        test_instance_id, error = generate_mock_test_in_database(student_id)
+        if error:
+            return {"message": f"An error occurred: {error}"}
+        return {"message": "Mock test generated successfully", "testInstanceID": test_instance_id}
 
     existing_mock_test_ids, existing_test_instance_ids = fetch_existing_ids()
 
@@ -15,30 +47,20 @@ def generate_mock_test(student_id):
     test_instance_id = generate_unique_id(existing_test_instance_ids)
 
     try:
-        with conn.cursor() as cur:
-            subject_ids = [1, 2, 3, 4]
-            mock_test_questions = []
-            current_selected_questions = []
-
-            for subject_id in subject_ids:
-                questions_a = select_questions_for_subject(subject_id, student_id, 'A', current_selected_questions)
-                current_selected_questions.extend([q[0] for q in questions_a])
-                questions_b = select_questions_for_subject(subject_id, student_id, 'B', current_selected_questions)
-                mock_test_questions.extend(questions_a + questions_b)
-                current_selected_questions.extend([q[0] for q in questions_b])
-            success = create_test_instance(student_id, mock_test_id, test_instance_id, mock_test_questions)
-            if success:
-                cur.execute("""
-                    INSERT INTO MockTestCompletion (MockTestID, StudentID, IsCompleted)
-                    VALUES (%s, %s, FALSE)
-                """, (mock_test_id, student_id,))
-                conn.commit()
-                return {"message": "Mock test generated successfully", "testInstanceID": test_instance_id}
+        mock_test_questions = []
+        current_selected_questions = []
+
+        for subject_id in TEST_GENERATION_CONFIG["mock_subject_ids"]:
+            for section in TEST_GENERATION_CONFIG["mock_section_questions"]:
+                questions = select_questions_for_subject(subject_id, student_id, section, current_selected_questions)
+                mock_test_questions.extend(questions)
+                current_selected_questions.extend([q[0] for q in questions])
+        # Also writes the MockTestCompletion row, in the same transaction
+        success = create_test_instance(student_id, mock_test_id, test_instance_id, mock_test_questions)
+        if success:
+            return {"message": "Mock test generated successfully", "testInstanceID": test_instance_id}
     except Exception as e:
-        conn.rollback()
         return {"message": f"An error occurred: {str(e)}"}
-    finally:
-        release_pg_connection(pg_connection_pool, conn)
 
 
 
@@ -89,12 +111,17 @@ def select_questions_for_subject(subject_id, student_id, section, current_select
     all_questions = [q for q in all_questions if q not in current_selected_questions]
 
     # Define the number of questions required for each section
-    total_questions_required = 35 if section == 'A' else 15
+    total_questions_required = TEST_GENERATION_CONFIG["mock_section_questions"][section]
     selected_questions = []
     print("all question::", len(all_questions))
     if len(set(all_questions)) >= total_questions_required:
         # Sufficient unique questions available, excluding current selections
-        selected_questions = weighted_question_selection(all_questions, chapters_weightage, total_questions_required, used_questions)
+        if ITEM_STATISTICS_CONFIG["difficulty_balanced_selection"]:
+            # Oversample by chapter weightage, then balance the pool by observed difficulty
+            candidates = weighted_question_selection(all_questions, chapters_weightage, total_questions_required * ITEM_STATISTICS_CONFIG["selection_oversample"], used_questions)
+            selected_questions = select_balanced_by_difficulty(candidates, total_questions_required, get_item_statistics(candidates))
+        else:
+            selected_questions = weighted_question_selection(all_questions, chapters_weightage, total_questions_required, used_questions)
         print("selected_questions from all question:", len(selected_questions))
     else:
         # Allow repetition, but ensure no duplicates within the current test
@@ -104,6 +131,8 @@ def select_questions_for_subject(subject_id, student_id, section, current_select
         print("Not enough unique questions, allowing repetitions.",additional_needed)
         selected_questions += get_additional_questions(subject_id, excluded_questions, chapters_weightage, additional_needed, current_selected_questions)
     
+    # The random fill of weighted_question_selection may repeat a question; count unique ones only
+    selected_questions = list(set(selected_questions))
     # Ensure the total number of selected questions meets the requirement
     while len(selected_questions) < total_questions_required:
         additional_needed = total_questions_required - len(set(selected_questions))
@@ -229,13 +258,49 @@ def get_questions_for_subject(subject_id, used_questions):
         print(f"No questions available for subject {subject_id} after excluding used questions.")
     return questions
 
+# SubjectID -> (load time, chapter weightages), dropped on 'chapter_weightage' invalidations
+_chapter_weightage_cache = {}
+_chapter_weightage_invalidated_at = 0.0
+_chapter_weightage_lock = threading.Lock()
+
+
 def get_chapter_weightage(subject_id):
     """
-    Retrieves and rounds the weightage for chapters in a subject.
+    Retrieves and rounds the weightage for chapters in a subject. Kept in process for
+    TEST_GENERATION_CONFIG["chapter_weightage_cache_seconds"], or longer while the invalidation
+    listener pushes MockTestChapterWeightage changes.
 
     :param subject_id: ID of the subject.
     :return: Dictionary of chapter ID to rounded weightage.
     """
+    cached = _chapter_weightage_cache.get(subject_id)
+    if cached and time.monotonic() - cached[0] < cache_ttl(TEST_GENERATION_CONFIG["chapter_weightage_cache_seconds"]):
+        return dict(cached[1])
+
+    loaded_at = time.monotonic()
+    weightages, error = _load_chapter_weightage(subject_id)
+    with _chapter_weightage_lock:
+        # Not cached if an invalidation arrived while it was being read
+        if not error and loaded_at > _chapter_weightage_invalidated_at:
+            _chapter_weightage_cache[subject_id] = (loaded_at, weightages)
+    return dict(weightages)
+
+
+def _invalidate_chapter_weightage(key):
+    global _chapter_weightage_invalidated_at
+    with _chapter_weightage_lock:
+        _chapter_weightage_invalidated_at = time.monotonic()
+        if key is None:
+            _chapter_weightage_cache.clear()
+        else:
+            _chapter_weightage_cache.pop(int(key), None)
+
+
+# The MockTestChapterWeightage trigger notifies every worker
+subscribe("chapter_weightage", _invalidate_chapter_weightage)
+
+
+def _load_chapter_weightage(subject_id):
     connection = create_pg_connection(pg_connection_pool)
     cursor = connection.cursor()
     weightages = {}
@@ -248,10 +313,11 @@ def get_chapter_weightage(subject_id):
             weightages[chapter_id] = rounded_weightage
     except Exception as e:
         print(f"Error fetching chapter weightages: {e}")
+        return weightages, str(e)
     finally:
         release_pg_connection(pg_connection_pool,connection)
 
-    return weightages
+    return weightages, None
 
 def weighted_question_selection(question_ids, weightage, num_questions, used_questions):
     """
@@ -327,39 +393,23 @@ def create_test_instance(student_id, mock_test_id, test_instance_id, question_id
     cursor = connection.cursor()
 
     try:
-        # Check for existing MockTestID and TestInstanceID
-        cursor.execute("SELECT COUNT(*) FROM NEETMockTests WHERE MockTestID = %s", (mock_test_id,))
-        if cursor.fetchone()[0] > 0:
-            return False
-
-        cursor.execute("SELECT COUNT(*) FROM TestInstances WHERE TestInstanceID = %s", (test_instance_id,))
-        if cursor.fetchone()[0] > 0:
-            return False
-
-        # Insert into NEETMockTests
-        cursor.execute("INSERT INTO NEETMockTests (MockTestID, StudentID) VALUES (%s, %s)", (mock_test_id, student_id))
-
         # Validate and prepare data for bulk insert
         if not all(isinstance(q, tuple) and len(q) == 2 for q in question_ids_with_sections):
             raise ValueError("Invalid format in question_ids_with_sections. Expected list of tuples (QuestionID, Section).")
-        questions_data = [(mock_test_id, qid, sec) for qid, sec in question_ids_with_sections]
-        print("Before insert questions_data set len", len(questions_data))
-        # Bulk insert selected questions into NEETMockTestQuestions with section info, ignoring duplicates
-        # insert_query = """
-        # INSERT INTO NEETMockTestQuestions (MockTestID, QuestionID, Section) VALUES %s
-        # ON CONFLICT (MockTestID, QuestionID) DO NOTHING
-        # """
-        try:
-            insert_query = """
-            INSERT INTO NEETMockTestQuestions (MockTestID, QuestionID, Section) VALUES %s
-            """
-            psycopg2.extras.execute_values(cursor, insert_query, questions_data)
-        except Exception as e:
-            print("Exception error")
-            print(e)
+        print("Before insert questions_data set len", len(question_ids_with_sections))
         print("TEST INstance ID", test_instance_id)
-        # Insert into TestInstances
-        cursor.execute("INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType) VALUES (%s, %s, %s, 'Mock')", (test_instance_id, student_id, mock_test_id))
+        # The ID checks and all inserts go to the database in a single round trip
+        cursor.execute(INSERT_MOCK_TEST_SQL, {
+            "mock_test_id": mock_test_id,
+            "student_id": student_id,
+            "test_instance_id": test_instance_id,
+            "question_ids": [qid for qid, _ in question_ids_with_sections],
+            "sections": [sec for _, sec in question_ids_with_sections]
+        })
+        if cursor.fetchone() is None:
+            # MockTestID or TestInstanceID already exists
+            connection.rollback()
+            return False
 
         connection.commit()
         return True
@@ -380,6 +430,14 @@ def get_mock_test_questions(test_instance_id, student_id):
     :param student_id: ID of the student.
     :return: Dictionary with subject-wise and section-wise question details.
     """
+    # Cached per question bank version, like practice test payloads
+    version = question_bank_version()
+    key = cache_key("test_payload", "mock", test_instance_id, student_id, version) if version else None
+    if key:
+        questions_dict = cache_get("test_payload", key)
+        if questions_dict is not None:
+            return questions_dict, None
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
@@ -389,21 +447,16 @@ def get_mock_test_questions(test_instance_id, student_id):
     try:
         with conn.cursor() as cur:
             # First, get the MockTestID from the TestInstances table
-            cur.execute("""
-                SELECT TestID
-                FROM TestInstances
-                WHERE TestInstanceID = %s AND StudentID = %s AND TestType = 'Mock'
-            """, (test_instance_id, student_id))
-            
+            execute_prepared(cur, TEST_INSTANCE, (test_instance_id, student_id))
             result = cur.fetchone()
-            if not result:
+            if not result or result[0] != 'Mock':
                 return None, "No MockTestID found for the given TestInstanceID and StudentID."
 
-            mock_test_id = result[0]
+            mock_test_id = result[1]
 
-            # Fetch all question details using MockTestID in a single query
+            # Fetch the test's questions using MockTestID; their text comes from the question bank snapshot
             cur.execute("""
-                SELECT s.SubjectName, mtq.Section, q.QuestionID, q.Question, q.OptionA, q.OptionB, q.OptionC, q.OptionD, q.hasimage
+                SELECT s.SubjectName, mtq.Section, q.QuestionID
                 FROM NEETMockTestQuestions mtq
                 JOIN Questions q ON mtq.QuestionID = q.QuestionID
                 JOIN Chapters c ON q.ChapterID = c.ChapterID
@@ -411,26 +464,22 @@ def get_mock_test_questions(test_instance_id, student_id):
                 WHERE mtq.MockTestID = %s
                 ORDER BY s.SubjectName, mtq.Section, q.QuestionID
             """, (mock_test_id,)) 
-            #  i.ImageURL, i.ContentType  LEFT JOIN Images i ON q.QuestionID = i.QuestionID image_url, content_type
-            for row in cur.fetchall():
-                subject_name, section, question_id, question, option_a, option_b, option_c, option_d, hasimage = row
+            test_questions = cur.fetchall()
+            payloads = get_question_payloads(cur, [question_id for _, _, question_id in test_questions])
+
+            for subject_name, section, question_id in test_questions:
+                payload = payloads[question_id]
 
                 if subject_name not in questions_dict:
                     questions_dict[subject_name] = {"SectionA": [], "SectionB": []}
 
                 section_key = "SectionA" if section == 'A' else "SectionB"
-                image_list = []
-                if hasimage == True:
-                     cur.execute("""SELECT img.ImageURL, img.ContentType From images img where questionid=%s""",(question_id,))
-                     for row in cur.fetchall():
-                         image_url, content_type = row
-                         image_list.append({"URL": image_url, "Type": content_type}) 
                 # Organize question details
                 question_details = {
                     "QuestionID": question_id,
-                    "Question": question,
-                    "Options": {"A": option_a, "B": option_b, "C": option_c, "D": option_d},
-                    "Images": image_list
+                    "Question": payload["Question"],
+                    "Options": payload["Options"],
+                    "Images": payload["Images"] if payload["HasImage"] else []
                 }
 
                 # if image_url and content_type in ['QUE', 'OptionA', 'OptionB', 'OptionC', 'OptionD']:
@@ -445,6 +494,8 @@ def get_mock_test_questions(test_instance_id, student_id):
     finally:
         release_pg_connection(pg_connection_pool, conn)
 
+    if key:
+        cache_set("test_payload", key, questions_dict)
     return questions_dict, None
 
 
@@ -464,11 +515,11 @@ def get_questions_id_for_mock_test(testInstanceID, student_id):
 
     try:
         # First, get the MockTestID from the TestInstances table
-        cursor.execute("SELECT TestID FROM TestInstances WHERE TestInstanceID = %s AND StudentID = %s", (testInstanceID, student_id))
+        execute_prepared(cursor, TEST_INSTANCE, (testInstanceID, student_id))
         result = cursor.fetchone()
         if not result:
             raise Exception("No MockTestID found for the given TestInstanceID and StudentID.")
-        mock_test_id = result[0]
+        mock_test_id = result[1]
 
         # Now fetch the questions using MockTestID
         query = """
@@ -502,14 +553,11 @@ def submit_mock_test_answers(student_id, testInstanceID, answers):
     try:
         with conn.cursor() as cur:
             # Retrieve MockTestID from TestInstances
-            cur.execute("""
-                SELECT TestID FROM TestInstances
-                WHERE TestInstanceID = %s AND StudentID = %s
-            """, (testInstanceID, student_id))
+            execute_prepared(cur, TEST_INSTANCE, (testInstanceID, student_id))
             mock_test_result = cur.fetchone()
             if mock_test_result is None:
                 return None, "Mock test not found"
-            mock_test_id = mock_test_result[0]
+            mock_test_id = mock_test_result[1]
 
             # Record each student response
             for composite_key, response in answers.items():
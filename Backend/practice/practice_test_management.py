@@ -1,7 +1,87 @@
 import random
 from psycopg2 import DatabaseError
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.prepared_statements import TEST_INSTANCE, execute_prepared
 from Backend.dbconfig.cache_management import get_cached_questions, cache_questions
+from Backend.dbconfig.config import ITEM_STATISTICS_CONFIG, TEST_GENERATION_CONFIG
+from Backend.testmanagement.item_statistics import get_item_statistics, select_balanced_by_difficulty
+from Backend.testmanagement.question_bank import get_question_payloads, question_bank_version
+from Backend.dbconfig.shared_cache import cache_key, cache_get, cache_set
+from Backend.testmanagement.test_generation import use_database_engine, generate_practice_test_in_database
+
+# Writes a generated practice test in one statement: the test, its completion row, one
+# PracticeTestSubjects row per subject, the selected questions and the test instance.
+# Foreign keys are checked at the end of the statement, so the rows can reference each other.
+INSERT_PRACTICE_TEST_SQL = """
+    WITH test AS (
+        INSERT INTO PracticeTests (PracticeTestID, StudentID) VALUES (%(practice_test_id)s, %(student_id)s)
+        RETURNING PracticeTestID
+    ), completion AS (
+        INSERT INTO PracticeTestCompletion (PracticeTestID, StudentID, IsCompleted)
+        SELECT PracticeTestID, %(student_id)s, FALSE FROM test
+    ), subjects AS (
+        INSERT INTO PracticeTestSubjects (PracticeTestID, SubjectName)
+        SELECT test.PracticeTestID, S.SubjectName
+        FROM test, unnest(%(subject_names)s::TEXT[]) WITH ORDINALITY AS S(SubjectName, Position)
+        ORDER BY S.Position
+        RETURNING PracticeTestSubjectID, SubjectName
+    ), questions AS (
+        INSERT INTO PracticeTestQuestions (PracticeTestSubjectID, QuestionID)
+        SELECT subjects.PracticeTestSubjectID, Q.QuestionID
+        FROM unnest(%(question_subjects)s::TEXT[], %(question_ids)s::INT[]) WITH ORDINALITY AS Q(SubjectName, QuestionID, Position)
+        JOIN subjects ON subjects.SubjectName = Q.SubjectName
+        ORDER BY Q.Position
+    )
+    INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
+    SELECT %(test_instance_id)s, %(student_id)s, PracticeTestID, 'Practice' FROM test
+    RETURNING TestInstanceID
+"""
+
+# Records the answers to one subject of a practice test in one statement: scores and upserts the
+# responses, marks the subject completed and, when it was the last open subject, the whole test.
+# Sub-statements do not see each other's updates, hence the last-subject check excludes this subject.
+SUBMIT_PRACTICE_ANSWERS_SQL = """
+    WITH subject_test AS (
+        SELECT PTS.PracticeTestSubjectID, PTS.PracticeTestID
+        FROM TestInstances TI
+        JOIN PracticeTestSubjects PTS ON PTS.PracticeTestID = TI.TestID AND PTS.SubjectName = %(subject_name)s
+        WHERE TI.TestInstanceID = %(test_instance_id)s
+    ), responses AS (
+        INSERT INTO StudentResponses (TestInstanceID, StudentID, QuestionID, StudentResponse, AnsweringTimeInSeconds, AnswerCorrect)
+        SELECT %(test_instance_id)s, %(student_id)s, Q.QuestionID, A.StudentResponse, A.AnsweringTimeInSeconds,
+               lower(A.StudentResponse) = lower(Q.Answer)
+        FROM subject_test,
+             unnest(%(question_ids)s::INT[], %(responses)s::TEXT[], %(answering_times)s::INT[])
+                 AS A(QuestionID, StudentResponse, AnsweringTimeInSeconds)
+        JOIN Questions Q ON Q.QuestionID = A.QuestionID
+        ON CONFLICT (TestInstanceID, StudentID, QuestionID)
+        DO UPDATE SET 
+            StudentResponse = EXCLUDED.StudentResponse,
+            AnsweringTimeInSeconds = EXCLUDED.AnsweringTimeInSeconds,
+            AnswerCorrect = EXCLUDED.AnswerCorrect,
+            ResponseDate = CURRENT_TIMESTAMP
+    ), subject_completed AS (
+        UPDATE PracticeTestSubjects PTS
+        SET IsCompleted = TRUE
+        FROM subject_test
+        WHERE PTS.PracticeTestSubjectID = subject_test.PracticeTestSubjectID
+    ), test_completed AS (
+        INSERT INTO PracticeTestCompletion (PracticeTestID, StudentID, IsCompleted, CompletionDate)
+        SELECT PracticeTestID, %(student_id)s, TRUE, CURRENT_TIMESTAMP
+        FROM subject_test
+        WHERE NOT EXISTS (
+            SELECT 1 FROM PracticeTestSubjects PTS
+            WHERE PTS.PracticeTestID = subject_test.PracticeTestID AND PTS.IsCompleted = FALSE
+              AND PTS.PracticeTestSubjectID <> subject_test.PracticeTestSubjectID
+        )
+        ON CONFLICT (PracticeTestID, StudentID)
+        DO UPDATE SET 
+            IsCompleted = TRUE,
+            CompletionDate = CURRENT_TIMESTAMP
+    )
+    SELECT (SELECT TestID FROM TestInstances WHERE TestInstanceID = %(test_instance_id)s),
+           (SELECT PracticeTestSubjectID FROM subject_test)
+"""
 
 def fetch_chapters(cur, subject_id):
     print(f"Fetching chapters for subject ID: {subject_id}")
@@ -15,6 +95,21 @@ def fetch_chapters(cur, subject_id):
     return chapters
 
 def generate_practice_test(student_id):
+    subjects = {subject_id: dict(details) for subject_id, details in TEST_GENERATION_CONFIG["practice_subjects"].items()}
+    if use_database_engine():
+        test_instance_id, error = generate_practice_test_in_database(student_id)
+        if error:
+            return None, error
+        return {"testInstanceID": test_instance_id, "subject_tests": subjects}, None
+
+    # Read and written outside the connection below, as the cache may check out one of its own
+    print("Before getting cached questions")
+    used_questions = get_cached_questions(student_id, "practice")
+    print(f"Used questions from cache: {used_questions}")
+
+    if not isinstance(used_questions, list):
+        used_questions = []
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
@@ -24,67 +119,44 @@ def generate_practice_test(student_id):
             practice_test_id = random.randint(1000, 99999)
             print(f"Generated PracticeTestID: {practice_test_id}")
 
-            cur.execute("INSERT INTO PracticeTests (PracticeTestID, StudentID) VALUES (%s, %s) RETURNING PracticeTestID", (practice_test_id, student_id,))
-            # Ensure that the practice_test_id is actually inserted
-            assert cur.fetchone()[0] == practice_test_id
-
-            # Insert a default completion status for the new practice test
-            cur.execute("""
-                INSERT INTO PracticeTestCompletion (PracticeTestID, StudentID, IsCompleted)
-                VALUES (%s, %s, FALSE)
-            """, (practice_test_id, student_id,))
-
-            subjects = {
-                1: {"name": "Physics", "total_questions": 30},
-                2: {"name": "Chemistry", "total_questions": 30},
-                3: {"name": "Biology", "total_questions": 30}
-            }
-
-            print("Before getting cached questions")
-            used_questions = get_cached_questions(student_id, "practice")
-            print(f"Used questions from cache: {used_questions}")
-
-            if not isinstance(used_questions, list):
-                used_questions = []
-
+            question_subjects = []
+            question_ids = []
             for subject_id, details in subjects.items():
                 chapters = fetch_chapters(cur, subject_id)
                 questions = select_questions(cur, chapters, used_questions, details["total_questions"], subject_id, student_id)
 
-                cur.execute("""
-                    INSERT INTO PracticeTestSubjects (PracticeTestID, SubjectName)
-                    VALUES (%s, %s) RETURNING PracticeTestSubjectID
-                """, (practice_test_id, details["name"]))
-                subject_test_id = cur.fetchone()[0]
-
                 for question_id in questions:
-                    cur.execute("""
-                        INSERT INTO PracticeTestQuestions (PracticeTestSubjectID, QuestionID)
-                        VALUES (%s, %s)
-                    """, (subject_test_id, question_id))
+                    question_subjects.append(details["name"])
+                    question_ids.append(question_id)
                     if question_id not in used_questions:
                         used_questions.append(question_id)
 
-            print("Before Caching")
-            cache_questions(student_id, "practice", used_questions)
-            print("After Caching")
-
+            # All inserts go to the database in a single round trip
             test_instance_id = random.randint(1000, 99999)
-            cur.execute("""
-                INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
-                VALUES (%s, %s, %s, 'Practice') RETURNING TestInstanceID
-            """, (test_instance_id, student_id, practice_test_id,))
+            cur.execute(INSERT_PRACTICE_TEST_SQL, {
+                "practice_test_id": practice_test_id,
+                "student_id": student_id,
+                "subject_names": [details["name"] for details in subjects.values()],
+                "question_subjects": question_subjects,
+                "question_ids": question_ids,
+                "test_instance_id": test_instance_id
+            })
+            # Ensure that the test instance is actually inserted
             assert cur.fetchone()[0] == test_instance_id
 
             conn.commit()
             print("Practice test generated successfully")
-            return {"testInstanceID": test_instance_id, "subject_tests": subjects}, None
     except Exception as e:
         conn.rollback()
         return None, str(e)
     finally:
         release_pg_connection(pg_connection_pool, conn)
 
+    print("Before Caching")
+    cache_questions(student_id, "practice", used_questions)
+    print("After Caching")
+    return {"testInstanceID": test_instance_id, "subject_tests": subjects}, None
+
 def get_practice_test_details(instance_id: int, student_id: int):
     # Initialize the connection variable
     conn = None
@@ -239,7 +311,12 @@ def select_questions(cur, chapters, used_questions, total_questions, subject_id,
         # Exclude already used questions
         chapter_questions = [q for q in chapter_questions if q not in used_questions]
         all_questions.extend(chapter_questions)
-    selected_questions = weighted_question_selection(all_questions, chapters_weightage, total_questions, used_questions)
+    if ITEM_STATISTICS_CONFIG["difficulty_balanced_selection"]:
+        # Oversample by chapter weightage, then balance the pool by observed difficulty
+        candidates = weighted_question_selection(all_questions, chapters_weightage, total_questions * ITEM_STATISTICS_CONFIG["selection_oversample"], used_questions)
+        selected_questions = select_balanced_by_difficulty(candidates, total_questions, get_item_statistics(candidates))
+    else:
+        selected_questions = weighted_question_selection(all_questions, chapters_weightage, total_questions, used_questions)
     # Randomly select questions ensuring no repetition
     while len(selected_questions) < total_questions and all_questions:
         selected_question = random.choice(all_questions)
@@ -258,17 +335,12 @@ def get_practice_test_question_ids(test_instance_id, student_id):
     try:
         with conn.cursor() as cur:
             # First, retrieve the PracticeTestID from the TestInstances table
-            cur.execute("""
-                SELECT TestID
-                FROM TestInstances
-                WHERE TestInstanceID = %s AND StudentID = %s AND TestType = 'Practice'
-            """, (test_instance_id, student_id))
-            
+            execute_prepared(cur, TEST_INSTANCE, (test_instance_id, student_id))
             result = cur.fetchone()
-            if result is None:
+            if result is None or result[0] != 'Practice':
                 return None, "Test instance not found or not a practice test."
 
-            practice_test_id = result[0]
+            practice_test_id = result[1]
 
             # Now, fetch the questions associated with the practice test
             cur.execute("""
@@ -292,6 +364,14 @@ def get_practice_test_question_ids(test_instance_id, student_id):
         release_pg_connection(pg_connection_pool, conn)
 
 def get_practice_test_questions(test_instance_id, student_id):
+    # A test's questions never change, so only a new question bank version retires the cached payload
+    version = question_bank_version()
+    key = cache_key("test_payload", "practice", test_instance_id, student_id, version) if version else None
+    if key:
+        subject_questions = cache_get("test_payload", key)
+        if subject_questions is not None:
+            return subject_questions, None
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
@@ -299,17 +379,12 @@ def get_practice_test_questions(test_instance_id, student_id):
     try:
         with conn.cursor() as cur:
             # First, retrieve the PracticeTestID from the TestInstances table
-            cur.execute("""
-                SELECT TestID
-                FROM TestInstances
-                WHERE TestInstanceID = %s AND StudentID = %s AND TestType = 'Practice'
-            """, (test_instance_id, student_id))
-            
+            execute_prepared(cur, TEST_INSTANCE, (test_instance_id, student_id))
             result = cur.fetchone()
-            if result is None:
+            if result is None or result[0] != 'Practice':
                 return None, "Test instance not found or not a practice test."
 
-            practice_test_id = result[0]
+            practice_test_id = result[1]
 
             # Now, fetch the questions associated with the practice test
             cur.execute("""
@@ -321,40 +396,34 @@ def get_practice_test_questions(test_instance_id, student_id):
                 WHERE PT.PracticeTestID = %s AND PT.StudentID = %s
             """, (practice_test_id, student_id))
 
+            test_questions = cur.fetchall()
+            # Question details including answer and explanation, from the question bank snapshot
+            payloads = get_question_payloads(cur, [question_id for _, question_id in test_questions])
+
             subject_questions = {}
-            for subject_name, question_id in cur.fetchall():
-                # For each question ID, fetch question details including answer and explanation
-                cur.execute("""
-                    SELECT Q.Question, Q.OptionA, Q.OptionB, Q.OptionC, Q.OptionD, Q.Answer, Q.Explanation, I.ImageURL, I.ContentType
-                    FROM Questions Q
-                    LEFT JOIN Images I ON Q.QuestionID = I.QuestionID
-                    WHERE Q.QuestionID = %s
-                """, (question_id,))
-                questions = cur.fetchall()
-
-                question_details = {}
-                for q in questions:
-                    if not question_details:
-                        # Now includes answer and explanation in the question details
-                        question_details = {
-                            "Question": q[0],
-                            "Options": {"A": q[1], "B": q[2], "C": q[3], "D": q[4]},
-                            "Answer": q[5],
-                            "Explanation": q[6],
-                            "Images": []
-                        }
-                    if q[7] and q[8] in ['QUE', 'OptionA', 'OptionB', 'OptionC', 'OptionD', 'EXP']:
-                        question_details["Images"].append({"URL": q[7], "Type": q[8]})
+            for subject_name, question_id in test_questions:
+                payload = payloads[question_id]
+                question_details = {
+                    "Question": payload["Question"],
+                    "Options": payload["Options"],
+                    "Answer": payload["Answer"],
+                    "Explanation": payload["Explanation"],
+                    "Images": [image for image in payload["Images"]
+                               if image["Type"] in ['QUE', 'OptionA', 'OptionB', 'OptionC', 'OptionD', 'EXP']]
+                }
 
                 if subject_name not in subject_questions:
                     subject_questions[subject_name] = []
                 subject_questions[subject_name].append(question_details)
-            return subject_questions, None
     except Exception as e:
         return None, str(e)
     finally:
         release_pg_connection(pg_connection_pool, conn)
 
+    if key:
+        cache_set("test_payload", key, subject_questions)
+    return subject_questions, None
+
 
 
 def submit_practice_test_answers(student_id, testInstanceID, subject_ID, answers):
@@ -371,81 +440,23 @@ def submit_practice_test_answers(student_id, testInstanceID, subject_ID, answers
 
     try:
         with conn.cursor() as cur:
-            # Retrieve TestID (which is the PracticeTestID) related to TestInstanceID
-            cur.execute("""
-                SELECT TestID FROM TestInstances
-                WHERE TestInstanceID = %s
-            """, (testInstanceID,))
-            practice_test_result = cur.fetchone()
-            if practice_test_result is None:
+            # Responses, subject completion and test completion are written in a single round trip
+            cur.execute(SUBMIT_PRACTICE_ANSWERS_SQL, {
+                "test_instance_id": testInstanceID,
+                "student_id": student_id,
+                "subject_name": subject_id,
+                "question_ids": [int(question_id) for question_id in answers],
+                "responses": [response.get('answer', '') for response in answers.values()],
+                "answering_times": [response.get('time', 60) for response in answers.values()]
+            })
+            practice_test_id, subject_test_id = cur.fetchone()
+            if practice_test_id is None:
+                conn.rollback()
                 return "Practice test not found"
-
-            practice_test_id = practice_test_result[0]
-
-            # Retrieve PracticeTestSubjectID for the subject test
-            cur.execute("""
-                SELECT PracticeTestSubjectID FROM PracticeTestSubjects
-                WHERE PracticeTestID = %s AND SubjectName = %s
-            """, (practice_test_id, subject_id))
-            subject_test_result = cur.fetchone()
-            if subject_test_result is None:
+            if subject_test_id is None:
+                conn.rollback()
                 return "Subject test not found"
 
-            subject_test_id = subject_test_result[0]
-
-            for question_id, response in answers.items():
-                answering_time = response.get('time', 60)
-                student_response = response.get('answer', '')
-
-                # Retrieve the correct answer for the question
-                cur.execute("""
-                    SELECT Answer FROM Questions
-                    WHERE QuestionID = %s
-                """, (question_id,))
-                correct_answer_result = cur.fetchone()
-                if correct_answer_result is None:
-                    continue  # Skip if question not found
-                correct_answer = correct_answer_result[0]
-
-                # Determine if the answer is correct
-                answer_correct = (student_response.lower() == correct_answer.lower())
-
-                # Record the student response along with correctness
-                cur.execute("""
-                    INSERT INTO StudentResponses (TestInstanceID, StudentID, QuestionID, StudentResponse, AnsweringTimeInSeconds, AnswerCorrect)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (TestInstanceID, StudentID, QuestionID)
-                    DO UPDATE SET 
-                        StudentResponse = EXCLUDED.StudentResponse,
-                        AnsweringTimeInSeconds = EXCLUDED.AnsweringTimeInSeconds,
-                        AnswerCorrect = EXCLUDED.AnswerCorrect,
-                        ResponseDate = CURRENT_TIMESTAMP
-                """, (testInstanceID, student_id, question_id, student_response, answering_time, answer_correct))
-
-            # Mark subject test as completed
-            cur.execute("""
-                UPDATE PracticeTestSubjects
-                SET IsCompleted = TRUE
-                WHERE PracticeTestSubjectID = %s
-            """, (subject_test_id,))
-
-            # Check if all subject tests are completed for the practice test
-            cur.execute("""
-                SELECT COUNT(*) FROM PracticeTestSubjects
-                WHERE PracticeTestID = %s AND IsCompleted = FALSE
-            """, (practice_test_id,))
-            remaining_tests = cur.fetchone()[0]
-            if remaining_tests == 0:
-                # Mark the full practice test as completed
-                cur.execute("""
-                    INSERT INTO PracticeTestCompletion (PracticeTestID, StudentID, IsCompleted, CompletionDate)
-                    VALUES (%s, %s, TRUE, CURRENT_TIMESTAMP)
-                    ON CONFLICT (PracticeTestID, StudentID)
-                    DO UPDATE SET 
-                        IsCompleted = TRUE,
-                        CompletionDate = CURRENT_TIMESTAMP
-                """, (practice_test_id, student_id))
-
             conn.commit()
             return {"message": "Answers submitted successfully."}
     except Exception as e:
@@ -0,0 +1,58 @@
+import asyncio
+from Backend.executors import run_in_pool
+from Backend.metrics import Counter, register_metric
+
+singleflight_calls_total = register_metric(Counter(
+    "singleflight_calls_total", "Coalesced reads by operation, split into executed (leader) and shared (coalesced) calls.",
+    ("operation", "outcome")))
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a computation for a key is in flight, later
+    callers with the same key wait for it and share its result (or exception) instead of
+    starting their own.
+
+    The computation runs as its own task, so a caller that goes away (e.g. a client disconnect
+    cancelling its request) does not cancel it for the callers still waiting. Scope is one event
+    loop, i.e. one worker process.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+
+    async def do(self, key, factory, operation=None):
+        """
+        :param key: Hashable key identifying identical calls.
+        :param factory: Function returning the awaitable to run when no call for key is in flight.
+        :param operation: Label used in metrics, defaults to the first element of key.
+        """
+        operation = operation or (key[0] if isinstance(key, tuple) else str(key))
+        task = self.in_flight.get(key)
+        if task is None:
+            singleflight_calls_total.inc(operation, "leader")
+            task = asyncio.ensure_future(factory())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            singleflight_calls_total.inc(operation, "coalesced")
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller has gone away
+            task.exception()
+
+
+_group = SingleFlight()
+
+
+async def run_coalesced(pool_name, func, *args):
+    """
+    Like run_in_pool, but identical concurrent calls (same function and arguments) share one execution.
+    Only meant for read-only functions whose result can be shared between requests.
+    """
+    key = (func.__qualname__, *args)
+    return await _group.do(key, lambda: run_in_pool(pool_name, func, *args), operation=func.__qualname__)
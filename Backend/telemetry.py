@@ -0,0 +1,303 @@
+import collections
+import json
+import os
+import random
+import threading
+import time
+from opentelemetry import trace
+from opentelemetry.trace import StatusCode
+from Backend.dbconfig.config import TELEMETRY_CONFIG
+from Backend.metrics import Counter, Gauge, register_collector
+
+_configured = False
+_configure_lock = threading.Lock()
+
+# Per-process tracing overhead counters, rendered on /metrics
+_stats_lock = threading.Lock()
+_stats = collections.Counter()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def get_connection_string():
+    # Never stored in the repository; set it in the deployment environment
+    return os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
+
+
+def get_exporter_name():
+    return os.getenv("TELEMETRY_EXPORTER") or TELEMETRY_CONFIG["exporter"]
+
+
+def instrument_app(app):
+    """
+    Adds OpenTelemetry request tracing to the FastAPI app. Must run before the app starts.
+    Spans go to the global tracer provider, so they are exported once configure_telemetry has run.
+    """
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(app)
+
+
+def _head_sample_rate(route):
+    return TELEMETRY_CONFIG["head_route_sample_rates"].get(route, TELEMETRY_CONFIG["head_sample_rate"])
+
+
+def _tail_sample_rate(route):
+    return TELEMETRY_CONFIG["tail_route_sample_rates"].get(route, TELEMETRY_CONFIG["tail_sample_rate"])
+
+
+def _build_sampler():
+    from opentelemetry.sdk.trace.sampling import Decision, ParentBased, Sampler, SamplingResult
+
+    class RouteSampler(Sampler):
+        """
+        Head sampler for request spans using a per-route rate (keyed by the http.route template).
+        Unsampled requests are never recorded, so they cost almost nothing; recorded ones are
+        left to TailSamplingProcessor.
+        """
+
+        def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None):
+            route = (attributes or {}).get("http.route")
+            if random.random() < _head_sample_rate(route):
+                _count("head_sampled")
+                return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, trace_state)
+            _count("head_dropped")
+            return SamplingResult(Decision.DROP, None, trace_state)
+
+        def get_description(self):
+            return "RouteSampler"
+
+    # Child spans follow the decision taken for their request. The route decides for requests that
+    # arrive with a trace context too, whatever its sampled flag says: errors and slow requests on
+    # recorded routes must reach the tail sampler.
+    route_sampler = RouteSampler()
+    return ParentBased(root=route_sampler, remote_parent_sampled=route_sampler, remote_parent_not_sampled=route_sampler)
+
+
+def _build_processors(exporter):
+    from opentelemetry.sdk.trace import SpanProcessor
+
+    class BoundedBatchSpanProcessor(SpanProcessor):
+        """
+        Exports finished spans in batches from a background thread. The queue is bounded and a
+        full queue drops the span (counted as dropped) instead of blocking the request thread.
+        """
+
+        def __init__(self, exporter):
+            self.exporter = exporter
+            self.queue = collections.deque()
+            self.condition = threading.Condition()
+            self.done = False
+            self.thread = threading.Thread(target=self._worker, name="telemetry-export", daemon=True)
+            self.thread.start()
+
+        def on_end(self, span):
+            with self.condition:
+                if len(self.queue) >= TELEMETRY_CONFIG["max_queue_size"]:
+                    _count("queue_dropped")
+                    return
+                self.queue.append(span)
+                if len(self.queue) >= TELEMETRY_CONFIG["max_export_batch_size"]:
+                    self.condition.notify()
+
+        def queue_size(self):
+            return len(self.queue)
+
+        def _take_batch(self):
+            with self.condition:
+                batch_size = min(len(self.queue), TELEMETRY_CONFIG["max_export_batch_size"])
+                return [self.queue.popleft() for _ in range(batch_size)]
+
+        def _export(self, batch):
+            start = time.perf_counter()
+            try:
+                self.exporter.export(batch)
+                _count("exported", len(batch))
+            except Exception as e:
+                _count("export_errors")
+                print(f"Error exporting spans: {e}")
+            _count("export_microseconds", int((time.perf_counter() - start) * 1e6))
+
+        def _worker(self):
+            while True:
+                with self.condition:
+                    if not self.done and len(self.queue) < TELEMETRY_CONFIG["max_export_batch_size"]:
+                        self.condition.wait(TELEMETRY_CONFIG["export_interval_seconds"])
+                    if self.done and not self.queue:
+                        return
+                batch = self._take_batch()
+                while batch:
+                    self._export(batch)
+                    batch = self._take_batch()
+
+        def force_flush(self, timeout_millis=30000):
+            batch = self._take_batch()
+            while batch:
+                self._export(batch)
+                batch = self._take_batch()
+            return True
+
+        def shutdown(self):
+            with self.condition:
+                self.done = True
+                self.condition.notify()
+            self.thread.join(timeout=TELEMETRY_CONFIG["export_interval_seconds"])
+            self.exporter.shutdown()
+
+    class TailSamplingProcessor(SpanProcessor):
+        """
+        Decides when a recorded trace's local root span ends whether it is exported: errors and
+        slow requests always, the rest at the route's rate (tail_route_sample_rates, keyed by the
+        http.route template, else tail_sample_rate). Child spans, which end first, wait in a
+        bounded buffer; the oldest trace is discarded when more than max_buffered_traces are pending.
+        """
+
+        def __init__(self, downstream):
+            self.downstream = downstream
+            self.pending = collections.OrderedDict()    # trace_id -> [spans]
+            self.lock = threading.Lock()
+
+        def on_end(self, span):
+            trace_id = span.context.trace_id
+            if span.parent is not None and not span.parent.is_remote:
+                with self.lock:
+                    spans = self.pending.get(trace_id)
+                    if spans is None:
+                        if len(self.pending) >= TELEMETRY_CONFIG["max_buffered_traces"]:
+                            _, evicted = self.pending.popitem(last=False)
+                            _count("tail_evicted", len(evicted))
+                        spans = self.pending[trace_id] = []
+                    spans.append(span)
+                return
+
+            with self.lock:
+                children = self.pending.pop(trace_id, [])
+            duration = (span.end_time - span.start_time) / 1e9
+            keep = (span.status.status_code == StatusCode.ERROR
+                    or duration >= TELEMETRY_CONFIG["slow_trace_seconds"]
+                    or random.random() < _tail_sample_rate((span.attributes or {}).get("http.route")))
+            if not keep:
+                _count("tail_dropped", len(children) + 1)
+                return
+            _count("tail_kept", len(children) + 1)
+            for child in children:
+                self.downstream.on_end(child)
+            self.downstream.on_end(span)
+
+        def force_flush(self, timeout_millis=30000):
+            return self.downstream.force_flush(timeout_millis)
+
+        def shutdown(self):
+            self.downstream.shutdown()
+
+    batch_processor = BoundedBatchSpanProcessor(exporter)
+    return TailSamplingProcessor(batch_processor), batch_processor
+
+
+def _build_exporter(name):
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SpanExporter, SpanExportResult
+
+    class FileSpanExporter(SpanExporter):
+        """
+        Appends spans as JSON lines to a local file, for environments without network access.
+        """
+
+        def __init__(self, path):
+            self.path = path
+            self.lock = threading.Lock()
+
+        def export(self, spans):
+            lines = [json.dumps(json.loads(span.to_json(indent=None))) + "\n" for span in spans]
+            with self.lock, open(self.path, "a") as file:
+                file.writelines(lines)
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        return FileSpanExporter(TELEMETRY_CONFIG["file_path"])
+    if name == "azure":
+        connection_string = get_connection_string()
+        if not connection_string:
+            print("APPLICATIONINSIGHTS_CONNECTION_STRING is not set")
+            return None
+        # The Azure Monitor exporter is by far the slowest import of the service, so it is only loaded here
+        from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+        return AzureMonitorTraceExporter(connection_string=connection_string)
+    return None
+
+
+_batch_processor = None
+
+
+def _configure_tracing(exporter_name):
+    global _configured, _batch_processor
+    with _configure_lock:
+        if _configured:
+            return
+        try:
+            from opentelemetry.sdk.trace import TracerProvider
+            exporter = _build_exporter(exporter_name)
+            if exporter is None:
+                print("Tracing export disabled")
+                return
+            provider = TracerProvider(sampler=_build_sampler())
+            tail_processor, _batch_processor = _build_processors(exporter)
+            provider.add_span_processor(tail_processor)
+            trace.set_tracer_provider(provider)
+            _configured = True
+            print(f"Tracing configured with the {exporter_name} exporter")
+        except Exception as e:
+            print(f"Error configuring tracing: {e}")
+
+
+def configure_telemetry():
+    """
+    Configures trace sampling and export for this worker process, in the background unless
+    TELEMETRY_CONFIG["configure_in_background"] is off.
+
+    :return: The background thread, or None if configuration ran inline.
+    """
+    exporter_name = get_exporter_name()
+    if not TELEMETRY_CONFIG["configure_in_background"]:
+        _configure_tracing(exporter_name)
+        return None
+    thread = threading.Thread(target=_configure_tracing, args=(exporter_name,), name="telemetry-setup", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown_telemetry():
+    """
+    Flushes queued spans and stops the exporter thread.
+    """
+    provider = trace.get_tracer_provider()
+    if _configured and hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+def telemetry_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queue_size"] = _batch_processor.queue_size() if _batch_processor else 0
+    return stats
+
+
+@register_collector
+def _telemetry_metrics():
+    stats = telemetry_stats()
+    spans = Counter("telemetry_spans_total", "Spans and traces by sampling or export outcome.", ("outcome",))
+    for outcome in ("head_sampled", "head_dropped", "tail_kept", "tail_dropped", "tail_evicted", "queue_dropped", "exported"):
+        spans.inc(outcome, amount=stats.get(outcome, 0))
+    errors = Counter("telemetry_export_errors_total", "Failed span export batches.")
+    errors.inc(amount=stats.get("export_errors", 0))
+    export_time = Counter("telemetry_export_seconds_total", "Time spent exporting spans.")
+    export_time.inc(amount=stats.get("export_microseconds", 0) / 1e6)
+    queue = Gauge("telemetry_export_queue_size", "Spans waiting to be exported.")
+    queue.set(value=stats["queue_size"])
+    return [spans, errors, export_time, queue]
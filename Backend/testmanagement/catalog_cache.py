@@ -0,0 +1,148 @@
+import threading
+import time
+from Backend.dbconfig.config import CATALOG_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.invalidation import cache_ttl, subscribe
+
+
+class Catalog:
+    """
+    Immutable snapshot of the content catalog (Chapters and Subtopics) at one CatalogVersion.
+    A new snapshot is built on reload, so readers never see a half-updated catalog.
+    """
+
+    def __init__(self, version, chapters, subtopics):
+        self.version = version
+        self.chapters = chapters        # List of chapter dicts ordered by ChapterID
+        self.subtopics = subtopics      # List of subtopic dicts ordered by SubtopicID
+
+        # Dropdown data per subject ID used by the API (Biology = Botany + Zoology)
+        self.chapter_names = {}
+        for subject_id, subject_ids in {1: (1,), 2: (2,), 3: (3, 4)}.items():
+            active = [c for c in chapters if c["SubjectID"] in subject_ids and c["IsActive"]]
+            active.sort(key=lambda c: c["ChapterNumber"])
+            self.chapter_names[subject_id] = {c["ChapterTitle"]: c["ChapterID"] for c in active}
+
+
+_catalog = None
+_last_version_check = 0.0
+_catalog_invalidated_at = 0.0
+_catalog_lock = threading.Lock()         # One reload at a time
+_invalidation_lock = threading.Lock()    # Orders reloads being stored against invalidations
+
+
+def _load_catalog(cur):
+    cur.execute("SELECT Version FROM CatalogVersion")
+    version = cur.fetchone()[0]
+
+    cur.execute("""
+        SELECT ChapterID, SubjectID, ChapterTitle, ChapterNumber, IsActive IS TRUE
+        FROM Chapters
+        ORDER BY ChapterID
+    """)
+    chapters = [{
+        "ChapterID": row[0],
+        "SubjectID": row[1],
+        "ChapterTitle": row[2],
+        "ChapterNumber": row[3],
+        "IsActive": row[4]
+    } for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT SubtopicID, ChapterID, SubtopicName
+        FROM Subtopics
+        ORDER BY SubtopicID
+    """)
+    subtopics = [{
+        "SubtopicID": row[0],
+        "ChapterID": row[1],
+        "SubtopicName": row[2]
+    } for row in cur.fetchall()]
+
+    return Catalog(version, chapters, subtopics)
+
+
+def _refresh_catalog(cur, known_version):
+    global _catalog, _last_version_check
+
+    with _catalog_lock:
+        started = time.monotonic()
+        catalog = _catalog
+        if known_version is None:
+            cur.execute("SELECT Version FROM CatalogVersion")
+            known_version = cur.fetchone()[0]
+        if catalog is None or catalog.version != known_version:
+            catalog = _load_catalog(cur)
+            print(f"Loaded content catalog version {catalog.version}")
+        with _invalidation_lock:
+            # Neither kept nor marked checked if an invalidation arrived while it was being read
+            if started > _catalog_invalidated_at:
+                _catalog = catalog
+                _last_version_check = time.monotonic()
+        return catalog
+
+
+def get_catalog(cur=None, known_version=None):
+    """
+    Returns the in-process catalog, reloading it if it is out of date.
+
+    :param cur: Open cursor to use if the catalog has to be checked or reloaded. When omitted,
+                a pooled connection is taken only if the database actually has to be read.
+    :param known_version: CatalogVersion the caller has already read in its own query. When
+                          omitted, the version is re-checked at most every
+                          CATALOG_CONFIG["version_check_seconds"], or less often while
+                          catalog changes are pushed by the invalidation listener.
+    :return: Catalog snapshot.
+    """
+    catalog = _catalog
+    if catalog is not None:
+        if known_version is not None and known_version == catalog.version:
+            return catalog
+        if known_version is None and time.monotonic() - _last_version_check < cache_ttl(CATALOG_CONFIG["version_check_seconds"]):
+            return catalog
+
+    if cur is not None:
+        return _refresh_catalog(cur, known_version)
+
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        if catalog is not None:
+            return catalog  # Serve the last known catalog rather than fail
+        raise RuntimeError("Database connection failed")
+    try:
+        with conn.cursor() as own_cur:
+            return _refresh_catalog(own_cur, known_version)
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+
+def get_catalog_version():
+    """
+    Returns the version of the catalog currently held in memory, or None if not loaded.
+    """
+    catalog = _catalog
+    return catalog.version if catalog is not None else None
+
+
+def load_catalog():
+    """
+    Loads the catalog eagerly, e.g. at worker startup.
+    """
+    try:
+        return get_catalog(), None
+    except Exception as e:
+        return None, str(e)
+
+
+def invalidate_catalog():
+    """
+    Drops the in-process catalog so the next request reloads it.
+    """
+    global _catalog, _catalog_invalidated_at
+    with _invalidation_lock:
+        _catalog_invalidated_at = time.monotonic()
+        _catalog = None
+
+
+# The CatalogVersion triggers notify every worker
+subscribe("catalog", lambda key: invalidate_catalog())
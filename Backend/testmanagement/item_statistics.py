@@ -0,0 +1,264 @@
+import argparse
+import random
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2.extras
+from Backend.dbconfig.config import ITEM_STATISTICS_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+
+# Merges a batch of per-question aggregates into QuestionStatistics.
+# Answering-time mean and M2 (sum of squared deviations) are combined with the
+# parallel variance formula, so batches can be applied in any order.
+MERGE_STATISTICS_SQL = """
+    INSERT INTO QuestionStatistics AS QS (QuestionID, Attempts, CorrectCount, IncorrectCount, SkippedCount,
+                                          TimeSamples, MeanAnsweringTime, M2AnsweringTime)
+    VALUES %s
+    ON CONFLICT (QuestionID) DO UPDATE SET
+        Attempts = QS.Attempts + EXCLUDED.Attempts,
+        CorrectCount = QS.CorrectCount + EXCLUDED.CorrectCount,
+        IncorrectCount = QS.IncorrectCount + EXCLUDED.IncorrectCount,
+        SkippedCount = QS.SkippedCount + EXCLUDED.SkippedCount,
+        TimeSamples = QS.TimeSamples + EXCLUDED.TimeSamples,
+        MeanAnsweringTime = CASE WHEN QS.TimeSamples + EXCLUDED.TimeSamples = 0 THEN 0
+            ELSE (QS.MeanAnsweringTime * QS.TimeSamples + EXCLUDED.MeanAnsweringTime * EXCLUDED.TimeSamples)
+                 / (QS.TimeSamples + EXCLUDED.TimeSamples) END,
+        M2AnsweringTime = CASE WHEN QS.TimeSamples + EXCLUDED.TimeSamples = 0 THEN 0
+            ELSE QS.M2AnsweringTime + EXCLUDED.M2AnsweringTime
+                 + (EXCLUDED.MeanAnsweringTime - QS.MeanAnsweringTime) ^ 2
+                   * QS.TimeSamples * EXCLUDED.TimeSamples / (QS.TimeSamples + EXCLUDED.TimeSamples) END,
+        UpdatedAt = CURRENT_TIMESTAMP
+"""
+
+
+def aggregate_responses(scored_responses):
+    """
+    Aggregates scored responses per question using Welford's online algorithm.
+
+    :param scored_responses: Iterable of (question_id, correct, incorrect, answering_time) tuples,
+                             where a response that is neither correct nor incorrect was skipped.
+    :return: List of rows matching the QuestionStatistics merge columns.
+    """
+    aggregates = {}
+    for question_id, correct, incorrect, answering_time in scored_responses:
+        entry = aggregates.get(question_id)
+        if entry is None:
+            # attempts, correct, incorrect, skipped, time samples, mean, m2
+            entry = aggregates[question_id] = [0, 0, 0, 0, 0, 0.0, 0.0]
+        entry[0] += 1
+        if correct:
+            entry[1] += 1
+        elif incorrect:
+            entry[2] += 1
+        else:
+            entry[3] += 1
+        if answering_time is not None:
+            entry[4] += 1
+            delta = answering_time - entry[5]
+            entry[5] += delta / entry[4]
+            entry[6] += delta * (answering_time - entry[5])
+
+    return [(question_id, *entry) for question_id, entry in aggregates.items()]
+
+
+def update_item_statistics(cur, student_id, test_instance_id, scored_responses):
+    """
+    Folds freshly scored responses into QuestionStatistics, inside the scoring transaction.
+
+    Responses are claimed through StudentResponses.StatsRecorded first, so re-scoring the same
+    test instance (or racing the backfill job) never counts a response twice.
+
+    :param cur: Cursor of the scoring transaction.
+    :param student_id: ID of the student.
+    :param test_instance_id: ID of the scored test instance.
+    :param scored_responses: List of (question_id, correct, incorrect, answering_time) tuples.
+    """
+    if not scored_responses:
+        return
+
+    cur.execute("""
+        UPDATE StudentResponses
+        SET StatsRecorded = TRUE
+        WHERE StudentID = %s AND TestInstanceID = %s AND QuestionID = ANY(%s) AND NOT StatsRecorded
+        RETURNING QuestionID
+    """, (student_id, test_instance_id, [response[0] for response in scored_responses]))
+    claimed = {row[0] for row in cur.fetchall()}
+    if not claimed:
+        return
+
+    rows = aggregate_responses(response for response in scored_responses if response[0] in claimed)
+    psycopg2.extras.execute_values(cur, MERGE_STATISTICS_SQL, rows)
+
+
+def _backfill_range(first_question_id, last_question_id):
+    """
+    Backfills QuestionStatistics for one QuestionID range in a single transaction.
+    Only scored responses that have not been counted yet are claimed and aggregated.
+    """
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        return None, "Database connection failed"
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                WITH claimed AS (
+                    UPDATE StudentResponses
+                    SET StatsRecorded = TRUE
+                    WHERE QuestionID BETWEEN %s AND %s AND NOT StatsRecorded AND AnswerCorrect IS NOT NULL
+                    RETURNING QuestionID, AnswerCorrect, AnsweringTimeInSeconds,
+                              LOWER(TRIM(COALESCE(StudentResponse, ''))) IN ('', 'na') AS Skipped
+                )
+                INSERT INTO QuestionStatistics AS QS (QuestionID, Attempts, CorrectCount, IncorrectCount, SkippedCount,
+                                                      TimeSamples, MeanAnsweringTime, M2AnsweringTime)
+                SELECT QuestionID,
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE AnswerCorrect),
+                       COUNT(*) FILTER (WHERE NOT AnswerCorrect AND NOT Skipped),
+                       COUNT(*) FILTER (WHERE NOT AnswerCorrect AND Skipped),
+                       COUNT(AnsweringTimeInSeconds),
+                       COALESCE(AVG(AnsweringTimeInSeconds), 0),
+                       COALESCE(VAR_POP(AnsweringTimeInSeconds) * COUNT(AnsweringTimeInSeconds), 0)
+                FROM claimed
+                GROUP BY QuestionID
+            """ + MERGE_STATISTICS_SQL[MERGE_STATISTICS_SQL.index("ON CONFLICT"):], (first_question_id, last_question_id))
+            updated = cur.rowcount
+            conn.commit()
+            return updated, None
+    except Exception as e:
+        conn.rollback()
+        return None, f"Error backfilling questions {first_question_id}-{last_question_id}: {e}"
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+
+def backfill_item_statistics(workers=None, chunk_size=None):
+    """
+    Builds QuestionStatistics from all scored StudentResponses, splitting the QuestionID
+    space into chunks that are processed in parallel, each on its own pooled connection.
+    Safe to re-run and to run while the service is scoring tests.
+
+    :param workers: Number of parallel workers.
+    :param chunk_size: Number of QuestionIDs per transaction.
+    :return: Number of question rows written and a list of per-chunk errors.
+    """
+    workers = workers or ITEM_STATISTICS_CONFIG["backfill_workers"]
+    chunk_size = chunk_size or ITEM_STATISTICS_CONFIG["backfill_chunk_size"]
+
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        return 0, ["Database connection failed"]
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MIN(QuestionID), MAX(QuestionID) FROM Questions")
+            min_id, max_id = cur.fetchone()
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+    if min_id is None:
+        return 0, []
+
+    ranges = [(start, min(start + chunk_size - 1, max_id)) for start in range(min_id, max_id + 1, chunk_size)]
+    total_updated = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for updated, error in executor.map(lambda r: _backfill_range(*r), ranges):
+            if error:
+                errors.append(error)
+            else:
+                total_updated += updated
+
+    print(f"Item statistics backfill updated {total_updated} questions in {len(ranges)} chunks, {len(errors)} errors")
+    return total_updated, errors
+
+
+def get_item_statistics(question_ids):
+    """
+    Retrieves item statistics for a set of questions in one query.
+
+    :param question_ids: Iterable of question IDs.
+    :return: Dictionary of question ID to statistics; questions never scored are absent.
+    """
+    question_ids = list(set(question_ids))
+    if not question_ids:
+        return {}
+
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        return {}
+
+    statistics = {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT QuestionID, Attempts, CorrectCount, IncorrectCount, SkippedCount,
+                       TimeSamples, MeanAnsweringTime, M2AnsweringTime
+                FROM QuestionStatistics
+                WHERE QuestionID = ANY(%s)
+            """, (question_ids,))
+            for question_id, attempts, correct, incorrect, skipped, time_samples, mean_time, m2_time in cur.fetchall():
+                answered = correct + incorrect
+                statistics[question_id] = {
+                    "attempts": attempts,
+                    "correct_rate": correct / answered if answered else None,
+                    "skip_rate": skipped / attempts if attempts else None,
+                    "mean_answering_time": mean_time if time_samples else None,
+                    "answering_time_variance": m2_time / time_samples if time_samples else None,
+                    "answered": answered
+                }
+    except Exception as e:
+        print(f"Error fetching item statistics: {e}")
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+    return statistics
+
+
+def difficulty_band(statistics):
+    """
+    Classifies a question as 'easy', 'medium' or 'hard' from its observed correct rate.
+    Questions without enough answered attempts are treated as 'medium'.
+    """
+    if not statistics or statistics["answered"] < ITEM_STATISTICS_CONFIG["min_answered_for_difficulty"]:
+        return "medium"
+    if statistics["correct_rate"] >= ITEM_STATISTICS_CONFIG["easy_correct_rate"]:
+        return "easy"
+    if statistics["correct_rate"] <= ITEM_STATISTICS_CONFIG["hard_correct_rate"]:
+        return "hard"
+    return "medium"
+
+
+def select_balanced_by_difficulty(question_ids, num_questions, statistics):
+    """
+    Picks num_questions from question_ids following ITEM_STATISTICS_CONFIG["difficulty_mix"].
+    Bands that run short are filled from the remaining questions.
+
+    :param question_ids: Candidate question IDs.
+    :param num_questions: Number of questions to select.
+    :param statistics: Output of get_item_statistics for the candidates.
+    :return: List of selected question IDs.
+    """
+    bands = {"easy": [], "medium": [], "hard": []}
+    for question_id in dict.fromkeys(question_ids):
+        bands[difficulty_band(statistics.get(question_id))].append(question_id)
+
+    selected = []
+    for band, share in ITEM_STATISTICS_CONFIG["difficulty_mix"].items():
+        candidates = bands.get(band, [])
+        take = min(len(candidates), int(round(share * num_questions)))
+        selected.extend(random.sample(candidates, take))
+
+    selected = selected[:num_questions]
+    if len(selected) < num_questions:
+        chosen = set(selected)
+        leftovers = [q for q in dict.fromkeys(question_ids) if q not in chosen]
+        selected.extend(random.sample(leftovers, min(len(leftovers), num_questions - len(selected))))
+    return selected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill QuestionStatistics from scored StudentResponses.")
+    parser.add_argument("--workers", type=int, default=ITEM_STATISTICS_CONFIG["backfill_workers"])
+    parser.add_argument("--chunk-size", type=int, default=ITEM_STATISTICS_CONFIG["backfill_chunk_size"])
+    args = parser.parse_args()
+    _, backfill_errors = backfill_item_statistics(args.workers, args.chunk_size)
+    for backfill_error in backfill_errors:
+        print(backfill_error)
@@ -0,0 +1,278 @@
+import threading
+import time
+from Backend.dbconfig.config import LEADERBOARD_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.invalidation import publish, subscribe
+
+
+class ScoreLeaderboard:
+    """
+    Bucketed score histogram backed by a Fenwick (binary indexed) tree.
+
+    Each student occupies exactly one bucket. Rank, percentile and the k-th best bucket
+    are answered with prefix sums over the tree, so every lookup and update is
+    O(log B) where B is the number of buckets, independent of the number of students.
+    """
+
+    def __init__(self, min_score, max_score, buckets_per_point):
+        self.min_score = min_score
+        self.max_score = max_score
+        self.buckets_per_point = buckets_per_point
+        self.size = int((max_score - min_score) * buckets_per_point) + 1
+        self.tree = [0] * (self.size + 1)
+        self.buckets = {}       # bucket -> {student_id: score}
+        self.scores = {}        # student_id -> score
+
+    def bucket_for(self, score):
+        score = min(max(float(score), self.min_score), self.max_score)
+        return int((score - self.min_score) * self.buckets_per_point)
+
+    def _add(self, bucket, delta):
+        index = bucket + 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, bucket):
+        # Number of students in buckets 0..bucket inclusive
+        index = bucket + 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def _find_by_order(self, k):
+        # Smallest bucket whose prefix count is >= k (1-based k)
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self.tree[candidate] < k:
+                position = candidate
+                k -= self.tree[candidate]
+            step >>= 1
+        return position
+
+    def __len__(self):
+        return len(self.scores)
+
+    def update(self, student_id, score):
+        score = float(score)
+        previous = self.scores.get(student_id)
+        if previous is not None:
+            old_bucket = self.bucket_for(previous)
+            self.buckets[old_bucket].pop(student_id, None)
+            if not self.buckets[old_bucket]:
+                del self.buckets[old_bucket]
+            self._add(old_bucket, -1)
+
+        bucket = self.bucket_for(score)
+        self.buckets.setdefault(bucket, {})[student_id] = score
+        self.scores[student_id] = score
+        self._add(bucket, 1)
+
+    def remove(self, student_id):
+        score = self.scores.pop(student_id, None)
+        if score is None:
+            return
+        bucket = self.bucket_for(score)
+        self.buckets[bucket].pop(student_id, None)
+        if not self.buckets[bucket]:
+            del self.buckets[bucket]
+        self._add(bucket, -1)
+
+    def rank(self, student_id):
+        """
+        Returns (rank, percentile) for a student, or None if the student has no score.
+        Rank is 1 + the number of students in strictly higher buckets; percentile is the
+        share of students scoring at or below the student's bucket.
+        """
+        score = self.scores.get(student_id)
+        if score is None:
+            return None
+        bucket = self.bucket_for(score)
+        total = len(self.scores)
+        at_or_below = self._prefix(bucket)
+        rank = total - at_or_below + 1
+        percentile = round(at_or_below * 100 / total, 2)
+        return rank, percentile
+
+    def top(self, n):
+        """
+        Returns up to n (rank, student_id, score) tuples, best first.
+        """
+        total = len(self.scores)
+        result = []
+        seen = 0
+        while seen < min(n, total):
+            # The (seen + 1)-th best student is the (total - seen)-th smallest
+            bucket = self._find_by_order(total - seen)
+            rank = seen + 1
+            for student_id, score in sorted(self.buckets[bucket].items(), key=lambda item: item[1], reverse=True):
+                if len(result) >= n:
+                    break
+                result.append((rank, student_id, score))
+            seen += len(self.buckets[bucket])
+        return result
+
+
+_leaderboard = None
+_last_sync = None           # Database timestamp of the last sync
+_last_sync_monotonic = 0.0
+_leaderboard_lock = threading.Lock()
+
+
+def _new_leaderboard():
+    return ScoreLeaderboard(
+        LEADERBOARD_CONFIG["min_score"],
+        LEADERBOARD_CONFIG["max_score"],
+        LEADERBOARD_CONFIG["buckets_per_point"]
+    )
+
+
+def _sync_leaderboard(cur):
+    """
+    Brings the in-process leaderboard up to date with MockTestLeaderboard.
+
+    The first call loads the whole table; later calls only read rows updated since the
+    previous sync (minus an overlap window, since re-applying a score is idempotent), so
+    updates written by other workers are picked up without rescanning the table.
+    Must be called with _leaderboard_lock held.
+    """
+    global _leaderboard, _last_sync, _last_sync_monotonic
+
+    if _leaderboard is None:
+        cur.execute("SELECT StudentID, Score, clock_timestamp() FROM MockTestLeaderboard")
+        rows = cur.fetchall()
+        board = _new_leaderboard()
+        for student_id, score, _ in rows:
+            board.update(student_id, score)
+        if not rows:
+            cur.execute("SELECT clock_timestamp()")
+            rows = [(None, None, cur.fetchone()[0])]
+        _leaderboard = board
+        _last_sync = rows[0][2]
+    else:
+        cur.execute("""
+            SELECT StudentID, Score, clock_timestamp()
+            FROM MockTestLeaderboard
+            WHERE UpdatedAt > %s - make_interval(secs => %s)
+        """, (_last_sync, LEADERBOARD_CONFIG["sync_overlap_seconds"]))
+        rows = cur.fetchall()
+        for student_id, score, _ in rows:
+            _leaderboard.update(student_id, score)
+        if rows:
+            _last_sync = rows[0][2]
+        else:
+            cur.execute("SELECT clock_timestamp()")
+            _last_sync = cur.fetchone()[0]
+
+    _last_sync_monotonic = time.monotonic()
+
+
+def _get_leaderboard():
+    """
+    Returns the in-process leaderboard, loading or refreshing it from the database when
+    it is missing or older than the configured sync interval.
+    """
+    with _leaderboard_lock:
+        stale = time.monotonic() - _last_sync_monotonic > LEADERBOARD_CONFIG["sync_interval_seconds"]
+        if _leaderboard is not None and not stale:
+            return _leaderboard, None
+
+        conn = create_pg_connection(pg_connection_pool)
+        if not conn:
+            if _leaderboard is not None:
+                return _leaderboard, None  # Serve slightly stale data rather than fail
+            return None, "Database connection failed"
+        try:
+            with conn.cursor() as cur:
+                _sync_leaderboard(cur)
+            conn.commit()
+            return _leaderboard, None
+        except Exception as e:
+            conn.rollback()
+            if _leaderboard is not None:
+                return _leaderboard, None
+            return None, "Error loading leaderboard: " + str(e)
+        finally:
+            release_pg_connection(pg_connection_pool, conn)
+
+
+def record_mock_test_score(cur, student_id, score):
+    """
+    Persists a student's mock test score to MockTestLeaderboard. Meant to be called from the
+    scoring transaction, right after MockTestProficiency has been updated; the in-process
+    leaderboards of every listening worker apply it once that transaction commits.
+
+    :param cur: Cursor of the scoring transaction.
+    :param student_id: ID of the student.
+    :param score: The student's current average mock test score.
+    """
+    cur.execute("""
+        INSERT INTO MockTestLeaderboard (StudentID, Score, UpdatedAt)
+        VALUES (%s, %s, clock_timestamp())
+        ON CONFLICT (StudentID)
+        DO UPDATE SET Score = EXCLUDED.Score, UpdatedAt = EXCLUDED.UpdatedAt
+    """, (student_id, score))
+    publish(cur, "leaderboard", f"{student_id}:{float(score)}")
+
+
+def _apply_mock_test_score(key):
+    global _last_sync_monotonic
+    with _leaderboard_lock:
+        if key is None:
+            # Scores may have been missed while the listener reconnected: sync on the next read
+            _last_sync_monotonic = 0.0
+        elif _leaderboard is not None:
+            student_id, _, score = key.partition(":")
+            _leaderboard.update(int(student_id), float(score))
+
+
+# Sent by record_mock_test_score when the scoring transaction commits
+subscribe("leaderboard", _apply_mock_test_score)
+
+
+def get_student_rank(student_id):
+    """
+    Retrieve a student's mock test rank and percentile.
+
+    :param student_id: ID of the student.
+    :return: Dictionary with score, rank, percentile and the number of ranked students.
+    """
+    board, error = _get_leaderboard()
+    if error:
+        return None, error
+
+    with _leaderboard_lock:
+        ranking = board.rank(student_id)
+        if ranking is None:
+            return None, "No mock test score found for the given student"
+        rank, percentile = ranking
+        return {
+            "student_id": student_id,
+            "score": board.scores[student_id],
+            "rank": rank,
+            "percentile": percentile,
+            "total_students": len(board)
+        }, None
+
+
+def get_leaderboard_top(n):
+    """
+    Retrieve the top n students by average mock test score.
+
+    :param n: Number of entries to return, capped at LEADERBOARD_CONFIG["max_top_n"].
+    :return: List of entries with rank, student ID and score, best first.
+    """
+    board, error = _get_leaderboard()
+    if error:
+        return None, error
+
+    n = max(0, min(n, LEADERBOARD_CONFIG["max_top_n"]))
+    with _leaderboard_lock:
+        return [
+            {"rank": rank, "student_id": student_id, "score": score}
+            for rank, student_id, score in board.top(n)
+        ], None
@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from Backend.dbconfig.config import PAGINATION_CONFIG
+
+# Test types a history listing can be filtered on
+TEST_TYPES = ("Practice", "Mock")
+
+
+def encode_cursor(test_date_time, test_instance_id):
+    """
+    Encodes the sort key of the last row on a page as an opaque cursor string.
+    """
+    payload = json.dumps([test_date_time.isoformat() if test_date_time else None, test_instance_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    :return: (test_date_time, test_instance_id), or None if the cursor is malformed.
+    """
+    try:
+        test_date_time, test_instance_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(test_date_time), int(test_instance_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(limit):
+    """
+    Clamps a requested page size to the configured bounds.
+    """
+    if not limit:
+        return PAGINATION_CONFIG["default_page_size"]
+    return max(1, min(int(limit), PAGINATION_CONFIG["max_page_size"]))
+
+
+def test_instance_filters(alias, cursor=None, date_from=None, date_to=None, test_type=None):
+    """
+    Builds the WHERE fragment for a keyset page over TestInstances, newest first.
+    The predicates match the (StudentID, TestDateTime, TestInstanceID) and
+    (StudentID, TestType, TestDateTime, TestInstanceID) indexes.
+
+    :param alias: Alias of the TestInstances table in the calling query.
+    :return: (sql, params, error) where sql starts with ' AND ' or is empty.
+    """
+    clauses = []
+    params = []
+
+    if test_type is not None:
+        if test_type not in TEST_TYPES:
+            return None, None, f"Invalid test type: {test_type}"
+        clauses.append(f"{alias}.TestType = %s")
+        params.append(test_type)
+    if date_from is not None:
+        clauses.append(f"{alias}.TestDateTime >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append(f"{alias}.TestDateTime < %s")
+        params.append(date_to)
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return None, None, "Invalid cursor"
+        clauses.append(f"({alias}.TestDateTime, {alias}.TestInstanceID) < (%s, %s)")
+        params.extend(position)
+
+    sql = "".join(" AND " + clause for clause in clauses)
+    return sql, params, None
@@ -0,0 +1,353 @@
+import argparse
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from Backend.dbconfig.config import QUESTION_BANK_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.invalidation import cache_ttl, subscribe
+from Backend.metrics import Counter, register_metric
+
+question_bank_lookups_total = register_metric(Counter(
+    "question_bank_lookups_total", "Question payload lookups, by outcome (snapshot, database or missing).", ("outcome",)))
+
+# Snapshot file layout, in native byte order (the file is built on the host that maps it):
+#   header   MAGIC, QuestionBankVersion, number of records n
+#   ids      n int64 QuestionIDs, ascending
+#   offsets  n + 1 int64 offsets into the payload section; record i is payload[offsets[i]:offsets[i + 1]]
+#   payload  one compact UTF-8 JSON object per question
+MAGIC = b"NQBANK01"
+HEADER = struct.Struct("=8sqq")
+
+# Everything the API serves about a question. Images are kept in ImageID order with their types;
+# each caller picks the types it shows.
+PAYLOAD_SQL = """
+    SELECT Q.QuestionID, Q.Question, Q.OptionA, Q.OptionB, Q.OptionC, Q.OptionD, Q.Answer, Q.Explanation, Q.HasImage,
+           COALESCE(json_agg(json_build_object('URL', I.ImageURL, 'Type', I.ContentType) ORDER BY I.ImageID)
+                    FILTER (WHERE I.ImageID IS NOT NULL), '[]')
+    FROM Questions Q
+    LEFT JOIN Images I ON I.QuestionID = Q.QuestionID
+    {where}
+    GROUP BY Q.QuestionID
+    ORDER BY Q.QuestionID
+"""
+
+
+def _payload(row):
+    question_id, question, option_a, option_b, option_c, option_d, answer, explanation, has_image, images = row
+    return question_id, {
+        "Question": question,
+        "Options": {"A": option_a, "B": option_b, "C": option_c, "D": option_d},
+        "Answer": answer,
+        "Explanation": explanation,
+        "HasImage": bool(has_image),
+        "Images": images
+    }
+
+
+class QuestionBankSnapshot:
+    """
+    Read-only view of a snapshot file. The file is memory-mapped, so every worker on the host
+    shares the same page cache copy; lookups binary-search the mapped ID index and decode one record.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.file_id = (os.fstat(f.fileno()).st_ino, os.fstat(f.fileno()).st_mtime_ns)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a question bank snapshot")
+        view = memoryview(self._mmap)
+        ids_start = HEADER.size
+        offsets_start = ids_start + 8 * count
+        self._payload_start = offsets_start + 8 * (count + 1)
+        self._ids = view[ids_start:offsets_start].cast("q")
+        self._offsets = view[offsets_start:self._payload_start].cast("q")
+        self._view = view
+        self.stale = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def get(self, question_id):
+        """
+        :return: The question's payload dict, or None if the snapshot does not contain it.
+        """
+        i = bisect.bisect_left(self._ids, question_id)
+        if i == len(self._ids) or self._ids[i] != question_id:
+            return None
+        start = self._payload_start + self._offsets[i]
+        return json.loads(bytes(self._view[start:self._payload_start + self._offsets[i + 1]]))
+
+
+_snapshot = None
+_last_check = 0.0
+_changed_at = 0.0
+_check_lock = threading.Lock()
+_changed_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+
+def write_snapshot(path, version, payloads):
+    """
+    Writes a snapshot file. The file is written next to the target and renamed over it, so
+    workers mapping the old file keep reading it until they switch.
+
+    :param path: Snapshot file.
+    :param version: QuestionBankVersion the payloads correspond to.
+    :param payloads: Iterable of (question ID, payload dict), in ascending question ID order.
+    :return: Number of questions and payload bytes written.
+    """
+    ids, offsets = array("q"), array("q", [0])
+    tmp_path = None
+    try:
+        with tempfile.TemporaryFile() as payload_file:
+            for question_id, payload in payloads:
+                record = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                payload_file.write(record)
+                ids.append(question_id)
+                offsets.append(offsets[-1] + len(record))
+
+            payload_file.seek(0)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".question_bank.")
+            with os.fdopen(fd, "wb") as out:
+                out.write(HEADER.pack(MAGIC, version, len(ids)))
+                ids.tofile(out)
+                offsets.tofile(out)
+                shutil.copyfileobj(payload_file, out)
+                out.flush()
+                os.fsync(out.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        tmp_path = None
+        return len(ids), offsets[-1]
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+
+def build_question_bank(path=None):
+    """
+    Builds the snapshot of every question with its images from the database. Only one build
+    per host runs at a time.
+
+    :param path: Snapshot file, QUESTION_BANK_CONFIG["path"] by default.
+    :return: QuestionBankVersion of the snapshot and an error message, if any.
+    """
+    path = os.path.abspath(path or QUESTION_BANK_CONFIG["path"])
+    with open(path + ".lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None, "A question bank build is already running"
+
+        conn = create_pg_connection(pg_connection_pool)
+        if not conn:
+            return None, "Database connection failed"
+
+        try:
+            # Read before the questions: a change committed meanwhile leaves the snapshot
+            # marked older than its content, which only causes one extra rebuild.
+            with conn.cursor() as cur:
+                cur.execute("SELECT QuestionBankVersion FROM CatalogVersion")
+                version = cur.fetchone()[0]
+
+            # Server-side cursor, so the bank is streamed instead of held in memory
+            with conn.cursor(name="question_bank_build") as cur:
+                cur.itersize = QUESTION_BANK_CONFIG["build_fetch_size"]
+                cur.execute(PAYLOAD_SQL.format(where=""))
+                count, size = write_snapshot(path, version, (_payload(row) for row in cur))
+            conn.rollback()
+            print(f"Built question bank snapshot version {version} with {count} questions ({size} payload bytes)")
+            return version, None
+        except Exception as e:
+            conn.rollback()
+            return None, f"Error building the question bank snapshot: {e}"
+        finally:
+            release_pg_connection(pg_connection_pool, conn)
+
+
+def _rebuild_in_background():
+    if _rebuilding.is_set():
+        return
+    _rebuilding.set()
+
+    def rebuild():
+        global _last_check
+        try:
+            _, error = build_question_bank()
+            if error:
+                print(error)
+        finally:
+            _last_check = 0.0  # Pick up the new file on the next lookup
+            _rebuilding.clear()
+
+    threading.Thread(target=rebuild, name="question-bank-build", daemon=True).start()
+
+
+def _database_version(cur=None):
+    if cur is not None:
+        cur.execute("SELECT QuestionBankVersion FROM CatalogVersion")
+        return cur.fetchone()[0]
+
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT QuestionBankVersion FROM CatalogVersion")
+            return cur.fetchone()[0]
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+
+def _check_snapshot(cur=None):
+    """
+    Re-maps the snapshot file if it was replaced and compares its version with the database,
+    read on cur when given, else on a pooled connection.
+    """
+    global _snapshot, _last_check
+    started = time.monotonic()
+    path = QUESTION_BANK_CONFIG["path"]
+    snapshot = _snapshot
+    try:
+        stat = os.stat(path)
+        if snapshot is None or snapshot.file_id != (stat.st_ino, stat.st_mtime_ns):
+            # The previous mapping is released once no reader references it
+            snapshot = QuestionBankSnapshot(path)
+            print(f"Mapped question bank snapshot version {snapshot.version} ({len(snapshot)} questions)")
+    except FileNotFoundError:
+        snapshot = None
+    except (OSError, ValueError) as e:
+        print(f"Could not map the question bank snapshot: {e}")
+        snapshot = None
+
+    try:
+        version = _database_version(cur)
+    except Exception as e:
+        print(f"Could not check the question bank version: {e}")
+        version = None
+    if snapshot is not None and version is not None:
+        snapshot.stale = snapshot.version != version
+    if (snapshot is None or snapshot.stale) and version is not None and QUESTION_BANK_CONFIG["rebuild_when_stale"]:
+        _rebuild_in_background()
+
+    with _changed_lock:
+        _snapshot = snapshot
+        # A change notified while the version was being read is checked again on the next lookup
+        _last_check = time.monotonic() if started > _changed_at else 0.0
+
+
+def get_snapshot(cur=None):
+    """
+    Returns the mapped snapshot if it matches the database's QuestionBankVersion, else None.
+    The version is re-checked at most every QUESTION_BANK_CONFIG["version_check_seconds"] (less
+    often while the invalidation listener pushes changes); meanwhile other threads keep using
+    the current snapshot.
+
+    :param cur: Open cursor for the version check. When omitted, a pooled connection is taken
+                only if the version actually has to be checked.
+    """
+    if not QUESTION_BANK_CONFIG["enabled"]:
+        return None
+    if (time.monotonic() - _last_check >= cache_ttl(QUESTION_BANK_CONFIG["version_check_seconds"])
+            and _check_lock.acquire(blocking=False)):
+        try:
+            _check_snapshot(cur)
+        finally:
+            _check_lock.release()
+    snapshot = _snapshot
+    return snapshot if snapshot is not None and not snapshot.stale else None
+
+
+def question_bank_version():
+    """
+    :return: QuestionBankVersion of the snapshot being served, or None while questions are read from
+             the database. Callers caching data derived from question payloads put it in their keys.
+    """
+    snapshot = get_snapshot()
+    return snapshot.version if snapshot is not None else None
+
+
+def get_question_payload(question_id):
+    """
+    Looks a question up in the snapshot.
+
+    :param question_id: ID of the question.
+    :return: Payload dict (Question, Options, Answer, Explanation, HasImage, Images), or None when
+             the snapshot is unavailable or does not contain the question; callers then read the database.
+    """
+    snapshot = get_snapshot()
+    payload = snapshot.get(question_id) if snapshot is not None else None
+    question_bank_lookups_total.inc("snapshot" if payload is not None else "missing")
+    return payload
+
+
+def get_question_payloads(cur, question_ids):
+    """
+    Payloads for several questions: from the snapshot where possible, the rest in one query on cur.
+
+    :param cur: Open cursor, used for the snapshot's version check and questions the snapshot cannot serve.
+    :param question_ids: IDs of the questions.
+    :return: Dictionary of question ID to payload dict; unknown IDs are left out.
+    """
+    snapshot = get_snapshot(cur)
+    payloads = {}
+    missing = []
+    for question_id in question_ids:
+        payload = snapshot.get(question_id) if snapshot is not None else None
+        if payload is None:
+            missing.append(question_id)
+        else:
+            payloads[question_id] = payload
+    question_bank_lookups_total.inc("snapshot", amount=len(payloads))
+
+    if missing:
+        cur.execute(PAYLOAD_SQL.format(where="WHERE Q.QuestionID = ANY(%s)"), (missing,))
+        for row in cur.fetchall():
+            question_id, payload = _payload(row)
+            payloads[question_id] = payload
+        question_bank_lookups_total.inc("database", amount=len(missing))
+    return payloads
+
+
+def load_question_bank():
+    """
+    Maps the snapshot eagerly, e.g. at worker startup, and starts a rebuild if it is missing or outdated.
+    """
+    if not QUESTION_BANK_CONFIG["enabled"]:
+        return None, None
+    with _check_lock:
+        _check_snapshot()
+    snapshot = _snapshot
+    if snapshot is None:
+        return None, "No question bank snapshot yet"
+    return snapshot.version, None
+
+
+def _question_bank_changed(key):
+    # Sent by the QuestionBankVersion triggers: re-check the version on the next lookup
+    global _last_check, _changed_at
+    with _changed_lock:
+        _changed_at = time.monotonic()
+        _last_check = 0.0
+
+
+subscribe("question_bank", _question_bank_changed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mapped question bank snapshot.")
+    parser.add_argument("--path", default=QUESTION_BANK_CONFIG["path"])
+    args = parser.parse_args()
+    _, build_error = build_question_bank(args.path)
+    if build_error:
+        print(build_error)
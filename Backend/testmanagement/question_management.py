@@ -1,28 +1,53 @@
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.prepared_statements import (TEST_INSTANCE, PRACTICE_TEST_COMPLETION, MOCK_TEST_COMPLETION,
+                                                  execute_prepared, register_statement)
+from Backend.testmanagement.catalog_cache import get_catalog
+from Backend.testmanagement.question_bank import get_question_payload
+from Backend.testmanagement.pagination import encode_cursor, page_size, test_instance_filters
+
+QUESTION_DETAILS = register_statement("question_details", """
+    SELECT Q.Question, Q.OptionA, Q.OptionB, Q.OptionC, Q.OptionD, I.ImageURL, I.ContentType
+    FROM Questions Q
+    LEFT JOIN Images I ON Q.QuestionID = I.QuestionID
+    WHERE Q.QuestionID = %s
+""")
+QUESTION_ANSWER = register_statement("question_answer", """
+    SELECT Q.Answer, Q.Explanation, I.ImageURL
+    FROM Questions Q
+    LEFT JOIN Images I ON Q.QuestionID = I.QuestionID AND I.ContentType = 'EXP'
+    WHERE Q.QuestionID = %s
+""")
+
+# Image types shown with a question (explanation images are served with the answer)
+QUESTION_IMAGE_TYPES = ['QUE', 'OptionA', 'OptionB', 'OptionC', 'OptionD']
 
 def get_question_details(question_id):
     """
-    Retrieve details for a specific question from the database.
+    Retrieve details for a specific question from the question bank snapshot, or the database
+    when the snapshot cannot serve it.
     """
+    payload = get_question_payload(question_id)
+    if payload is not None:
+        return {
+            "Question": payload["Question"],
+            "Options": payload["Options"],
+            "Images": [image for image in payload["Images"] if image["Type"] in QUESTION_IMAGE_TYPES]
+        }, None
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
 
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT Q.Question, Q.OptionA, Q.OptionB, Q.OptionC, Q.OptionD, I.ImageURL, I.ContentType
-                FROM Questions Q
-                LEFT JOIN Images I ON Q.QuestionID = I.QuestionID
-                WHERE Q.QuestionID = %s
-            """, (question_id,))
+            execute_prepared(cur, QUESTION_DETAILS, (question_id,))
             questions = cur.fetchall()
 
             result = {}
             for q in questions:
                 if not result:
                     result = {"Question": q[0], "Options": {"A": q[1], "B": q[2], "C": q[3], "D": q[4]}, "Images": []}
-                if q[5] and q[6] in ['QUE', 'OptionA', 'OptionB', 'OptionC', 'OptionD']:
+                if q[5] and q[6] in QUESTION_IMAGE_TYPES:
                     result["Images"].append({"URL": q[5], "Type": q[6]})
             return result, None
     except Exception as e:
@@ -33,20 +58,22 @@ def get_question_details(question_id):
 
 def get_answer(question_id):
     """
-    Retrieve the answer for a specific question from the database.
+    Retrieve the answer for a specific question from the question bank snapshot, or the database
+    when the snapshot cannot serve it.
     """
+    payload = get_question_payload(question_id)
+    if payload is not None:
+        explanation_images = [image["URL"] for image in payload["Images"] if image["Type"] == 'EXP']
+        return {"Answer": payload["Answer"], "Explanation": payload["Explanation"],
+                "ImageURL": explanation_images[0] if explanation_images else None}, None
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
 
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT Q.Answer, Q.Explanation, I.ImageURL
-                FROM Questions Q
-                LEFT JOIN Images I ON Q.QuestionID = I.QuestionID AND I.ContentType = 'EXP'
-                WHERE Q.QuestionID = %s
-            """, (question_id,))
+            execute_prepared(cur, QUESTION_ANSWER, (question_id,))
             result = cur.fetchone()
             if result:
                 answer, explanation, image_url = result
@@ -59,54 +86,54 @@ def get_answer(question_id):
         release_pg_connection(pg_connection_pool, conn)
 
 
-def list_tests_for_student(student_id):
+def list_tests_for_student(student_id, limit=None, cursor=None, date_from=None, date_to=None, test_type=None):
     """
-    List all tests for a particular student and indicate if each test is completed.
+    List the tests of a particular student, newest first, and indicate if each test is completed.
 
     :param student_id: ID of the student.
-    :return: List of tests with completion status.
+    :param limit: Page size, clamped to PAGINATION_CONFIG.
+    :param cursor: The next_cursor value of the previous page.
+    :param date_from: Only tests generated at or after this time.
+    :param date_to: Only tests generated before this time.
+    :param test_type: Only tests of this type ('Practice' or 'Mock').
+    :return: One page of tests with completion status, and the cursor of the next page (None on the last page).
     """
+    filters, filter_params, error = test_instance_filters("TI", cursor, date_from, date_to, test_type)
+    if error:
+        return None, error
+    limit = page_size(limit)
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
 
     try:
         with conn.cursor() as cur:
-            # Retrieve all tests for the student
-            cur.execute("""
-                SELECT TestInstanceID, TestType, TestID
-                FROM TestInstances
-                WHERE StudentID = %s
-            """, (student_id,))
+            # Retrieve one page of tests with their completion status in a single query
+            cur.execute(f"""
+                SELECT TI.TestInstanceID, TI.TestType, TI.TestID, TI.TestDateTime,
+                       COALESCE(CASE TI.TestType WHEN 'Mock' THEN MTC.IsCompleted ELSE PTC.IsCompleted END, FALSE)
+                FROM TestInstances TI
+                LEFT JOIN MockTestCompletion MTC
+                    ON TI.TestType = 'Mock' AND MTC.MockTestID = TI.TestID AND MTC.StudentID = TI.StudentID
+                LEFT JOIN PracticeTestCompletion PTC
+                    ON TI.TestType = 'Practice' AND PTC.PracticeTestID = TI.TestID AND PTC.StudentID = TI.StudentID
+                WHERE TI.StudentID = %s AND TI.TestType IN ('Mock', 'Practice'){filters}
+                ORDER BY TI.TestDateTime DESC, TI.TestInstanceID DESC
+                LIMIT %s
+            """, (student_id, *filter_params, limit + 1))
             tests = cur.fetchall()
-            
-            test_list = []
-            for test_instance_id, test_type, test_id in tests:
-                # Check completion status based on test type
-                if test_type == 'Mock':
-                    completion_table = 'MockTestCompletion'
-                    columnname_testid = "mocktestid"
-                elif test_type == 'Practice':
-                    completion_table = 'PracticeTestCompletion'
-                    columnname_testid = "practicetestid"
-                else:
-                    continue  # Skip unknown test types
-                
-                # Check if the test is completed
-                cur.execute(f"""
-                    SELECT COUNT(*) FROM {completion_table}
-                    WHERE {columnname_testid} = %s AND StudentID = %s AND IsCompleted = TRUE
-                """, (test_id, student_id))
-                is_completed = cur.fetchone()[0] > 0
-                
-                test_list.append({
-                    "TestInstanceID": test_instance_id,
-                    "TestID": test_id,
-                    "TestType": test_type,
-                    "IsCompleted": is_completed
-                })
-            
-            return test_list, None
+
+            next_cursor = encode_cursor(tests[limit - 1][3], tests[limit - 1][0]) if len(tests) > limit else None
+            test_list = [{
+                "TestInstanceID": row[0],
+                "TestID": row[2],
+                "TestType": row[1],
+                "TestDateTime": row[3],
+                "IsCompleted": row[4]
+            } for row in tests[:limit]]
+
+            return {"tests": test_list, "next_cursor": next_cursor}, None
     except Exception as e:
         return None, str(e)
     finally:
@@ -114,44 +141,21 @@ def list_tests_for_student(student_id):
 
 def get_chapter_names(subjectID):
     """
-    Retrieve chapter names from the database based on the subject ID.
+    Retrieve chapter names from the cached catalog based on the subject ID.
     For Biology, it combines chapters from both Botany and Zoology.
+    The database is only read when the catalog version is due for a re-check.
     """
-    # Assuming create_pg_connection and release_pg_connection are defined elsewhere
-    conn = create_pg_connection(pg_connection_pool)
-    if not conn:
-        return None, "Database connection failed"
+    if subjectID not in [1, 2, 3]:
+        return None, "Invalid subject ID"
 
     try:
-        with conn.cursor() as cur:
-            if subjectID in [1, 2]:  # For Physics or Chemistry
-                cur.execute("""
-                    SELECT ChapterID, ChapterTitle, ChapterNumber
-                    FROM Chapters
-                    WHERE IsActive = TRUE AND SubjectID = %s
-                    ORDER BY ChapterNumber ASC;
-                """, (subjectID,))
-            elif subjectID == 3:  # For Biology (Botany and Zoology)
-                cur.execute("""
-                    SELECT ChapterID, ChapterTitle, ChapterNumber
-                    FROM Chapters
-                    WHERE IsActive = TRUE AND SubjectID IN (3, 4)
-                    ORDER BY ChapterNumber ASC;
-                """)
-            else:
-                return None, "Invalid subject ID"
-
-            rows = cur.fetchall()
-            if rows:
-                # Convert fetched rows to a list of chapter names
-                chapter_names = {row[1]:row[0] for row in rows}  # Assuming ChapterTitle is the second column
-                return chapter_names, None
-            else:
-                return None, "No chapters found"
+        chapter_names = get_catalog().chapter_names[subjectID]
+        if chapter_names:
+            return dict(chapter_names), None
+        else:
+            return None, "No chapters found"
     except Exception as e:
         return None, str(e)
-    finally:
-        release_pg_connection(pg_connection_pool, conn)
 
 def get_test_completion(instanceId, studentId):
     conn = create_pg_connection(pg_connection_pool)
@@ -160,32 +164,24 @@ def get_test_completion(instanceId, studentId):
 
     try:
         with conn.cursor() as cur:
-            # Fetch the TestID, TestType, and StudentID from TestInstances table
-            cur.execute("""
-                SELECT TestID, TestType FROM TestInstances WHERE TestInstanceID = %s AND StudentID = %s
-            """, (instanceId, studentId,))
+            # Fetch the TestID and TestType from TestInstances table
+            execute_prepared(cur, TEST_INSTANCE, (instanceId, studentId))
             test_info = cur.fetchone()
 
             if test_info is None:
                 return None, "Test instance not found for the given student"
 
-            test_id, test_type = test_info
+            test_type, test_id = test_info
 
-            # Depending on the TestType, prepare the correct SQL query
+            # Depending on the TestType, read the matching completion table
             if test_type.lower() == 'practice':
-                completion_column = "PracticeTestID"
-                completion_table = "practicetestcompletion"
+                completion_statement = PRACTICE_TEST_COMPLETION
             elif test_type.lower() == 'mock':
-                completion_column = "MockTestID"
-                completion_table = "mocktestcompletion"
+                completion_statement = MOCK_TEST_COMPLETION
             else:
                 return None, f"Unsupported test type: {test_type}"
 
-            # Construct the SQL query with the correct column and table names
-            query = f"""
-                SELECT IsCompleted FROM {completion_table} WHERE {completion_column} = %s AND StudentID = %s
-            """
-            cur.execute(query, (test_id, studentId,))
+            execute_prepared(cur, completion_statement, (test_id, studentId))
             completion_info = cur.fetchone()
 
             if completion_info is None:
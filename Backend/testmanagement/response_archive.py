@@ -0,0 +1,113 @@
+import argparse
+from psycopg2 import sql
+from Backend.dbconfig.config import RESPONSE_ARCHIVE_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+
+RESPONSE_COLUMNS = """ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+                      AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded"""
+
+# Moves one batch of old scored responses from the hot table into the archive.
+# SKIP LOCKED keeps the job out of the way of scoring transactions touching the same rows.
+MOVE_BATCH_SQL = f"""
+    WITH batch AS (
+        SELECT ResponseID, StudentID
+        FROM StudentResponses
+        WHERE StatsRecorded AND ResponseDate < %s
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        DELETE FROM StudentResponses SR
+        USING batch
+        WHERE SR.ResponseID = batch.ResponseID AND SR.StudentID = batch.StudentID
+        RETURNING SR.*
+    )
+    INSERT INTO StudentResponsesArchive ({RESPONSE_COLUMNS})
+    SELECT {RESPONSE_COLUMNS} FROM moved
+"""
+
+
+def _archive_cutoff(cur, months):
+    cur.execute("SELECT date_trunc('month', LOCALTIMESTAMP - make_interval(months => %s))", (months,))
+    return cur.fetchone()[0]
+
+
+def ensure_archive_partitions(cur, cutoff):
+    """
+    Creates the monthly StudentResponsesArchive partitions needed for responses older than cutoff.
+    Cold partitions are written once, so they are packed (fillfactor 100).
+
+    :param cur: Open cursor.
+    :param cutoff: First day of the first month that stays hot.
+    :return: Number of partitions created.
+    """
+    cur.execute("""
+        SELECT month::DATE
+        FROM generate_series(
+            (SELECT date_trunc('month', MIN(ResponseDate)) FROM StudentResponses WHERE StatsRecorded AND ResponseDate < %s),
+            %s - INTERVAL '1 month', INTERVAL '1 month') AS month
+        WHERE NOT EXISTS (
+            SELECT 1 FROM pg_inherits I JOIN pg_class C ON C.oid = I.inhrelid
+            WHERE I.inhparent = 'studentresponsesarchive'::regclass AND C.relname = 'studentresponsesarchive_' || to_char(month, 'YYYYMM')
+        )
+    """, (cutoff, cutoff))
+    months = [row[0] for row in cur.fetchall()]
+
+    for month in months:
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} PARTITION OF StudentResponsesArchive
+            FOR VALUES FROM (%s) TO (%s::DATE + INTERVAL '1 month')
+            WITH (fillfactor = 100)
+        """).format(sql.Identifier(f"studentresponsesarchive_{month:%Y%m}")), (month, month))
+    return len(months)
+
+
+def archive_responses(months=None, batch_size=None):
+    """
+    Moves scored responses older than the given number of months from StudentResponses to
+    StudentResponsesArchive, one batch per transaction, so the hot partitions only hold recent
+    tests. Readers see both through the AllStudentResponses view. Safe to re-run and to run
+    while the service is scoring tests.
+
+    :param months: Age in whole months after which scored responses are archived.
+    :param batch_size: Number of responses moved per transaction.
+    :return: Number of responses moved and an error message, if any.
+    """
+    months = months or RESPONSE_ARCHIVE_CONFIG["archive_after_months"]
+    batch_size = batch_size or RESPONSE_ARCHIVE_CONFIG["batch_size"]
+
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        return 0, "Database connection failed"
+
+    moved = 0
+    try:
+        with conn.cursor() as cur:
+            cutoff = _archive_cutoff(cur, months)
+            created = ensure_archive_partitions(cur, cutoff)
+            conn.commit()
+
+            while True:
+                cur.execute(MOVE_BATCH_SQL, (cutoff, batch_size))
+                batch = cur.rowcount
+                conn.commit()
+                moved += batch
+                if batch < batch_size:
+                    break
+
+        print(f"Archived {moved} responses older than {cutoff:%Y-%m-%d} ({created} new archive partitions)")
+        return moved, None
+    except Exception as e:
+        conn.rollback()
+        return moved, f"Error archiving responses: {e}"
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old scored StudentResponses to StudentResponsesArchive.")
+    parser.add_argument("--months", type=int, default=RESPONSE_ARCHIVE_CONFIG["archive_after_months"])
+    parser.add_argument("--batch-size", type=int, default=RESPONSE_ARCHIVE_CONFIG["batch_size"])
+    args = parser.parse_args()
+    _, archive_error = archive_responses(args.months, args.batch_size)
+    if archive_error:
+        print(archive_error)
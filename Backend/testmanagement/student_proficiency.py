@@ -1,15 +1,32 @@
 import logging
-import xlsxwriter
-import pandas as pd
+import time
 from io import BytesIO
 from datetime import datetime
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.shared_cache import cache_key, cache_get, cache_fill
+from Backend.testmanagement.catalog_cache import get_catalog
+from Backend.testmanagement.pagination import encode_cursor, page_size, test_instance_filters
 
-def get_student_test_history(student_id):
+def get_student_test_history(student_id, limit=None, cursor=None, date_from=None, date_to=None, test_type=None):
     """
     Retrieve the test history of a student along with average correct and incorrect answers for each subject (Physics, Chemistry, Biology).
     Biology is considered as both Botany and Zoology together.
+
+    History is returned one keyset page at a time, newest test first. The subject averages and
+    chapterwise report cover the student's whole history and are only computed for the first page.
+
+    :param student_id: ID of the student.
+    :param limit: Page size, clamped to PAGINATION_CONFIG.
+    :param cursor: The next_cursor value of the previous page.
+    :param date_from: Only tests generated at or after this time.
+    :param date_to: Only tests generated before this time.
+    :param test_type: Only tests of this type ('Practice' or 'Mock').
     """
+    filters, filter_params, error = test_instance_filters("TI", cursor, date_from, date_to, test_type)
+    if error:
+        return None, error
+    limit = page_size(limit)
+
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
         return None, "Database connection failed"
@@ -22,16 +39,19 @@ def get_student_test_history(student_id):
 
     try:
         with conn.cursor() as cur:
-            # Fetch test history
-            cur.execute("""
+            # Fetch one page of test history; one extra row tells whether another page exists
+            cur.execute(f"""
                 SELECT TI.TestInstanceID, TI.TestType, TI.TestID, TH.Score, TH.QuestionsAttempted, 
                        TH.CorrectAnswers, TH.IncorrectAnswers, 
                        TH.AverageAnsweringTimeInSeconds, TI.TestDateTime
                 FROM TestInstances TI
                 JOIN TestHistory TH ON TI.TestInstanceID = TH.TestInstanceID
-                WHERE TI.StudentID = %s
-            """, (student_id,))
+                WHERE TI.StudentID = %s{filters}
+                ORDER BY TI.TestDateTime DESC, TI.TestInstanceID DESC
+                LIMIT %s
+            """, (student_id, *filter_params, limit + 1))
             history = cur.fetchall()
+            next_cursor = encode_cursor(history[limit - 1][8], history[limit - 1][0]) if len(history) > limit else None
             formatted_history = [{
                 "test_instance_id": row[0],
                 "test_type": row[1],
@@ -42,50 +62,47 @@ def get_student_test_history(student_id):
                 "incorrect_answers": row[6],
                 "average_answering_time_in_seconds": row[7],
                 "test_date_time": row[8]
-            } for row in history]
+            } for row in history[:limit]]
 
-            # Calculate average correct and incorrect answers for Physics, Chemistry, and Biology (Botany + Zoology)
-            subject_ids = {"Physics": 1, "Chemistry": 2, "Biology": [3, 4]}  # Map subject names to IDs, Biology includes both Botany and Zoology
-            for subject, ids in subject_ids.items():
-                if isinstance(ids, list):  # Handle Biology
-                    placeholders = ','.join(['%s'] * len(ids))
-                    query = f"""
-                        SELECT AVG(SR.AnswerCorrect::int) AS AverageCorrect, AVG((NOT SR.AnswerCorrect)::int) AS AverageIncorrect
-                        FROM StudentResponses SR
-                        JOIN Questions Q ON SR.QuestionID = Q.QuestionID
-                        JOIN Chapters C ON Q.ChapterID = C.ChapterID
-                        WHERE SR.StudentID = %s AND C.SubjectID IN ({placeholders}) AND SR.AnswerCorrect IS NOT NULL
-                    """
-                    cur.execute(query, (student_id, *ids))
-                else:  # Handle Physics and Chemistry
-                    cur.execute("""
-                        SELECT AVG(SR.AnswerCorrect::int) AS AverageCorrect, AVG((NOT SR.AnswerCorrect)::int) AS AverageIncorrect
-                        FROM StudentResponses SR
-                        JOIN Questions Q ON SR.QuestionID = Q.QuestionID
-                        JOIN Chapters C ON Q.ChapterID = C.ChapterID
-                        WHERE SR.StudentID = %s AND C.SubjectID = %s AND SR.AnswerCorrect IS NOT NULL
-                    """, (student_id, ids))
-                
-                avg_result = cur.fetchone()
-                if avg_result:
-                    # Update averages with fetched results
-                    subject_averages[subject]["AverageCorrect"] = float(avg_result[0] or 0) * 100  # Convert to percentage
-                    subject_averages[subject]["AverageIncorrect"] = float(avg_result[1] or 0) * 100  # Convert to percentage
-
-        # Integration of calculate_chapterwise_report
-        chapterwise_report = calculate_chapterwise_report(student_id)
-        if "error" in chapterwise_report:
-            return None, "Error retrieving chapterwise report: " + chapterwise_report["error"]
+            if cursor:
+                return {"history": formatted_history, "next_cursor": next_cursor}, None
 
-        # Combine the test history and chapterwise report in the return value
-        return {"history": formatted_history, "averages": subject_averages, "chapterwise_report": chapterwise_report}, None
+            # Calculate average correct and incorrect answers for Physics, Chemistry, and Biology (Botany + Zoology)
+            cur.execute("""
+                SELECT CASE C.SubjectID WHEN 1 THEN 'Physics' WHEN 2 THEN 'Chemistry' ELSE 'Biology' END AS Subject,
+                       AVG(SR.AnswerCorrect::int) AS AverageCorrect, AVG((NOT SR.AnswerCorrect)::int) AS AverageIncorrect
+                FROM AllStudentResponses SR
+                JOIN Questions Q ON SR.QuestionID = Q.QuestionID
+                JOIN Chapters C ON Q.ChapterID = C.ChapterID
+                WHERE SR.StudentID = %s AND C.SubjectID IN (1, 2, 3, 4) AND SR.AnswerCorrect IS NOT NULL
+                GROUP BY 1
+            """, (student_id,))
+            for subject, average_correct, average_incorrect in cur.fetchall():
+                # Update averages with fetched results
+                subject_averages[subject]["AverageCorrect"] = float(average_correct or 0) * 100  # Convert to percentage
+                subject_averages[subject]["AverageIncorrect"] = float(average_incorrect or 0) * 100  # Convert to percentage
 
     except Exception as e:
         return None, "Error retrieving student test history: " + str(e)
     finally:
         release_pg_connection(pg_connection_pool, conn)
 
+    # Integration of calculate_chapterwise_report, once the connection above is back in the pool
+    chapterwise_report = calculate_chapterwise_report(student_id)
+    if "error" in chapterwise_report:
+        return None, "Error retrieving chapterwise report: " + chapterwise_report["error"]
+
+    # Combine the test history and chapterwise report in the return value
+    return {"history": formatted_history, "next_cursor": next_cursor, "averages": subject_averages, "chapterwise_report": chapterwise_report}, None
+
 def calculate_chapterwise_report(student_id: int):
+    # Evicted by update_proficiency_tables when one of the student's tests is scored
+    key = cache_key("analytics", "chapterwise", student_id)
+    report = cache_get("analytics", key)
+    if report is not None:
+        return report
+
+    read_started = time.monotonic()
     conn = create_pg_connection(pg_connection_pool)
     if conn is None:
         logging.error("Database connection failed")
@@ -100,7 +117,7 @@ def calculate_chapterwise_report(student_id: int):
                SUM(CASE WHEN sr.AnswerCorrect THEN 1 ELSE 0 END) as CorrectAnswers,
                SUM(CASE WHEN NOT sr.AnswerCorrect THEN 1 ELSE 0 END) as IncorrectAnswers,
                COUNT(sr.AnswerCorrect) as TotalQuestions
-        FROM StudentResponses sr
+        FROM AllStudentResponses sr
         INNER JOIN Questions q ON sr.QuestionID = q.QuestionID
         INNER JOIN Chapters c ON q.ChapterID = c.ChapterID
         INNER JOIN Subjects s ON c.SubjectID = s.SubjectID
@@ -136,6 +153,7 @@ def calculate_chapterwise_report(student_id: int):
     finally:
         release_pg_connection(pg_connection_pool, conn)
 
+    cache_fill("analytics", key, report, read_started)
     return report
 
 
@@ -143,6 +161,8 @@ def calculate_chapterwise_report(student_id: int):
 def get_chapter_proficiency(student_id):
     """
     Retrieve the chapter proficiency for a student.
+    Only the student's own ChapterProficiency rows are read; they are merged into the cached
+    chapter catalog, with chapters the student has not attempted reported as zero.
     """
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
@@ -150,13 +170,26 @@ def get_chapter_proficiency(student_id):
 
     try:
         with conn.cursor() as cur:
+            # The catalog version rides along with the sparse rows, so a stale catalog is
+            # detected without an extra round trip.
             cur.execute("""
-            SELECT C.ChapterID, C.ChapterTitle, COALESCE(CP.CorrectAnswers, 0) AS CorrectAnswers, 
-                COALESCE(CP.IncorrectAnswers, 0) AS IncorrectAnswers
-            FROM Chapters C
-            LEFT JOIN ChapterProficiency CP ON C.ChapterID = CP.ChapterID AND CP.StudentID = %s
+                SELECT CV.Version, CP.ChapterID, CP.CorrectAnswers, CP.IncorrectAnswers
+                FROM CatalogVersion CV
+                LEFT JOIN ChapterProficiency CP ON CP.StudentID = %s
             """, (student_id,))
-            proficiency = cur.fetchall()
+            rows = cur.fetchall()
+            catalog = get_catalog(cur, rows[0][0] if rows else None)
+            answered = {row[1]: (row[2] or 0, row[3] or 0) for row in rows if row[1] is not None}
+
+            proficiency = []
+            for chapter in catalog.chapters:
+                correct, incorrect = answered.get(chapter["ChapterID"], (0, 0))
+                proficiency.append({
+                    "ChapterID": chapter["ChapterID"],
+                    "ChapterTitle": chapter["ChapterTitle"],
+                    "CorrectAnswers": correct,
+                    "IncorrectAnswers": incorrect
+                })
             return proficiency, None
     except Exception as e:
         return None, str(e)
@@ -166,6 +199,8 @@ def get_chapter_proficiency(student_id):
 def get_subtopic_proficiency(student_id):
     """
     Retrieve the subtopic proficiency for a student.
+    Only the student's own SubtopicProficiency rows are read and merged into the cached
+    subtopic catalog.
     """
     conn = create_pg_connection(pg_connection_pool)
     if not conn:
@@ -174,12 +209,23 @@ def get_subtopic_proficiency(student_id):
     try:
         with conn.cursor() as cur:
             cur.execute("""
-                SELECT S.SubtopicID, S.SubtopicName, COALESCE(SP.CorrectAnswers, 0) AS CorrectAnswers, 
-                       COALESCE(SP.IncorrectAnswers, 0) AS IncorrectAnswers
-                FROM Subtopics S
-                LEFT JOIN SubtopicProficiency SP ON S.SubtopicID = SP.SubtopicID AND SP.StudentID = %s
+                SELECT CV.Version, SP.SubtopicID, SP.CorrectAnswers, SP.IncorrectAnswers
+                FROM CatalogVersion CV
+                LEFT JOIN SubtopicProficiency SP ON SP.StudentID = %s
             """, (student_id,))
-            proficiency = cur.fetchall()
+            rows = cur.fetchall()
+            catalog = get_catalog(cur, rows[0][0] if rows else None)
+            answered = {row[1]: (row[2] or 0, row[3] or 0) for row in rows if row[1] is not None}
+
+            proficiency = []
+            for subtopic in catalog.subtopics:
+                correct, incorrect = answered.get(subtopic["SubtopicID"], (0, 0))
+                proficiency.append({
+                    "SubtopicID": subtopic["SubtopicID"],
+                    "SubtopicName": subtopic["SubtopicName"],
+                    "CorrectAnswers": correct,
+                    "IncorrectAnswers": incorrect
+                })
             return proficiency, None
     except Exception as e:
         return None, str(e)
@@ -263,7 +309,7 @@ def student_test_history_in_excel(student_id):
                     placeholders = ','.join(['%s'] * len(ids))
                     query = f"""
                         SELECT AVG(SR.AnswerCorrect::int) AS AverageCorrect, AVG((NOT SR.AnswerCorrect)::int) AS AverageIncorrect
-                        FROM StudentResponses SR
+                        FROM AllStudentResponses SR
                         JOIN Questions Q ON SR.QuestionID = Q.QuestionID
                         JOIN Chapters C ON Q.ChapterID = C.ChapterID
                         WHERE SR.StudentID = %s AND C.SubjectID IN ({placeholders}) AND SR.AnswerCorrect IS NOT NULL
@@ -272,7 +318,7 @@ def student_test_history_in_excel(student_id):
                 else:
                     cur.execute("""
                         SELECT AVG(SR.AnswerCorrect::int) AS AverageCorrect, AVG((NOT SR.AnswerCorrect)::int) AS AverageIncorrect
-                        FROM StudentResponses SR
+                        FROM AllStudentResponses SR
                         JOIN Questions Q ON SR.QuestionID = Q.QuestionID
                         JOIN Chapters C ON Q.ChapterID = C.ChapterID
                         WHERE SR.StudentID = %s AND C.SubjectID = %s AND SR.AnswerCorrect IS NOT NULL
@@ -283,9 +329,18 @@ def student_test_history_in_excel(student_id):
                     subject_averages[subject]["AverageCorrect"] = float(avg_result[0] or 0) * 100
                     subject_averages[subject]["AverageIncorrect"] = float(avg_result[1] or 0) * 100
 
-            chapterwise_report = calculate_chapterwise_report(student_id)
-            if "error" in chapterwise_report:
-                return None, "Error retrieving chapterwise report: " + chapterwise_report["error"]
+    except Exception as e:
+        return None, "Error retrieving student test history: " + str(e)
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+    chapterwise_report = calculate_chapterwise_report(student_id)
+    if "error" in chapterwise_report:
+        return None, "Error retrieving chapterwise report: " + chapterwise_report["error"]
+
+    try:
+        # pandas (and the xlsxwriter engine) are only needed for exports, so they are imported on first use
+        import pandas as pd
 
         history_df = pd.DataFrame(formatted_history)
         averages_df = pd.DataFrame(subject_averages).T.reset_index().rename(columns={'index': 'Subject'})
@@ -308,5 +363,3 @@ def student_test_history_in_excel(student_id):
 
     except Exception as e:
         return None, "Error retrieving student test history: " + str(e)
-    finally:
-        release_pg_connection(pg_connection_pool, conn)
@@ -0,0 +1,84 @@
+import json
+from Backend.dbconfig.config import ITEM_STATISTICS_CONFIG, TEST_GENERATION_CONFIG
+from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.invalidation import publish
+from Backend.dbconfig.shared_cache import evict_used_questions
+
+
+def use_database_engine():
+    return TEST_GENERATION_CONFIG["engine"] == "database"
+
+
+def _selection_config():
+    # Difficulty balancing settings shared by both database functions
+    return {
+        "difficulty_balanced": ITEM_STATISTICS_CONFIG["difficulty_balanced_selection"],
+        "selection_oversample": ITEM_STATISTICS_CONFIG["selection_oversample"],
+        "difficulty_mix": ITEM_STATISTICS_CONFIG["difficulty_mix"],
+        "easy_correct_rate": ITEM_STATISTICS_CONFIG["easy_correct_rate"],
+        "hard_correct_rate": ITEM_STATISTICS_CONFIG["hard_correct_rate"],
+        "min_answered_for_difficulty": ITEM_STATISTICS_CONFIG["min_answered_for_difficulty"]
+    }
+
+
+def practice_generation_config():
+    config = _selection_config()
+    config["subjects"] = [
+        {"subject_id": subject_id, "name": details["name"], "questions": details["total_questions"]}
+        for subject_id, details in TEST_GENERATION_CONFIG["practice_subjects"].items()
+    ]
+    return config
+
+
+def mock_generation_config():
+    config = _selection_config()
+    config["subject_ids"] = TEST_GENERATION_CONFIG["mock_subject_ids"]
+    config["sections"] = [
+        {"section": section, "questions": count}
+        for section, count in TEST_GENERATION_CONFIG["mock_section_questions"].items()
+    ]
+    return config
+
+
+def _generate_in_database(function_sql, student_id, config):
+    conn = create_pg_connection(pg_connection_pool)
+    if not conn:
+        return None, "Database connection failed"
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(function_sql, (student_id, json.dumps(config)))
+            test_instance_id = cur.fetchone()[0]
+            # The function updated question_cache itself
+            publish(cur, "question_cache", student_id)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return None, str(e)
+    finally:
+        release_pg_connection(pg_connection_pool, conn)
+
+    evict_used_questions(student_id)
+    return test_instance_id, None
+
+
+def generate_practice_test_in_database(student_id):
+    """
+    Generates a practice test with the generate_practice_test database function, which selects
+    the questions and writes the test, its subjects, completion row, instance and the student's
+    question cache in one call.
+
+    :param student_id: ID of the student.
+    :return: The new TestInstanceID and an error message, if any.
+    """
+    return _generate_in_database("SELECT generate_practice_test(%s, %s::JSONB)", student_id, practice_generation_config())
+
+
+def generate_mock_test_in_database(student_id):
+    """
+    Generates a mock test with the generate_mock_test database function in one call.
+
+    :param student_id: ID of the student.
+    :return: The new TestInstanceID and an error message, if any.
+    """
+    return _generate_in_database("SELECT generate_mock_test(%s, %s::JSONB)", student_id, mock_generation_config())
@@ -1,6 +1,11 @@
 import datetime
 import json
 from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from Backend.dbconfig.prepared_statements import TEST_INSTANCE, PRACTICE_TEST_COMPLETION, MOCK_TEST_COMPLETION, execute_prepared
+from Backend.testmanagement.leaderboard import record_mock_test_score
+from Backend.testmanagement.item_statistics import update_item_statistics
+from Backend.dbconfig.invalidation import publish
+from Backend.dbconfig.shared_cache import cache_key
 
 def calculate_section_practice_test_results(student_id, test_instance_id, subject_code):
     subject_id_map = {1: 'Physics', 2: 'Chemistry', 3: ['Botany', 'Zoology']}
@@ -24,11 +29,12 @@ def calculate_section_practice_test_results(student_id, test_instance_id, subjec
 
             correct_answers, incorrect_answers, total_answering_time, total_responses = 0, 0, 0, 0
             last_response_date = None
+            scored_responses = []
 
             for subject_id in subject_ids:
                 cur.execute("""
                     SELECT SR.QuestionID, SR.StudentResponse, Q.Answer, CH.SubjectID, SR.AnsweringTimeInSeconds, SR.ResponseDate
-                    FROM StudentResponses SR
+                    FROM AllStudentResponses SR
                     JOIN Questions Q ON SR.QuestionID = Q.QuestionID
                     JOIN Chapters CH ON Q.ChapterID = CH.ChapterID
                     WHERE SR.StudentID = %s AND SR.TestInstanceID = %s AND CH.SubjectID = %s
@@ -40,6 +46,7 @@ def calculate_section_practice_test_results(student_id, test_instance_id, subjec
                     correct, incorrect = evaluate_response(student_response, answer)
                     correct_answers += correct
                     incorrect_answers += incorrect
+                    scored_responses.append((question_id, correct, incorrect, answering_time))
                     total_answering_time += answering_time if answering_time else 0
                     last_response_date = max(last_response_date, response_date) if last_response_date else response_date
                     total_responses += 1
@@ -47,8 +54,8 @@ def calculate_section_practice_test_results(student_id, test_instance_id, subjec
                     cur.execute("""
                         UPDATE StudentResponses
                         SET AnswerCorrect = %s
-                        WHERE TestInstanceID = %s AND QuestionID = %s
-                    """, (correct > 0, test_instance_id, question_id))
+                        WHERE StudentID = %s AND TestInstanceID = %s AND QuestionID = %s
+                    """, (correct > 0, student_id, test_instance_id, question_id))
 
             score = correct_answers * 4 - incorrect_answers
             average_answering_time_seconds = (total_answering_time / total_responses) if total_responses else 0
@@ -84,6 +91,7 @@ def calculate_section_practice_test_results(student_id, test_instance_id, subjec
 
             update_proficiency_tables(cur, student_id, test_instance_id)
             update_practice_test_proficiency(cur, student_id, score, correct_answers, incorrect_answers, average_answering_time_seconds, last_response_date)
+            update_item_statistics(cur, student_id, test_instance_id, scored_responses)
 
             conn.commit()
             return {
@@ -112,11 +120,7 @@ def calculate_test_results(student_id, test_instance_id):
     try:
         with conn.cursor() as cur:
             # Get the test type and test ID for the test instance
-            cur.execute("""
-                SELECT TestType, TestID
-                FROM TestInstances
-                WHERE TestInstanceID = %s AND StudentID = %s
-            """, (test_instance_id, student_id))
+            execute_prepared(cur, TEST_INSTANCE, (test_instance_id, student_id))
             test_instance_data = cur.fetchone() 
             if test_instance_data:
                 test_type, test_id = test_instance_data
@@ -125,17 +129,9 @@ def calculate_test_results(student_id, test_instance_id):
 
             # Check if the test is completed based on test type
             if test_type == "Practice":
-                cur.execute("""
-                    SELECT IsCompleted
-                    FROM PracticeTestCompletion
-                    WHERE PracticeTestID = %s AND StudentID = %s
-                """, (test_id, student_id))
+                execute_prepared(cur, PRACTICE_TEST_COMPLETION, (test_id, student_id))
             elif test_type == "Mock":
-                cur.execute("""
-                    SELECT IsCompleted
-                    FROM MockTestCompletion
-                    WHERE MockTestID = %s AND StudentID = %s
-                """, (test_id, student_id))
+                execute_prepared(cur, MOCK_TEST_COMPLETION, (test_id, student_id))
             else:
                 return None, "Invalid test type"
 
@@ -165,7 +161,7 @@ def calculate_practice_test_results(cur, student_id, test_instance_id, practice_
     # Adjusted query to join the tables based on your schema
     cur.execute("""
         SELECT SR.QuestionID, SR.StudentResponse, Q.Answer, CH.SubjectID, SR.AnsweringTimeInSeconds, SR.ResponseDate
-        FROM StudentResponses SR
+        FROM AllStudentResponses SR
         JOIN Questions Q ON SR.QuestionID = Q.QuestionID
         JOIN Chapters CH ON Q.ChapterID = CH.ChapterID
         JOIN PracticeTestQuestions PTQ ON Q.QuestionID = PTQ.QuestionID
@@ -182,11 +178,13 @@ def calculate_practice_test_results(cur, student_id, test_instance_id, practice_
     incorrect_answers = 0
     total_answering_time = 0
     last_test_datetime = None
+    scored_responses = []
 
     for question_id, student_response, answer, subject_id, answering_time, response_date in responses:
         correct, incorrect = evaluate_response(student_response, answer)
         correct_answers += correct
         incorrect_answers += incorrect
+        scored_responses.append((question_id, correct, incorrect, answering_time))
 
         # Update the AnswerCorrect column for each response
         answer_correct = correct > 0
@@ -205,8 +203,8 @@ def calculate_practice_test_results(cur, student_id, test_instance_id, practice_
 
     # Update TestHistory table
     cur.execute("""
-        INSERT INTO TestHistory (TestInstanceID, StudentID, Score, , CorrectAnswers, IncorrectAnswers, AverageAnsweringTimeInSeconds, LastTestAttempt)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)QuestionsAttempted
+        INSERT INTO TestHistory (TestInstanceID, StudentID, Score, QuestionsAttempted, CorrectAnswers, IncorrectAnswers, AverageAnsweringTimeInSeconds, LastTestAttempt)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (TestInstanceID, StudentID)
         DO UPDATE SET 
             Score = EXCLUDED.Score, 
@@ -224,6 +222,8 @@ def calculate_practice_test_results(cur, student_id, test_instance_id, practice_
     print("Updating Practice Test Proficiency")
     update_practice_test_proficiency(cur, student_id, score, correct_answers, incorrect_answers, avg_answering_time, last_test_datetime)
 
+    update_item_statistics(cur, student_id, test_instance_id, scored_responses)
+
     return {
         "score": score,
         "correct_answers": correct_answers,
@@ -239,7 +239,7 @@ def calculate_mock_test_results(cur, student_id, test_instance_id, test_id):
         # Retrieve responses, including subject and section information
         cur.execute("""
             SELECT SR.QuestionID, SR.StudentResponse, Q.Answer, CH.SubjectID,CH.ChapterID, NMTQ.Section, SR.AnsweringTimeInSeconds, SR.ResponseDate
-            FROM StudentResponses SR
+            FROM AllStudentResponses SR
             JOIN Questions Q ON SR.QuestionID = Q.QuestionID
             JOIN Chapters CH ON Q.ChapterID = CH.ChapterID
             JOIN NEETMockTestQuestions NMTQ ON Q.QuestionID = NMTQ.QuestionID AND NMTQ.MockTestID = %s
@@ -256,8 +256,10 @@ def calculate_mock_test_results(cur, student_id, test_instance_id, test_id):
         incorrect_answers = 0
         total_answering_time = 0
         chapters_total_correct_answer = {}
+        scored_responses = []
         for question_id, student_response, answer, subject_id,chapter_id, section, answering_time, response_date in responses:
             correct, incorrect = evaluate_response(student_response, answer)
+            scored_responses.append((question_id, correct, incorrect, answering_time))
             if correct:
                 correct_answers += 1
                 if subject_id not in chapters_total_correct_answer:
@@ -325,6 +327,9 @@ def calculate_mock_test_results(cur, student_id, test_instance_id, test_id):
         # Update mock test proficiency (assuming this function is defined elsewhere in your code)
         update_mock_test_proficiency(cur, student_id, score, correct_answers, incorrect_answers, avg_answering_time, last_response_date)
 
+        # Fold this test's responses into the per-question item statistics
+        update_item_statistics(cur, student_id, test_instance_id, scored_responses)
+
         return {
             "score": score,
             "correct_answers": correct_answers,
@@ -355,7 +360,7 @@ def update_proficiency_tables(cur, student_id, test_instance_id):
 
     cur.execute("""
         SELECT Q.ChapterID, Q.SubtopicID, SR.StudentResponse, Q.Answer
-        FROM StudentResponses SR
+        FROM AllStudentResponses SR
         JOIN Questions Q ON SR.QuestionID = Q.QuestionID
         WHERE SR.StudentID = %s AND SR.TestInstanceID = %s
     """, (student_id, test_instance_id))
@@ -366,7 +371,8 @@ def update_proficiency_tables(cur, student_id, test_instance_id):
     for chapter_id, subtopic_id, student_response, correct_answer in cur.fetchall():
         is_correct = student_response.lower() == correct_answer.lower()
         chapter_proficiency_data.append((student_id, chapter_id, is_correct))
-        subtopic_proficiency_data.append((student_id, subtopic_id, is_correct))
+        if subtopic_id is not None:  # Questions.SubtopicID is optional
+            subtopic_proficiency_data.append((student_id, subtopic_id, is_correct))
 
     # Debugging: Print fetched data
     if not chapter_proficiency_data and not subtopic_proficiency_data:
@@ -377,6 +383,8 @@ def update_proficiency_tables(cur, student_id, test_instance_id):
 
     update_proficiency_bulk(cur, chapter_proficiency_data, "ChapterProficiency", "ChapterID")
     update_proficiency_bulk(cur, subtopic_proficiency_data, "SubtopicProficiency", "SubtopicID")
+    # Every worker evicts the student's cached chapterwise report once the scores commit
+    publish(cur, "shared_cache", cache_key("analytics", "chapterwise", student_id))
 
 
 def update_proficiency_bulk(cur, proficiency_data, table_name, id_column_name):
@@ -534,6 +542,9 @@ def update_mock_test_proficiency(cur, student_id, score, correct_answers, incorr
             LastResponseDate = EXCLUDED.LastResponseDate
     """, (student_id, new_avg_score, new_avg_correct, new_avg_incorrect, new_avg_time, total_tests, last_test_datetime))
 
+    # Keep the leaderboard in step with the student's new average score
+    record_mock_test_score(cur, student_id, new_avg_score)
+
     print("MockTestProficiency table updated")
 
 
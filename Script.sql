@@ -9,6 +9,11 @@ CREATE TABLE IF NOT EXISTS Subjects (
 -- 2    Chemistry
 -- 3    Botany
 -- 4    Zoology
+-- The application relies on these IDs (e.g. MockTestConfiguration below), so they are seeded here.
+INSERT INTO Subjects (SubjectID, SubjectName)
+VALUES (1, 'Physics'), (2, 'Chemistry'), (3, 'Botany'), (4, 'Zoology')
+ON CONFLICT (SubjectID) DO NOTHING;
+SELECT setval(pg_get_serial_sequence('Subjects', 'subjectid'), (SELECT MAX(SubjectID) FROM Subjects));
 
 --2. Chapters Table
 -- This table lists the chapters for each subject, along with their titles and numbers.
@@ -57,8 +62,15 @@ CREATE TABLE IF NOT EXISTS Questions (
 -- Altering the 'Year' column from TEXT to DATE for more accurate date handling.
 -- The 'to_date' function is used to convert the text to a date format (YYYY).
 -- This change is important for improved sorting and filtering of questions by year.
-ALTER TABLE Questions
-ALTER COLUMN Year TYPE DATE USING to_date(Year, 'YYYY');
+-- Only converted while still TEXT, so the script can be re-run on an existing database.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'questions' AND column_name = 'year' AND data_type = 'text') THEN
+        ALTER TABLE Questions
+        ALTER COLUMN Year TYPE DATE USING to_date(Year, 'YYYY');
+    END IF;
+END $$;
 
 
 
@@ -142,8 +154,7 @@ CREATE TABLE IF NOT EXISTS PracticeTestCompletion (
 -- 'StudentID' refers to the ID of the student taking the test (from an external database).
 CREATE TABLE IF NOT EXISTS NEETMockTests (
     MockTestID INT PRIMARY KEY,
-    StudentID INT NOT null,
-    
+    StudentID INT NOT null
 );
 
 --6. NEETMockTestQuestions Table
@@ -159,7 +170,7 @@ CREATE TABLE IF NOT EXISTS NEETMockTestQuestions (
 );
 
 ALTER TABLE NEETMockTestQuestions
-ADD COLUMN Section VARCHAR(10);
+ADD COLUMN IF NOT EXISTS Section VARCHAR(10);
 
 -- 7. MockTestChapterWeightage Table
 -- This table stores the weightage for each chapter in the NEET Mock Test.
@@ -173,8 +184,13 @@ CREATE TABLE IF NOT EXISTS MockTestChapterWeightage (
     FOREIGN KEY (SubjectID) REFERENCES Subjects(SubjectID)
 );
 
-ALTER TABLE MockTestChapterWeightage
-ADD CONSTRAINT unique_chapter_subject UNIQUE (ChapterID, SubjectID);
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'unique_chapter_subject') THEN
+        ALTER TABLE MockTestChapterWeightage
+        ADD CONSTRAINT unique_chapter_subject UNIQUE (ChapterID, SubjectID);
+    END IF;
+END $$;
 
 -- Query to update weights in the MockTestChapterWeightage table
 DO $$
@@ -215,11 +231,13 @@ CREATE TABLE IF NOT EXISTS MockTestConfiguration (
 -- Pre-populating MockTestConfiguration with fixed values for each subject.
 -- Assuming Subject IDs for Physics, Chemistry, Botany, and Zoology are 1, 2, 3, and 4 respectively.
 INSERT INTO MockTestConfiguration (SubjectID, SectionAQuestions, SectionBQuestions)
-VALUES
+SELECT * FROM (VALUES
 (1, 35, 15), -- Physics
 (2, 35, 15), -- Chemistry
 (3, 35, 15), -- Botany
-(4, 35, 15); -- Zoology
+(4, 35, 15)  -- Zoology
+) AS Defaults (SubjectID, SectionAQuestions, SectionBQuestions)
+WHERE NOT EXISTS (SELECT 1 FROM MockTestConfiguration C WHERE C.SubjectID = Defaults.SubjectID);
 
 -- 9. StudentMockTestHistory Table
 -- This table stores the history of questions given to a student in mock tests.
@@ -263,18 +281,32 @@ CREATE TABLE IF NOT EXISTS MockTestCompletion (
 -- 'StudentResponse' stores the option chosen by the student (A, B, C, D, etc.).
 -- 'AnsweringTimeInSeconds' records the time taken by the student to answer the question.
 -- 'ResponseDate' captures the timestamp when the response was recorded.
+-- Hash-partitioned by StudentID; every unique constraint includes it. Scored responses older than
+-- a few months move to StudentResponsesArchive (section 13); read both through AllStudentResponses.
 CREATE TABLE IF NOT EXISTS StudentResponses (
-    ResponseID SERIAL PRIMARY KEY,
+    ResponseID SERIAL NOT NULL,
     TestInstanceID INT NOT NULL,
     StudentID INT NOT NULL,
     QuestionID INT NOT NULL,
     StudentResponse TEXT,
     AnsweringTimeInSeconds INT,
     ResponseDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ResponseID, StudentID),
     UNIQUE (TestInstanceID, StudentID, QuestionID), -- Add a unique constraint
     FOREIGN KEY (TestInstanceID) REFERENCES TestInstances(TestInstanceID),
     FOREIGN KEY (QuestionID) REFERENCES Questions(QuestionID)
-);
+) PARTITION BY HASH (StudentID);
+
+-- Skipped when an existing StudentResponses is not partitioned yet; migrations/0002 converts it.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'studentresponses'::regclass) THEN
+        FOR remainder IN 0..7 LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS StudentResponses_p%s PARTITION OF StudentResponses
+                            FOR VALUES WITH (MODULUS 8, REMAINDER %s)', remainder, remainder);
+        END LOOP;
+    END IF;
+END $$;
 
 --2. TestHistory Table
 -- Creates a table for storing the overall history of tests taken by students.
@@ -283,8 +315,9 @@ CREATE TABLE IF NOT EXISTS StudentResponses (
 -- 'StudentID' refers to the ID of the student (from an external database).
 -- The table includes metrics like score, questions attempted, correct/incorrect answers,
 -- and the average answering time per question.
+-- Hash-partitioned by StudentID like StudentResponses.
 CREATE TABLE IF NOT EXISTS TestHistory (
-    HistoryID SERIAL PRIMARY KEY,               -- Unique identifier for each test history entry.
+    HistoryID SERIAL NOT NULL,                  -- Unique identifier for each test history entry.
     TestInstanceID INT NOT NULL,                -- Reference to the specific test instance.
     StudentID INT NOT NULL,                     -- ID of the student taking the test.
     Score INT,                                  -- Total score achieved in the test.
@@ -293,11 +326,28 @@ CREATE TABLE IF NOT EXISTS TestHistory (
     IncorrectAnswers INT,                       -- Number of incorrect answers.
     AverageAnsweringTimeInSeconds FLOAT,        -- Average time taken per question in seconds.
     LastTestAttempt TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Date of last test attempt
+    PRIMARY KEY (HistoryID, StudentID),
     FOREIGN KEY (TestInstanceID) REFERENCES TestInstances(TestInstanceID)  -- Link to TestInstances table.
-);
+) PARTITION BY HASH (StudentID);
 
-ALTER TABLE TestHistory
-ADD UNIQUE (TestInstanceID, StudentID);
+-- Skipped when an existing TestHistory is not partitioned yet; migrations/0002 converts it.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'testhistory'::regclass) THEN
+        FOR remainder IN 0..7 LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS TestHistory_p%s PARTITION OF TestHistory
+                            FOR VALUES WITH (MODULUS 8, REMAINDER %s)', remainder, remainder);
+        END LOOP;
+    END IF;
+END $$;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'testhistory'::regclass AND contype = 'u') THEN
+        ALTER TABLE TestHistory
+        ADD UNIQUE (TestInstanceID, StudentID);
+    END IF;
+END $$;
 
 --3. ChapterProficiency Table
 -- Creates a table for tracking student proficiency at the chapter level.
@@ -373,4 +423,440 @@ CREATE TABLE IF NOT EXISTS MockTestProficiency (
     TotalTestsTaken INT, -- Total number of mock tests taken
     LastResponseDate TIMESTAMP,
     PRIMARY KEY (StudentID)
-);
\ No newline at end of file
+);
+--8. MockTestLeaderboard Table
+-- Stores each student's current average mock test score for ranking.
+-- It mirrors MockTestProficiency.AverageScore and is written in the same transaction by the scoring path.
+-- Workers keep an in-process bucketed histogram of these scores and pull rows changed since
+-- their last sync through the UpdatedAt index, so rank/percentile lookups never sort the table.
+CREATE TABLE IF NOT EXISTS MockTestLeaderboard (
+    StudentID INT PRIMARY KEY,                          -- ID of the student
+    Score NUMERIC NOT NULL,                             -- Current average mock test score
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT clock_timestamp()  -- Time of the last score change
+);
+
+CREATE INDEX IF NOT EXISTS idx_mocktestleaderboard_updatedat ON MockTestLeaderboard (UpdatedAt);
+
+-- Seed the leaderboard from existing mock test proficiency data.
+INSERT INTO MockTestLeaderboard (StudentID, Score)
+SELECT StudentID, AverageScore FROM MockTestProficiency WHERE AverageScore IS NOT NULL
+ON CONFLICT (StudentID) DO UPDATE SET Score = EXCLUDED.Score;
+
+--9. QuestionStatistics Table
+-- Per-question item statistics, maintained incrementally by the scoring path and by the
+-- backfill job (python -m Backend.testmanagement.item_statistics).
+-- Answering time is kept as a running mean plus M2 (sum of squared deviations), so
+-- variance = M2AnsweringTime / TimeSamples and batches can be merged in any order.
+-- A response is a skip when it is neither correct nor incorrect (empty or 'na').
+CREATE TABLE IF NOT EXISTS QuestionStatistics (
+    QuestionID INT PRIMARY KEY REFERENCES Questions(QuestionID),
+    Attempts INT NOT NULL DEFAULT 0,                -- Scored responses, including skips
+    CorrectCount INT NOT NULL DEFAULT 0,
+    IncorrectCount INT NOT NULL DEFAULT 0,
+    SkippedCount INT NOT NULL DEFAULT 0,
+    TimeSamples INT NOT NULL DEFAULT 0,             -- Responses with a recorded answering time
+    MeanAnsweringTime FLOAT NOT NULL DEFAULT 0,
+    M2AnsweringTime FLOAT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- AnswerCorrect is written by the scoring path; declared here for databases created from this script.
+ALTER TABLE StudentResponses
+ADD COLUMN IF NOT EXISTS AnswerCorrect BOOLEAN;
+
+-- Marks responses already folded into QuestionStatistics so re-scoring never double counts.
+ALTER TABLE StudentResponses
+ADD COLUMN IF NOT EXISTS StatsRecorded BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Lets the backfill job find uncounted scored responses by QuestionID range.
+CREATE INDEX IF NOT EXISTS idx_studentresponses_stats_pending ON StudentResponses (QuestionID)
+WHERE NOT StatsRecorded AND AnswerCorrect IS NOT NULL;
+
+-- IsActive flags used by question selection and the chapter dropdown; declared here for
+-- databases created from this script.
+ALTER TABLE Chapters
+ADD COLUMN IF NOT EXISTS IsActive BOOLEAN DEFAULT TRUE;
+
+ALTER TABLE Subtopics
+ADD COLUMN IF NOT EXISTS IsActive BOOLEAN DEFAULT TRUE;
+
+--10. CatalogVersion Table
+-- Single-row version counter for the static content catalog (Subjects, Chapters, Subtopics).
+-- Statement-level triggers bump it on every change, so workers can keep the catalog in memory
+-- and reload it only when the version they hold is out of date.
+CREATE TABLE IF NOT EXISTS CatalogVersion (
+    ID BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (ID),     -- Enforces a single row
+    Version BIGINT NOT NULL DEFAULT 1,
+    QuestionBankVersion BIGINT NOT NULL DEFAULT 1,      -- Bumped on changes to Questions and Images
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO CatalogVersion (ID) VALUES (TRUE) ON CONFLICT (ID) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE CatalogVersion SET Version = Version + 1, UpdatedAt = CURRENT_TIMESTAMP;
+    PERFORM pg_notify('cache_invalidation', 'catalog');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS subjects_catalog_version ON Subjects;
+CREATE TRIGGER subjects_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Subjects
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+DROP TRIGGER IF EXISTS chapters_catalog_version ON Chapters;
+CREATE TRIGGER chapters_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Chapters
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+DROP TRIGGER IF EXISTS subtopics_catalog_version ON Subtopics;
+CREATE TRIGGER subtopics_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Subtopics
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+-- QuestionBankVersion tells workers when to rebuild their memory-mapped question bank snapshot
+-- (Backend/testmanagement/question_bank.py).
+CREATE OR REPLACE FUNCTION bump_question_bank_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE CatalogVersion SET QuestionBankVersion = QuestionBankVersion + 1, UpdatedAt = CURRENT_TIMESTAMP;
+    PERFORM pg_notify('cache_invalidation', 'question_bank');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_question_bank_version ON Questions;
+CREATE TRIGGER questions_question_bank_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Questions
+FOR EACH STATEMENT EXECUTE FUNCTION bump_question_bank_version();
+
+DROP TRIGGER IF EXISTS images_question_bank_version ON Images;
+CREATE TRIGGER images_question_bank_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Images
+FOR EACH STATEMENT EXECUTE FUNCTION bump_question_bank_version();
+
+-- The version bumps above and MockTestChapterWeightage changes also notify every API worker on the
+-- cache_invalidation channel (Backend/dbconfig/invalidation.py), so in-process caches are dropped on commit.
+CREATE OR REPLACE FUNCTION notify_chapter_weightage() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidation', 'chapter_weightage');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS mocktestchapterweightage_notify ON MockTestChapterWeightage;
+CREATE TRIGGER mocktestchapterweightage_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON MockTestChapterWeightage
+FOR EACH STATEMENT EXECUTE FUNCTION notify_chapter_weightage();
+
+-- Keyset pagination of a student's tests, newest first (TestDateTime DESC, TestInstanceID DESC).
+-- The second index serves the same page when filtered by test type.
+CREATE INDEX IF NOT EXISTS idx_testinstances_student_datetime
+ON TestInstances (StudentID, TestDateTime, TestInstanceID);
+
+CREATE INDEX IF NOT EXISTS idx_testinstances_student_type_datetime
+ON TestInstances (StudentID, TestType, TestDateTime, TestInstanceID);
+
+--11. Tables used by the application that were created outside this script.
+-- question_cache: questions already served to a student per test type, so new tests avoid repeats.
+CREATE TABLE IF NOT EXISTS question_cache (
+    student_id INT NOT NULL,
+    test_type TEXT NOT NULL,                    -- 'practice' or 'mock'
+    cached_questions JSONB,                     -- JSON array of QuestionIDs
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, test_type)
+);
+
+-- StudentChapterWeightage: per-student chapter weightage snapshots written after scoring and
+-- read (latest first) by practice test question selection.
+CREATE TABLE IF NOT EXISTS StudentChapterWeightage (
+    StudentChapterWeightageID SERIAL PRIMARY KEY,
+    StudentID INT NOT NULL,
+    SubjectID INT NOT NULL,
+    ChapterWeightage JSONB                      -- {ChapterID: weightage}
+);
+
+-- AppIssues / QuestionIssues: issues reported from the app.
+CREATE TABLE IF NOT EXISTS AppIssues (
+    IssueID SERIAL PRIMARY KEY,
+    UserID INT NOT NULL,
+    IssueDescription TEXT NOT NULL,
+    ReportedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS QuestionIssues (
+    IssueID SERIAL PRIMARY KEY,
+    QuestionID INT NOT NULL REFERENCES Questions(QuestionID),
+    IssueComment TEXT NOT NULL,
+    ReportedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+--12. Indexes for hot queries (also shipped as migrations/0001_hot_query_indexes.sql).
+-- TestInstances.StudentID and NEETMockTestQuestions.MockTestID are already covered by
+-- idx_testinstances_student_datetime and the NEETMockTestQuestions primary key.
+CREATE INDEX IF NOT EXISTS idx_questions_chapter_subtopic ON Questions (ChapterID, SubtopicID);
+CREATE INDEX IF NOT EXISTS idx_images_question ON Images (QuestionID);
+CREATE INDEX IF NOT EXISTS idx_studentresponses_student_instance ON StudentResponses (StudentID, TestInstanceID);
+CREATE INDEX IF NOT EXISTS idx_practicetestsubjects_test_subject ON PracticeTestSubjects (PracticeTestID, SubjectName);
+CREATE INDEX IF NOT EXISTS idx_studentchapterweightage_student_subject
+ON StudentChapterWeightage (StudentID, SubjectID, StudentChapterWeightageID DESC);
+
+--13. StudentResponsesArchive: cold store for scored responses, moved out of StudentResponses by
+-- Backend/testmanagement/response_archive.py. Monthly range partitions are created by the job.
+-- Readers that may need responses of any age use the AllStudentResponses view.
+CREATE TABLE IF NOT EXISTS StudentResponsesArchive (
+    ResponseID INT NOT NULL,
+    TestInstanceID INT NOT NULL,
+    StudentID INT NOT NULL,
+    QuestionID INT NOT NULL,
+    StudentResponse TEXT,
+    AnsweringTimeInSeconds INT,
+    ResponseDate TIMESTAMP NOT NULL,
+    AnswerCorrect BOOLEAN,
+    StatsRecorded BOOLEAN NOT NULL DEFAULT TRUE
+) PARTITION BY RANGE (ResponseDate);
+
+CREATE INDEX IF NOT EXISTS idx_studentresponsesarchive_student_instance
+ON StudentResponsesArchive (StudentID, TestInstanceID);
+
+-- Lets the archive job find old scored responses without scanning the hot table.
+CREATE INDEX IF NOT EXISTS idx_studentresponses_archivable ON StudentResponses (ResponseDate) WHERE StatsRecorded;
+
+CREATE OR REPLACE VIEW AllStudentResponses AS
+SELECT ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+       AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded
+FROM StudentResponses
+UNION ALL
+SELECT ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+       AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded
+FROM StudentResponsesArchive;
+
+--14. Test generation functions (also shipped as migrations/0003_test_generation_functions.sql), used when
+-- TEST_GENERATION_CONFIG["engine"] is "database".
+
+-- Picks up to p_count questions from p_candidates following the difficulty mix in p_config,
+-- like select_balanced_by_difficulty() in Backend/testmanagement/item_statistics.py.
+CREATE OR REPLACE FUNCTION select_balanced_by_difficulty(p_candidates INT[], p_count INT, p_config JSONB)
+RETURNS INT[] AS $$
+    WITH banded AS (
+        SELECT C.QuestionID, random() AS R,
+               CASE
+                   WHEN COALESCE(S.CorrectCount + S.IncorrectCount, 0) < (p_config->>'min_answered_for_difficulty')::INT THEN 'medium'
+                   WHEN S.CorrectCount::FLOAT / (S.CorrectCount + S.IncorrectCount) >= (p_config->>'easy_correct_rate')::FLOAT THEN 'easy'
+                   WHEN S.CorrectCount::FLOAT / (S.CorrectCount + S.IncorrectCount) <= (p_config->>'hard_correct_rate')::FLOAT THEN 'hard'
+                   ELSE 'medium'
+               END AS Band
+        FROM (SELECT DISTINCT QuestionID FROM unnest(p_candidates) AS C(QuestionID)) C
+        LEFT JOIN QuestionStatistics S ON S.QuestionID = C.QuestionID
+    ), ranked AS (
+        SELECT QuestionID, R,
+               row_number() OVER (PARTITION BY Band ORDER BY R) <= round(COALESCE((p_config->'difficulty_mix'->>Band)::NUMERIC, 0) * p_count) AS InMix
+        FROM banded
+    )
+    -- Each band's share first, then the remaining candidates at random. The fill needs its own
+    -- random order: the leftovers of a band are the ones with the highest R.
+    SELECT ARRAY(SELECT QuestionID FROM ranked ORDER BY InMix DESC, random() LIMIT p_count);
+$$ LANGUAGE sql VOLATILE;
+
+-- Random ID in [p_low, p_high] not yet used in p_table ('TestInstances', 'PracticeTests' or
+-- 'NEETMockTests'), like the Python engine's random IDs.
+CREATE OR REPLACE FUNCTION random_free_test_id(p_table TEXT, p_low INT, p_high INT)
+RETURNS INT AS $$
+DECLARE
+    v_id INT;
+    v_taken BOOLEAN;
+BEGIN
+    FOR attempt IN 1..100 LOOP
+        v_id := p_low + floor(random() * (p_high - p_low + 1))::INT;
+        v_taken := CASE p_table
+            WHEN 'TestInstances' THEN EXISTS (SELECT 1 FROM TestInstances WHERE TestInstanceID = v_id)
+            WHEN 'PracticeTests' THEN EXISTS (SELECT 1 FROM PracticeTests WHERE PracticeTestID = v_id)
+            ELSE EXISTS (SELECT 1 FROM NEETMockTests WHERE MockTestID = v_id)
+        END;
+        IF NOT v_taken THEN
+            RETURN v_id;
+        END IF;
+    END LOOP;
+    RAISE EXCEPTION 'No free % ID found between % and %', p_table, p_low, p_high;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Questions already served to a student for a test type (question_cache), as an array.
+CREATE OR REPLACE FUNCTION cached_question_ids(p_student_id INT, p_test_type TEXT)
+RETURNS INT[] AS $$
+    SELECT COALESCE(array_agg(Q.QuestionID::INT), '{}')
+    FROM question_cache QC, jsonb_array_elements_text(QC.cached_questions) AS Q(QuestionID)
+    WHERE QC.student_id = p_student_id AND QC.test_type = p_test_type
+      AND jsonb_typeof(QC.cached_questions) = 'array';
+$$ LANGUAGE sql STABLE;
+
+-- p_config: {"subjects": [{"subject_id", "name", "questions"}], "difficulty_balanced",
+--            "selection_oversample", "difficulty_mix", "easy_correct_rate", "hard_correct_rate",
+--            "min_answered_for_difficulty"}
+CREATE OR REPLACE FUNCTION generate_practice_test(p_student_id INT, p_config JSONB)
+RETURNS INT AS $$
+DECLARE
+    v_practice_test_id INT := random_free_test_id('PracticeTests', 1000, 99999);
+    v_test_instance_id INT := random_free_test_id('TestInstances', 1000, 99999);
+    v_used INT[] := cached_question_ids(p_student_id, 'practice');
+    v_all_selected INT[] := '{}';
+    v_subject JSONB;
+    v_count INT;
+    v_subject_test_id INT;
+    v_selected INT[];
+BEGIN
+    INSERT INTO PracticeTests (PracticeTestID, StudentID) VALUES (v_practice_test_id, p_student_id);
+    INSERT INTO PracticeTestCompletion (PracticeTestID, StudentID, IsCompleted) VALUES (v_practice_test_id, p_student_id, FALSE);
+
+    FOR v_subject IN SELECT value FROM jsonb_array_elements(p_config->'subjects') LOOP
+        v_count := (v_subject->>'questions')::INT;
+        IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+            v_count := v_count * (p_config->>'selection_oversample')::INT;
+        END IF;
+
+        -- Unused questions of active chapters whose subtopic is active (or that have none), at random
+        v_selected := ARRAY(
+            SELECT q.QuestionID
+            FROM Questions q
+            INNER JOIN Chapters c ON q.ChapterID = c.ChapterID
+            LEFT JOIN Subtopics s ON q.SubtopicID = s.SubtopicID
+            WHERE c.SubjectID = (v_subject->>'subject_id')::INT AND c.IsActive = TRUE
+              AND (s.IsActive IS TRUE OR q.SubtopicID IS NULL)
+              AND q.QuestionID NOT IN (SELECT unnest(v_used))
+            ORDER BY random()
+            LIMIT v_count
+        );
+        IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+            v_selected := select_balanced_by_difficulty(v_selected, (v_subject->>'questions')::INT, p_config);
+        END IF;
+
+        INSERT INTO PracticeTestSubjects (PracticeTestID, SubjectName)
+        VALUES (v_practice_test_id, v_subject->>'name')
+        RETURNING PracticeTestSubjectID INTO v_subject_test_id;
+
+        INSERT INTO PracticeTestQuestions (PracticeTestSubjectID, QuestionID)
+        SELECT v_subject_test_id, QuestionID FROM unnest(v_selected) AS S(QuestionID);
+
+        v_all_selected := v_all_selected || v_selected;
+    END LOOP;
+
+    INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
+    VALUES (v_test_instance_id, p_student_id, v_practice_test_id, 'Practice');
+
+    INSERT INTO question_cache (student_id, test_type, cached_questions)
+    VALUES (p_student_id, 'practice', to_jsonb(v_used || ARRAY(SELECT Q FROM unnest(v_all_selected) AS Q WHERE Q <> ALL(v_used))))
+    ON CONFLICT (student_id, test_type) DO UPDATE
+    SET cached_questions = EXCLUDED.cached_questions, last_updated = CURRENT_TIMESTAMP;
+
+    RETURN v_test_instance_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- p_config: {"subject_ids": [...], "sections": [{"section", "questions"}], plus the difficulty
+--            settings of generate_practice_test}
+CREATE OR REPLACE FUNCTION generate_mock_test(p_student_id INT, p_config JSONB)
+RETURNS INT AS $$
+DECLARE
+    v_mock_test_id INT := random_free_test_id('NEETMockTests', 1000, 9999);
+    v_test_instance_id INT := random_free_test_id('TestInstances', 1000, 9999);
+    v_used INT[] := cached_question_ids(p_student_id, 'mock');
+    v_in_test INT[] := '{}';
+    v_subject_id INT;
+    v_section JSONB;
+    v_required INT;
+    v_count INT;
+    v_available INT;
+    v_selected INT[];
+BEGIN
+    INSERT INTO NEETMockTests (MockTestID, StudentID) VALUES (v_mock_test_id, p_student_id);
+
+    FOR v_subject_id IN SELECT value::INT FROM jsonb_array_elements_text(p_config->'subject_ids') LOOP
+        FOR v_section IN SELECT value FROM jsonb_array_elements(p_config->'sections') LOOP
+            v_required := (v_section->>'questions')::INT;
+            v_count := v_required;
+            IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+                v_count := v_required * (p_config->>'selection_oversample')::INT;
+            END IF;
+
+            -- Each chapter's share of the section by MockTestChapterWeightage (percent), the rest at
+            -- random, from the questions not served yet. The fill is ordered by a second random(): the
+            -- planner would otherwise reuse the quota's sort key, and the leftovers of each chapter's
+            -- quota sort last.
+            SELECT COALESCE(array_agg(QuestionID), '{}'), COALESCE(max(Available), 0) INTO v_selected, v_available
+            FROM (
+                SELECT QuestionID, Available FROM (
+                    SELECT q.QuestionID, count(*) OVER () AS Available,
+                           row_number() OVER (PARTITION BY q.ChapterID ORDER BY random())
+                               <= floor(COALESCE(W.Weightage, 0) * v_count / 100) AS InQuota
+                    FROM Questions q
+                    JOIN Chapters c ON q.ChapterID = c.ChapterID
+                    LEFT JOIN MockTestChapterWeightage W ON W.ChapterID = q.ChapterID AND W.SubjectID = v_subject_id
+                    WHERE c.SubjectID = v_subject_id AND q.QuestionID NOT IN (SELECT unnest(v_used)) AND q.QuestionID NOT IN (SELECT unnest(v_in_test))
+                ) candidates
+                ORDER BY InQuota DESC, random()
+                LIMIT v_count
+            ) picked;
+
+            IF v_available >= v_required THEN
+                IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+                    v_selected := select_balanced_by_difficulty(v_selected, v_required, p_config);
+                END IF;
+            ELSE
+                -- Not enough unused questions: reuse served ones, highest-weighted chapters first
+                v_selected := ARRAY(
+                    SELECT q.QuestionID
+                    FROM Questions q
+                    JOIN Chapters c ON q.ChapterID = c.ChapterID
+                    LEFT JOIN MockTestChapterWeightage W ON W.ChapterID = q.ChapterID AND W.SubjectID = v_subject_id
+                    WHERE c.SubjectID = v_subject_id AND q.QuestionID NOT IN (SELECT unnest(v_in_test))
+                    ORDER BY q.QuestionID = ANY(v_used), W.Weightage DESC NULLS LAST, random()
+                    LIMIT v_required
+                );
+            END IF;
+
+            INSERT INTO NEETMockTestQuestions (MockTestID, QuestionID, Section)
+            SELECT v_mock_test_id, QuestionID, v_section->>'section' FROM unnest(v_selected) AS S(QuestionID);
+
+            v_in_test := v_in_test || v_selected;
+            v_used := v_used || ARRAY(SELECT Q FROM unnest(v_selected) AS Q WHERE Q <> ALL(v_used));
+        END LOOP;
+    END LOOP;
+
+    INSERT INTO MockTestCompletion (MockTestID, StudentID, IsCompleted) VALUES (v_mock_test_id, p_student_id, FALSE);
+    INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
+    VALUES (v_test_instance_id, p_student_id, v_mock_test_id, 'Mock');
+
+    INSERT INTO question_cache (student_id, test_type, cached_questions)
+    VALUES (p_student_id, 'mock', to_jsonb(v_used))
+    ON CONFLICT (student_id, test_type) DO UPDATE
+    SET cached_questions = EXCLUDED.cached_questions, last_updated = CURRENT_TIMESTAMP;
+
+    RETURN v_test_instance_id;
+END;
+$$ LANGUAGE plpgsql;
+
+--15. SharedCache: entries of the "postgres" shared cache backend (Backend/dbconfig/shared_cache.py).
+-- UNLOGGED: cache writes skip the WAL and are not replicated; the table is emptied after a crash.
+CREATE UNLOGGED TABLE IF NOT EXISTS SharedCache (
+    Key TEXT PRIMARY KEY,                       -- namespace:part:...
+    Value TEXT NOT NULL,                        -- JSON
+    ExpiresAt TIMESTAMPTZ NOT NULL
+);
+
+--16. SchemaMigrations: files from migrations/ applied by tools/migrate.py.
+-- A database built from this script already includes every migration listed here.
+CREATE TABLE IF NOT EXISTS SchemaMigrations (
+    Version TEXT PRIMARY KEY,               -- Migration file name without .sql
+    AppliedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO SchemaMigrations (Version) VALUES
+('0000_schema_additions'),
+('0001_hot_query_indexes'),
+('0003_test_generation_functions'),
+('0004_question_bank_version'),
+('0005_cache_invalidation_notify'),
+('0006_shared_cache')
+ON CONFLICT (Version) DO NOTHING;
+
+-- Re-running this script does not partition an existing StudentResponses, so 0002 only counts
+-- as applied once it is partitioned.
+INSERT INTO SchemaMigrations (Version)
+SELECT '0002_partition_student_responses'
+WHERE EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'studentresponses'::regclass)
+ON CONFLICT (Version) DO NOTHING;
\ No newline at end of file
@@ -0,0 +1,113 @@
+-- Schema added to Script.sql before migrations/ existed, for databases created before it: the tables
+-- the application used without the script creating them, the mock test leaderboard, item statistics,
+-- the catalog version and keyset pagination. Later migrations build on it (0001 indexes
+-- StudentChapterWeightage, 0002 copies AnswerCorrect/StatsRecorded, 0004 extends CatalogVersion),
+-- so it sorts first.
+-- Every statement is idempotent: databases created from a recent Script.sql already have all of it.
+
+-- Tables the application used before the script created them.
+CREATE TABLE IF NOT EXISTS question_cache (
+    student_id INT NOT NULL,
+    test_type TEXT NOT NULL,
+    cached_questions JSONB,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, test_type)
+);
+
+CREATE TABLE IF NOT EXISTS StudentChapterWeightage (
+    StudentChapterWeightageID SERIAL PRIMARY KEY,
+    StudentID INT NOT NULL,
+    SubjectID INT NOT NULL,
+    ChapterWeightage JSONB
+);
+
+CREATE TABLE IF NOT EXISTS AppIssues (
+    IssueID SERIAL PRIMARY KEY,
+    UserID INT NOT NULL,
+    IssueDescription TEXT NOT NULL,
+    ReportedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS QuestionIssues (
+    IssueID SERIAL PRIMARY KEY,
+    QuestionID INT NOT NULL REFERENCES Questions(QuestionID),
+    IssueComment TEXT NOT NULL,
+    ReportedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Mock test leaderboard, seeded from existing mock test proficiency data.
+CREATE TABLE IF NOT EXISTS MockTestLeaderboard (
+    StudentID INT PRIMARY KEY,
+    Score NUMERIC NOT NULL,
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_mocktestleaderboard_updatedat ON MockTestLeaderboard (UpdatedAt);
+
+INSERT INTO MockTestLeaderboard (StudentID, Score)
+SELECT StudentID, AverageScore FROM MockTestProficiency WHERE AverageScore IS NOT NULL
+ON CONFLICT (StudentID) DO NOTHING;
+
+-- Per-question item statistics and the response columns that feed them.
+CREATE TABLE IF NOT EXISTS QuestionStatistics (
+    QuestionID INT PRIMARY KEY REFERENCES Questions(QuestionID),
+    Attempts INT NOT NULL DEFAULT 0,
+    CorrectCount INT NOT NULL DEFAULT 0,
+    IncorrectCount INT NOT NULL DEFAULT 0,
+    SkippedCount INT NOT NULL DEFAULT 0,
+    TimeSamples INT NOT NULL DEFAULT 0,
+    MeanAnsweringTime FLOAT NOT NULL DEFAULT 0,
+    M2AnsweringTime FLOAT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE StudentResponses ADD COLUMN IF NOT EXISTS AnswerCorrect BOOLEAN;
+ALTER TABLE StudentResponses ADD COLUMN IF NOT EXISTS StatsRecorded BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_studentresponses_stats_pending ON StudentResponses (QuestionID)
+WHERE NOT StatsRecorded AND AnswerCorrect IS NOT NULL;
+
+ALTER TABLE Chapters ADD COLUMN IF NOT EXISTS IsActive BOOLEAN DEFAULT TRUE;
+ALTER TABLE Subtopics ADD COLUMN IF NOT EXISTS IsActive BOOLEAN DEFAULT TRUE;
+
+-- Catalog version counter and the triggers that bump it.
+CREATE TABLE IF NOT EXISTS CatalogVersion (
+    ID BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (ID),
+    Version BIGINT NOT NULL DEFAULT 1,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO CatalogVersion (ID) VALUES (TRUE) ON CONFLICT (ID) DO NOTHING;
+
+-- Created only if missing: 0005 replaces the function with one that also notifies, and a database
+-- that applied 0005 before this migration must keep that version.
+DO $$
+BEGIN
+    IF to_regproc('bump_catalog_version') IS NULL THEN
+        CREATE FUNCTION bump_catalog_version() RETURNS TRIGGER AS $function$
+        BEGIN
+            UPDATE CatalogVersion SET Version = Version + 1, UpdatedAt = CURRENT_TIMESTAMP;
+            RETURN NULL;
+        END;
+        $function$ LANGUAGE plpgsql;
+    END IF;
+END $$;
+
+DROP TRIGGER IF EXISTS subjects_catalog_version ON Subjects;
+CREATE TRIGGER subjects_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Subjects
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+DROP TRIGGER IF EXISTS chapters_catalog_version ON Chapters;
+CREATE TRIGGER chapters_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Chapters
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+DROP TRIGGER IF EXISTS subtopics_catalog_version ON Subtopics;
+CREATE TRIGGER subtopics_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Subtopics
+FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+-- Keyset pagination of a student's tests, newest first.
+CREATE INDEX IF NOT EXISTS idx_testinstances_student_datetime
+ON TestInstances (StudentID, TestDateTime, TestInstanceID);
+
+CREATE INDEX IF NOT EXISTS idx_testinstances_student_type_datetime
+ON TestInstances (StudentID, TestType, TestDateTime, TestInstanceID);
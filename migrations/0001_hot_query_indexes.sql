@@ -0,0 +1,23 @@
+-- migrate: no-transaction
+-- Secondary indexes for the hottest predicates. Built CONCURRENTLY so live tables stay writable;
+-- Script.sql creates the same indexes on fresh databases.
+--
+-- Already covered, so not added here:
+--   TestInstances.StudentID          -> idx_testinstances_student_datetime
+--   NEETMockTestQuestions.MockTestID -> primary key (MockTestID, QuestionID)
+
+-- Question selection per chapter (practice, mock and custom tests), joined to Subtopics.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_questions_chapter_subtopic ON Questions (ChapterID, SubtopicID);
+
+-- Image lookups per question when assembling tests and question details.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_images_question ON Images (QuestionID);
+
+-- Per-student analytics and scoring; the unique key leads with TestInstanceID instead.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_studentresponses_student_instance ON StudentResponses (StudentID, TestInstanceID);
+
+-- Subject tests of a practice test, looked up by PracticeTestID (and SubjectName).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_practicetestsubjects_test_subject ON PracticeTestSubjects (PracticeTestID, SubjectName);
+
+-- Latest weightage snapshot per student and subject.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_studentchapterweightage_student_subject
+ON StudentChapterWeightage (StudentID, SubjectID, StudentChapterWeightageID DESC);
@@ -0,0 +1,123 @@
+-- Hash-partitions StudentResponses and TestHistory by StudentID and adds the cold
+-- StudentResponsesArchive (monthly range partitions, filled by Backend/testmanagement/response_archive.py)
+-- behind the AllStudentResponses view. Script.sql builds the same layout on fresh databases.
+--
+-- Each table is rebuilt: the data is copied into a new partitioned table, the old table is dropped
+-- and the constraints and indexes are recreated under their original names. The whole migration
+-- runs in one transaction and holds an exclusive lock on both tables while it copies.
+
+-- StudentResponses -------------------------------------------------------------------------------
+CREATE TABLE StudentResponses_partitioned (
+    ResponseID SERIAL NOT NULL,
+    TestInstanceID INT NOT NULL,
+    StudentID INT NOT NULL,
+    QuestionID INT NOT NULL,
+    StudentResponse TEXT,
+    AnsweringTimeInSeconds INT,
+    ResponseDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    AnswerCorrect BOOLEAN,
+    StatsRecorded BOOLEAN NOT NULL DEFAULT FALSE
+) PARTITION BY HASH (StudentID);
+
+DO $$
+BEGIN
+    FOR remainder IN 0..7 LOOP
+        EXECUTE format('CREATE TABLE StudentResponses_p%s PARTITION OF StudentResponses_partitioned
+                        FOR VALUES WITH (MODULUS 8, REMAINDER %s)', remainder, remainder);
+    END LOOP;
+END $$;
+
+LOCK TABLE StudentResponses IN EXCLUSIVE MODE;
+
+INSERT INTO StudentResponses_partitioned (ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+                                          AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded)
+SELECT ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+       AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded
+FROM StudentResponses;
+
+SELECT setval(pg_get_serial_sequence('StudentResponses_partitioned', 'responseid'),
+              COALESCE((SELECT MAX(ResponseID) FROM StudentResponses_partitioned), 0) + 1, FALSE);
+
+-- Recreated below; exists already if Script.sql was re-run on this database
+DROP VIEW IF EXISTS AllStudentResponses;
+DROP TABLE StudentResponses;
+ALTER TABLE StudentResponses_partitioned RENAME TO StudentResponses;
+ALTER SEQUENCE studentresponses_partitioned_responseid_seq RENAME TO studentresponses_responseid_seq;
+
+-- The partition key has to be part of every unique constraint
+ALTER TABLE StudentResponses
+    ADD PRIMARY KEY (ResponseID, StudentID),
+    ADD UNIQUE (TestInstanceID, StudentID, QuestionID),
+    ADD FOREIGN KEY (TestInstanceID) REFERENCES TestInstances(TestInstanceID),
+    ADD FOREIGN KEY (QuestionID) REFERENCES Questions(QuestionID);
+
+CREATE INDEX idx_studentresponses_stats_pending ON StudentResponses (QuestionID)
+WHERE NOT StatsRecorded AND AnswerCorrect IS NOT NULL;
+CREATE INDEX idx_studentresponses_student_instance ON StudentResponses (StudentID, TestInstanceID);
+CREATE INDEX idx_studentresponses_archivable ON StudentResponses (ResponseDate) WHERE StatsRecorded;
+
+-- TestHistory ------------------------------------------------------------------------------------
+CREATE TABLE TestHistory_partitioned (
+    HistoryID SERIAL NOT NULL,
+    TestInstanceID INT NOT NULL,
+    StudentID INT NOT NULL,
+    Score INT,
+    QuestionsAttempted INT,
+    CorrectAnswers INT,
+    IncorrectAnswers INT,
+    AverageAnsweringTimeInSeconds FLOAT,
+    LastTestAttempt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) PARTITION BY HASH (StudentID);
+
+DO $$
+BEGIN
+    FOR remainder IN 0..7 LOOP
+        EXECUTE format('CREATE TABLE TestHistory_p%s PARTITION OF TestHistory_partitioned
+                        FOR VALUES WITH (MODULUS 8, REMAINDER %s)', remainder, remainder);
+    END LOOP;
+END $$;
+
+LOCK TABLE TestHistory IN EXCLUSIVE MODE;
+
+INSERT INTO TestHistory_partitioned (HistoryID, TestInstanceID, StudentID, Score, QuestionsAttempted, CorrectAnswers,
+                                     IncorrectAnswers, AverageAnsweringTimeInSeconds, LastTestAttempt)
+SELECT HistoryID, TestInstanceID, StudentID, Score, QuestionsAttempted, CorrectAnswers,
+       IncorrectAnswers, AverageAnsweringTimeInSeconds, LastTestAttempt
+FROM TestHistory;
+
+SELECT setval(pg_get_serial_sequence('TestHistory_partitioned', 'historyid'),
+              COALESCE((SELECT MAX(HistoryID) FROM TestHistory_partitioned), 0) + 1, FALSE);
+
+DROP TABLE TestHistory;
+ALTER TABLE TestHistory_partitioned RENAME TO TestHistory;
+ALTER SEQUENCE testhistory_partitioned_historyid_seq RENAME TO testhistory_historyid_seq;
+
+ALTER TABLE TestHistory
+    ADD PRIMARY KEY (HistoryID, StudentID),
+    ADD UNIQUE (TestInstanceID, StudentID),
+    ADD FOREIGN KEY (TestInstanceID) REFERENCES TestInstances(TestInstanceID);
+
+-- Cold archive -----------------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS StudentResponsesArchive (
+    ResponseID INT NOT NULL,
+    TestInstanceID INT NOT NULL,
+    StudentID INT NOT NULL,
+    QuestionID INT NOT NULL,
+    StudentResponse TEXT,
+    AnsweringTimeInSeconds INT,
+    ResponseDate TIMESTAMP NOT NULL,
+    AnswerCorrect BOOLEAN,
+    StatsRecorded BOOLEAN NOT NULL DEFAULT TRUE
+) PARTITION BY RANGE (ResponseDate);
+
+CREATE INDEX IF NOT EXISTS idx_studentresponsesarchive_student_instance
+ON StudentResponsesArchive (StudentID, TestInstanceID);
+
+CREATE OR REPLACE VIEW AllStudentResponses AS
+SELECT ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+       AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded
+FROM StudentResponses
+UNION ALL
+SELECT ResponseID, TestInstanceID, StudentID, QuestionID, StudentResponse,
+       AnsweringTimeInSeconds, ResponseDate, AnswerCorrect, StatsRecorded
+FROM StudentResponsesArchive;
@@ -0,0 +1,206 @@
+-- Server-side test generation engine, used when TEST_GENERATION_CONFIG["engine"] is "database".
+-- generate_practice_test and generate_mock_test select the questions and write the whole test
+-- in one call and return the new TestInstanceID. The selection rules follow the Python engine
+-- in Backend/practice/practice_test_management.py and Backend/mock/mock_test_management.py;
+-- tools/check_generation_parity.py compares the two. Script.sql defines the same functions.
+
+-- Picks up to p_count questions from p_candidates following the difficulty mix in p_config,
+-- like select_balanced_by_difficulty() in Backend/testmanagement/item_statistics.py.
+CREATE OR REPLACE FUNCTION select_balanced_by_difficulty(p_candidates INT[], p_count INT, p_config JSONB)
+RETURNS INT[] AS $$
+    WITH banded AS (
+        SELECT C.QuestionID, random() AS R,
+               CASE
+                   WHEN COALESCE(S.CorrectCount + S.IncorrectCount, 0) < (p_config->>'min_answered_for_difficulty')::INT THEN 'medium'
+                   WHEN S.CorrectCount::FLOAT / (S.CorrectCount + S.IncorrectCount) >= (p_config->>'easy_correct_rate')::FLOAT THEN 'easy'
+                   WHEN S.CorrectCount::FLOAT / (S.CorrectCount + S.IncorrectCount) <= (p_config->>'hard_correct_rate')::FLOAT THEN 'hard'
+                   ELSE 'medium'
+               END AS Band
+        FROM (SELECT DISTINCT QuestionID FROM unnest(p_candidates) AS C(QuestionID)) C
+        LEFT JOIN QuestionStatistics S ON S.QuestionID = C.QuestionID
+    ), ranked AS (
+        SELECT QuestionID, R,
+               row_number() OVER (PARTITION BY Band ORDER BY R) <= round(COALESCE((p_config->'difficulty_mix'->>Band)::NUMERIC, 0) * p_count) AS InMix
+        FROM banded
+    )
+    -- Each band's share first, then the remaining candidates at random. The fill needs its own
+    -- random order: the leftovers of a band are the ones with the highest R.
+    SELECT ARRAY(SELECT QuestionID FROM ranked ORDER BY InMix DESC, random() LIMIT p_count);
+$$ LANGUAGE sql VOLATILE;
+
+-- Random ID in [p_low, p_high] not yet used in p_table ('TestInstances', 'PracticeTests' or
+-- 'NEETMockTests'), like the Python engine's random IDs.
+CREATE OR REPLACE FUNCTION random_free_test_id(p_table TEXT, p_low INT, p_high INT)
+RETURNS INT AS $$
+DECLARE
+    v_id INT;
+    v_taken BOOLEAN;
+BEGIN
+    FOR attempt IN 1..100 LOOP
+        v_id := p_low + floor(random() * (p_high - p_low + 1))::INT;
+        v_taken := CASE p_table
+            WHEN 'TestInstances' THEN EXISTS (SELECT 1 FROM TestInstances WHERE TestInstanceID = v_id)
+            WHEN 'PracticeTests' THEN EXISTS (SELECT 1 FROM PracticeTests WHERE PracticeTestID = v_id)
+            ELSE EXISTS (SELECT 1 FROM NEETMockTests WHERE MockTestID = v_id)
+        END;
+        IF NOT v_taken THEN
+            RETURN v_id;
+        END IF;
+    END LOOP;
+    RAISE EXCEPTION 'No free % ID found between % and %', p_table, p_low, p_high;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Questions already served to a student for a test type (question_cache), as an array.
+CREATE OR REPLACE FUNCTION cached_question_ids(p_student_id INT, p_test_type TEXT)
+RETURNS INT[] AS $$
+    SELECT COALESCE(array_agg(Q.QuestionID::INT), '{}')
+    FROM question_cache QC, jsonb_array_elements_text(QC.cached_questions) AS Q(QuestionID)
+    WHERE QC.student_id = p_student_id AND QC.test_type = p_test_type
+      AND jsonb_typeof(QC.cached_questions) = 'array';
+$$ LANGUAGE sql STABLE;
+
+-- p_config: {"subjects": [{"subject_id", "name", "questions"}], "difficulty_balanced",
+--            "selection_oversample", "difficulty_mix", "easy_correct_rate", "hard_correct_rate",
+--            "min_answered_for_difficulty"}
+CREATE OR REPLACE FUNCTION generate_practice_test(p_student_id INT, p_config JSONB)
+RETURNS INT AS $$
+DECLARE
+    v_practice_test_id INT := random_free_test_id('PracticeTests', 1000, 99999);
+    v_test_instance_id INT := random_free_test_id('TestInstances', 1000, 99999);
+    v_used INT[] := cached_question_ids(p_student_id, 'practice');
+    v_all_selected INT[] := '{}';
+    v_subject JSONB;
+    v_count INT;
+    v_subject_test_id INT;
+    v_selected INT[];
+BEGIN
+    INSERT INTO PracticeTests (PracticeTestID, StudentID) VALUES (v_practice_test_id, p_student_id);
+    INSERT INTO PracticeTestCompletion (PracticeTestID, StudentID, IsCompleted) VALUES (v_practice_test_id, p_student_id, FALSE);
+
+    FOR v_subject IN SELECT value FROM jsonb_array_elements(p_config->'subjects') LOOP
+        v_count := (v_subject->>'questions')::INT;
+        IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+            v_count := v_count * (p_config->>'selection_oversample')::INT;
+        END IF;
+
+        -- Unused questions of active chapters whose subtopic is active (or that have none), at random
+        v_selected := ARRAY(
+            SELECT q.QuestionID
+            FROM Questions q
+            INNER JOIN Chapters c ON q.ChapterID = c.ChapterID
+            LEFT JOIN Subtopics s ON q.SubtopicID = s.SubtopicID
+            WHERE c.SubjectID = (v_subject->>'subject_id')::INT AND c.IsActive = TRUE
+              AND (s.IsActive IS TRUE OR q.SubtopicID IS NULL)
+              AND q.QuestionID NOT IN (SELECT unnest(v_used))
+            ORDER BY random()
+            LIMIT v_count
+        );
+        IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+            v_selected := select_balanced_by_difficulty(v_selected, (v_subject->>'questions')::INT, p_config);
+        END IF;
+
+        INSERT INTO PracticeTestSubjects (PracticeTestID, SubjectName)
+        VALUES (v_practice_test_id, v_subject->>'name')
+        RETURNING PracticeTestSubjectID INTO v_subject_test_id;
+
+        INSERT INTO PracticeTestQuestions (PracticeTestSubjectID, QuestionID)
+        SELECT v_subject_test_id, QuestionID FROM unnest(v_selected) AS S(QuestionID);
+
+        v_all_selected := v_all_selected || v_selected;
+    END LOOP;
+
+    INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
+    VALUES (v_test_instance_id, p_student_id, v_practice_test_id, 'Practice');
+
+    INSERT INTO question_cache (student_id, test_type, cached_questions)
+    VALUES (p_student_id, 'practice', to_jsonb(v_used || ARRAY(SELECT Q FROM unnest(v_all_selected) AS Q WHERE Q <> ALL(v_used))))
+    ON CONFLICT (student_id, test_type) DO UPDATE
+    SET cached_questions = EXCLUDED.cached_questions, last_updated = CURRENT_TIMESTAMP;
+
+    RETURN v_test_instance_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- p_config: {"subject_ids": [...], "sections": [{"section", "questions"}], plus the difficulty
+--            settings of generate_practice_test}
+CREATE OR REPLACE FUNCTION generate_mock_test(p_student_id INT, p_config JSONB)
+RETURNS INT AS $$
+DECLARE
+    v_mock_test_id INT := random_free_test_id('NEETMockTests', 1000, 9999);
+    v_test_instance_id INT := random_free_test_id('TestInstances', 1000, 9999);
+    v_used INT[] := cached_question_ids(p_student_id, 'mock');
+    v_in_test INT[] := '{}';
+    v_subject_id INT;
+    v_section JSONB;
+    v_required INT;
+    v_count INT;
+    v_available INT;
+    v_selected INT[];
+BEGIN
+    INSERT INTO NEETMockTests (MockTestID, StudentID) VALUES (v_mock_test_id, p_student_id);
+
+    FOR v_subject_id IN SELECT value::INT FROM jsonb_array_elements_text(p_config->'subject_ids') LOOP
+        FOR v_section IN SELECT value FROM jsonb_array_elements(p_config->'sections') LOOP
+            v_required := (v_section->>'questions')::INT;
+            v_count := v_required;
+            IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+                v_count := v_required * (p_config->>'selection_oversample')::INT;
+            END IF;
+
+            -- Each chapter's share of the section by MockTestChapterWeightage (percent), the rest at
+            -- random, from the questions not served yet. The fill is ordered by a second random(): the
+            -- planner would otherwise reuse the quota's sort key, and the leftovers of each chapter's
+            -- quota sort last.
+            SELECT COALESCE(array_agg(QuestionID), '{}'), COALESCE(max(Available), 0) INTO v_selected, v_available
+            FROM (
+                SELECT QuestionID, Available FROM (
+                    SELECT q.QuestionID, count(*) OVER () AS Available,
+                           row_number() OVER (PARTITION BY q.ChapterID ORDER BY random())
+                               <= floor(COALESCE(W.Weightage, 0) * v_count / 100) AS InQuota
+                    FROM Questions q
+                    JOIN Chapters c ON q.ChapterID = c.ChapterID
+                    LEFT JOIN MockTestChapterWeightage W ON W.ChapterID = q.ChapterID AND W.SubjectID = v_subject_id
+                    WHERE c.SubjectID = v_subject_id AND q.QuestionID NOT IN (SELECT unnest(v_used)) AND q.QuestionID NOT IN (SELECT unnest(v_in_test))
+                ) candidates
+                ORDER BY InQuota DESC, random()
+                LIMIT v_count
+            ) picked;
+
+            IF v_available >= v_required THEN
+                IF (p_config->>'difficulty_balanced')::BOOLEAN THEN
+                    v_selected := select_balanced_by_difficulty(v_selected, v_required, p_config);
+                END IF;
+            ELSE
+                -- Not enough unused questions: reuse served ones, highest-weighted chapters first
+                v_selected := ARRAY(
+                    SELECT q.QuestionID
+                    FROM Questions q
+                    JOIN Chapters c ON q.ChapterID = c.ChapterID
+                    LEFT JOIN MockTestChapterWeightage W ON W.ChapterID = q.ChapterID AND W.SubjectID = v_subject_id
+                    WHERE c.SubjectID = v_subject_id AND q.QuestionID NOT IN (SELECT unnest(v_in_test))
+                    ORDER BY q.QuestionID = ANY(v_used), W.Weightage DESC NULLS LAST, random()
+                    LIMIT v_required
+                );
+            END IF;
+
+            INSERT INTO NEETMockTestQuestions (MockTestID, QuestionID, Section)
+            SELECT v_mock_test_id, QuestionID, v_section->>'section' FROM unnest(v_selected) AS S(QuestionID);
+
+            v_in_test := v_in_test || v_selected;
+            v_used := v_used || ARRAY(SELECT Q FROM unnest(v_selected) AS Q WHERE Q <> ALL(v_used));
+        END LOOP;
+    END LOOP;
+
+    INSERT INTO MockTestCompletion (MockTestID, StudentID, IsCompleted) VALUES (v_mock_test_id, p_student_id, FALSE);
+    INSERT INTO TestInstances (TestInstanceID, StudentID, TestID, TestType)
+    VALUES (v_test_instance_id, p_student_id, v_mock_test_id, 'Mock');
+
+    INSERT INTO question_cache (student_id, test_type, cached_questions)
+    VALUES (p_student_id, 'mock', to_jsonb(v_used))
+    ON CONFLICT (student_id, test_type) DO UPDATE
+    SET cached_questions = EXCLUDED.cached_questions, last_updated = CURRENT_TIMESTAMP;
+
+    RETURN v_test_instance_id;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,21 @@
+-- Version counter for the question bank (Questions and Images), next to the catalog version.
+-- Workers compare it with the version of their memory-mapped question bank snapshot
+-- (Backend/testmanagement/question_bank.py) and rebuild the snapshot when content changes.
+-- Script.sql creates the same column and triggers on fresh databases.
+
+ALTER TABLE CatalogVersion ADD COLUMN IF NOT EXISTS QuestionBankVersion BIGINT NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_question_bank_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE CatalogVersion SET QuestionBankVersion = QuestionBankVersion + 1, UpdatedAt = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS questions_question_bank_version ON Questions;
+CREATE TRIGGER questions_question_bank_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Questions
+FOR EACH STATEMENT EXECUTE FUNCTION bump_question_bank_version();
+
+DROP TRIGGER IF EXISTS images_question_bank_version ON Images;
+CREATE TRIGGER images_question_bank_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Images
+FOR EACH STATEMENT EXECUTE FUNCTION bump_question_bank_version();
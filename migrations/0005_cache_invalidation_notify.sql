@@ -0,0 +1,31 @@
+-- Content changes notify every API worker on the cache_invalidation channel
+-- (Backend/dbconfig/invalidation.py), so in-process caches are dropped when the change commits
+-- instead of after their TTL. Payloads are invalidation kinds: 'catalog', 'question_bank', 'chapter_weightage'.
+-- Script.sql creates the same functions and triggers on fresh databases.
+
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE CatalogVersion SET Version = Version + 1, UpdatedAt = CURRENT_TIMESTAMP;
+    PERFORM pg_notify('cache_invalidation', 'catalog');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bump_question_bank_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE CatalogVersion SET QuestionBankVersion = QuestionBankVersion + 1, UpdatedAt = CURRENT_TIMESTAMP;
+    PERFORM pg_notify('cache_invalidation', 'question_bank');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_chapter_weightage() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidation', 'chapter_weightage');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS mocktestchapterweightage_notify ON MockTestChapterWeightage;
+CREATE TRIGGER mocktestchapterweightage_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON MockTestChapterWeightage
+FOR EACH STATEMENT EXECUTE FUNCTION notify_chapter_weightage();
@@ -0,0 +1,9 @@
+-- Entries of the "postgres" shared cache backend (SHARED_CACHE_CONFIG, Backend/dbconfig/shared_cache.py).
+-- UNLOGGED: cache writes skip the WAL and are not replicated; the table is emptied after a crash.
+-- Script.sql creates the same table on fresh databases.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS SharedCache (
+    Key TEXT PRIMARY KEY,                       -- namespace:part:...
+    Value TEXT NOT NULL,                        -- JSON
+    ExpiresAt TIMESTAMPTZ NOT NULL
+);
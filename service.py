@@ -1,56 +1,90 @@
 from fastapi import FastAPI, HTTPException, Query, Header, Body, Response
-from typing import List, Dict, Union, Any
+from typing import List, Dict, Union, Any, Optional
+from datetime import datetime
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import json
 import os
-from Backend.dbconfig.db_connection import create_pg_connection, release_pg_connection, pg_connection_pool
+from contextlib import asynccontextmanager
+from Backend.dbconfig.db_connection import pg_connection_pool
+from Backend.dbconfig.invalidation import invalidation_listener
+from Backend.executors import run_in_pool, executor_stats, PoolSaturatedError, shutdown_executors
+from Backend.singleflight import run_coalesced
 from Backend.dbconfig.cache_management import clear_student_cache, delete_all_test_data  
 from Backend.practice.practice_test_management import generate_practice_test, get_practice_test_details, get_practice_test_question_ids,get_practice_test_questions, submit_practice_test_answers
 from Backend.testmanagement.question_management import get_unique_student_ids, get_question_details, get_answer, list_tests_for_student,get_chapter_names, get_test_completion
 from Backend.testmanagement.test_result_calculation import calculate_test_results, calculate_section_practice_test_results
 from Backend.testmanagement.student_proficiency import set_student_target_score, get_student_test_history, student_test_history_in_excel, get_chapter_proficiency, get_subtopic_proficiency, calculate_chapterwise_report
+from Backend.testmanagement.leaderboard import get_student_rank, get_leaderboard_top
+from Backend.testmanagement.catalog_cache import get_catalog_version, load_catalog
+from Backend.testmanagement.question_bank import load_question_bank
+from Backend.dbconfig.config import CATALOG_CONFIG, DB_POOL_CONFIG, INVALIDATION_CONFIG
 from Backend.practice.practice_answer_retrieval import get_practice_test_answers_only
 from Backend.mock.mock_test_management import generate_mock_test, get_questions_id_for_mock_test, submit_mock_test_answers, get_mock_test_questions
 from Backend.mock.mock_answer_retrieval import get_mock_test_answers_only, report_app_issue
 from Backend.customtest.custom_test_management import generate_custom_test
-from Backend.chatsystem.chatbot import prepare_and_chat_with_neet_instructor
+from Backend.chatsystem.chatbot import prepare_and_chat_with_neet_instructor, prepare_and_stream_neet_instructor, upstream_limiter, chat_requests_total, ChatBusyError
 from Backend.testmanagement.question_management import add_question_issue
 from fastapi.middleware.cors import CORSMiddleware
-from Backend.logging import LogLatencyMiddleware
+from Backend.metrics import MetricsMiddleware, render_metrics
+from Backend.dbconfig.sql_instrumentation import SQLInstrumentationMiddleware
+from Backend.admission import AdmissionControlMiddleware
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
 from fastapi.responses import FileResponse
 import traceback
-from opencensus.ext.azure.trace_exporter import AzureExporter
-from opencensus.trace.tracer import Tracer
-from opencensus.trace.samplers import ProbabilitySampler
-from opencensus.ext.azure.log_exporter import AzureLogHandler
-import logging
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from azure.monitor.opentelemetry import configure_azure_monitor
+import hashlib
+from Backend.telemetry import configure_telemetry, instrument_app, shutdown_telemetry
 from opentelemetry import trace
 from opentelemetry.trace import (
     get_tracer_provider,
 )
-
-from opentelemetry.propagate import extract
-from logging import getLogger, INFO
-
-os.environ["APPLICATIONINSIGHTS_CONNECTION_STRING"] = r"InstrumentationKey=66db3b47-d39b-47e4-8430-e5e04da1435c;IngestionEndpoint=https://centralindia-0.in.applicationinsights.azure.com/;LiveEndpoint=https://centralindia.livediagnostics.monitor.azure.com/"
-
-if os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING"):
-    configure_azure_monitor(
-        connection_string=os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
-    )
+from logging import getLogger
 
 tracer = trace.get_tracer(__name__,
                           tracer_provider=get_tracer_provider())
 
 logger = getLogger(__name__)
 
-app = FastAPI()
-app.add_middleware(LogLatencyMiddleware)
-FastAPIInstrumentor.instrument_app(app)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker process, after gunicorn has forked it, so every worker opens its own connections
+    # and its own telemetry exporter
+    configure_telemetry()
+    try:
+        pg_connection_pool.open()
+        warmed = pg_connection_pool.warm_up(DB_POOL_CONFIG["warmup_connections"])
+    except Exception as e:
+        # Keep the worker up; connections will be opened on demand once the database is reachable
+        print(f"Database warm-up failed: {e}")
+        warmed = 0
+    # Listen before loading, so changes made while the caches fill are not missed
+    invalidation_listener.start()
+    if INVALIDATION_CONFIG["enabled"] and not invalidation_listener.wait_until_listening(INVALIDATION_CONFIG["startup_wait_seconds"]):
+        print("Loading caches before the invalidation listener is up; they are dropped once it connects")
+    _, error = load_catalog()
+    if error:
+        print(f"Could not preload the content catalog: {error}")
+    # Workers on one host share the snapshot file; a missing or outdated one is rebuilt in the background
+    _, error = load_question_bank()
+    if error:
+        print(f"Serving questions from the database until the question bank snapshot is built: {error}")
+    print(f"Worker {os.getpid()} ready with {warmed} warm database connections")
+    yield
+    invalidation_listener.stop()
+    shutdown_executors()
+    pg_connection_pool.close()
+    shutdown_telemetry()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Added before instrumentation so it runs inside the request span
+app.add_middleware(SQLInstrumentationMiddleware)
+instrument_app(app)
 
 origins = [
     "https://neuflo-learn.netlify.app",
@@ -74,6 +108,34 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     # Return the original error response
     return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
+@app.exception_handler(ChatBusyError)
+async def chat_busy_handler(request: Request, exc: ChatBusyError):
+    # Every upstream chat slot is taken and the wait queue is full
+    chat_requests_total.inc("stream" if wants_event_stream(request) else "json", "rejected")
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "2"})
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    # A workload pool's queue is full; ask the client to back off instead of queueing without bound
+    logger.warning(str(exc))
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+def cached_json_response(request: Request, content, cache_control: str, etag: str = None):
+    """
+    Builds a JSON response with Cache-Control and ETag headers, answering 304 Not Modified
+    when the client already holds the same representation.
+    If no ETag is given, one is derived from the response body.
+    """
+    response = JSONResponse(content=content)
+    if etag is None:
+        etag = 'W/"' + hashlib.sha1(response.body).hexdigest()[:20] + '"'
+    headers = {"Cache-Control": cache_control, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
 
 @app.get("/")
 def read_root():
@@ -85,27 +147,34 @@ async def favicon():
 
 @app.get("/unique-student-ids/") 
 async def api_get_unique_student_ids():
-    student_ids, error = get_unique_student_ids()
+    student_ids, error = await run_in_pool("db_read", get_unique_student_ids)
     if error:
         raise HTTPException(status_code=500, detail=error)
     return {"student_ids": student_ids}
 
 @app.get("/list-tests")
-def api_list_tests_for_student(student_id: int = Query(...)):
+async def api_list_tests_for_student(student_id: int = Query(...), limit: Optional[int] = Query(None, ge=1),
+                               cursor: Optional[str] = Query(None), date_from: Optional[datetime] = Query(None, alias="from"),
+                               date_to: Optional[datetime] = Query(None, alias="to"), test_type: Optional[str] = Query(None)):
     """
-    Endpoint to list all tests for a specific student.
+    Endpoint to list the tests of a specific student, newest first, one page at a time.
 
-    - Path Parameter:
+    - Query Parameters:
       - student_id: The unique identifier of the student.
+      - limit: Optional page size.
+      - cursor: Optional next_cursor value returned with the previous page.
+      - from / to: Optional time window on the test generation time.
+      - test_type: Optional 'Practice' or 'Mock' filter.
 
     - Returns:
-      On success: A JSON object containing a list of tests with their completion status.
+      On success: A JSON object containing a page of tests with their completion status and the next_cursor
+                  (null on the last page).
       On failure: An error message.
     """
-    tests, error = list_tests_for_student(student_id)
+    page, error = await run_in_pool("db_read", list_tests_for_student, student_id, limit, cursor, date_from, date_to, test_type)
     if error:
         return {"error": error}
-    return {"tests": tests}
+    return page
 
 class StudentIdModel(BaseModel):
     student_id: int
@@ -129,7 +198,7 @@ async def api_generate_practice_test(student_data: StudentIdModel):
                   and the structure of the subject-wise tests.
       On failure: An HTTPException with status code 500 indicating an internal server error.
     """
-    result, error = generate_practice_test(student_data.student_id)
+    result, error = await run_in_pool("db_write", generate_practice_test, student_data.student_id)
     if error:
         raise HTTPException(status_code=500, detail=error)
     
@@ -142,7 +211,7 @@ async def api_generate_practice_test(student_data: StudentIdModel):
 
 @app.get("/practice-test/questions")
 async def api_get_practice_test_question_ids(testInstanceID: int = Query(...), student_id: int = Query(...)):
-    subject_questions, error = get_practice_test_question_ids(testInstanceID, student_id)
+    subject_questions, error = await run_in_pool("db_read", get_practice_test_question_ids, testInstanceID, student_id)
     if error:
         raise HTTPException(status_code=500, detail=error)
     return subject_questions
@@ -158,7 +227,7 @@ async def get_practice_test_questions_endpoint(request: PracticeTestRequest):
     student_id = request.student_id
 
     # Call the function with the provided input
-    questions, error = get_practice_test_questions(test_instance_id, student_id)
+    questions, error = await run_in_pool("db_read", get_practice_test_questions, test_instance_id, student_id)
 
     if error:
         raise HTTPException(status_code=500, detail=error)
@@ -168,7 +237,7 @@ async def get_practice_test_questions_endpoint(request: PracticeTestRequest):
 
 @app.get("/get-practice-test-answers")
 async def api_get_practice_test_answers_only(testInstanceID: int = Query(...), student_id: int = Query(...), subject_id: int = Query(...)):
-    answers, error = get_practice_test_answers_only(testInstanceID, student_id, subject_id)
+    answers, error = await run_in_pool("db_read", get_practice_test_answers_only, testInstanceID, student_id, subject_id)
     if error:
         raise HTTPException(status_code=500, detail=error)
     return answers
@@ -180,8 +249,10 @@ class PracticeTestAnswers(BaseModel):
     answers: dict
     
 @app.post("/submit-practice-test-answers/")
-def api_submit_practice_test_answers(answers_data: PracticeTestAnswers):
-    result = submit_practice_test_answers(
+async def api_submit_practice_test_answers(answers_data: PracticeTestAnswers):
+    result = await run_in_pool(
+        "db_write",
+        submit_practice_test_answers,
         answers_data.student_id, 
         answers_data.testInstanceID, 
         answers_data.subject_test_id, 
@@ -198,7 +269,8 @@ class SectionTestResultsInput(BaseModel):
 
 @app.post("/calculate-practice-test-results-subjectwise/")
 async def calculate_section_test_results(input_data: SectionTestResultsInput):
-    result, error = calculate_section_practice_test_results(
+    result, error = await run_in_pool(
+        "db_write", calculate_section_practice_test_results,
         input_data.student_id, input_data.test_instance_id, input_data.subject_code
     )
     if error:
@@ -216,23 +288,15 @@ async def get_test_results(request_data: TestResultsRequest):
     student_id = request_data.student_id
     test_instance_id = request_data.test_instance_id
 
-    conn = create_pg_connection(pg_connection_pool)
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    
-    try:
-        result = calculate_test_results(student_id, test_instance_id)
-        if isinstance(result, tuple) and len(result) == 2:
-            results, error = result
-            if error:
-                raise HTTPException(status_code=404, detail=error)
-            return results
-        else:
-            # Handle unexpected return value
-            raise HTTPException(status_code=500, detail="Unexpected error occurred")
-    finally:
-        # Release the connection back to the pool
-        release_pg_connection(pg_connection_pool, conn)
+    result = await run_in_pool("db_write", calculate_test_results, student_id, test_instance_id)
+    if isinstance(result, tuple) and len(result) == 2:
+        results, error = result
+        if error:
+            raise HTTPException(status_code=404, detail=error)
+        return results
+    else:
+        # Handle unexpected return value
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
 
 class PracticeTestDetailsRequest(BaseModel):
     instance_id: int
@@ -242,10 +306,12 @@ class PracticeTestDetailsRequest(BaseModel):
 async def api_get_practice_test_details(request: PracticeTestDetailsRequest) -> Dict:
     try:
         # Call the previously defined function with the values from the request
-        details = get_practice_test_details(request.instance_id, request.student_id)
+        details = await run_in_pool("db_read", get_practice_test_details, request.instance_id, request.student_id)
         
         # Return the details as JSON
         return {"details": details}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         # If something goes wrong, return an HTTP error response
         raise HTTPException(status_code=500, detail=str(e))
@@ -258,8 +324,10 @@ async def generate_mock_test_endpoint(student_data: StudentIdModel):
     Endpoint to generate a mock test for a given student.
     """
     try:
-        result = generate_mock_test(student_data.student_id)
+        result = await run_in_pool("db_write", generate_mock_test, student_data.student_id)
         return result
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -270,8 +338,10 @@ class QuestionModel(BaseModel):
 @app.get("/get-mock-questions")
 async def get_mock_questions_endpoint(testInstanceID: int = Query(...), student_id: int = Query(...)):
     try:
-        questions = get_questions_id_for_mock_test(testInstanceID, student_id)
+        questions = await run_in_pool("db_read", get_questions_id_for_mock_test, testInstanceID, student_id)
         return {"questions": questions}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -282,7 +352,8 @@ class MockTestRequest(BaseModel):
 @app.post("/get-mock-test-questions", response_model=Any)
 async def get_mock_test_questions_endpoint(request: MockTestRequest):
     # Call the function with the provided input
-    questions, error = get_mock_test_questions(request.test_instance_id, request.student_id)
+    # Identical concurrent fetches (a class starting together, client retries) share one database read
+    questions, error = await run_coalesced("db_read", get_mock_test_questions, request.test_instance_id, request.student_id)
 
     if error:
         raise HTTPException(status_code=500, detail=error)
@@ -290,7 +361,7 @@ async def get_mock_test_questions_endpoint(request: MockTestRequest):
     return questions
 
 @app.get("/get-mock-test-answers")
-def api_get_mock_test_answers(testInstanceID: int = Query(...), student_id: int = Query(...)):
+async def api_get_mock_test_answers(testInstanceID: int = Query(...), student_id: int = Query(...)):
     """
     Endpoint to retrieve answers for a mock test.
 
@@ -302,7 +373,7 @@ def api_get_mock_test_answers(testInstanceID: int = Query(...), student_id: int
       On success: A JSON object containing a list of answers.
       On failure: An error message.
     """
-    answers, error = get_mock_test_answers_only(testInstanceID, student_id)
+    answers, error = await run_in_pool("db_read", get_mock_test_answers_only, testInstanceID, student_id)
     if error:
         return {"error": error}
     return {"answers": answers['answers']}
@@ -313,7 +384,7 @@ class MockTestAnswers(BaseModel):
     data: dict
 
 @app.post("/submit-mock-test-answers")
-def api_submit_mock_test_answers(answers_data: MockTestAnswers):
+async def api_submit_mock_test_answers(answers_data: MockTestAnswers):
     """
     Endpoint to submit answers for a mock test.
 
@@ -330,7 +401,9 @@ def api_submit_mock_test_answers(answers_data: MockTestAnswers):
       On success: A JSON object indicating successful submission.
       On failure: An error message.
     """
-    result, error = submit_mock_test_answers(
+    result, error = await run_in_pool(
+        "db_write",
+        submit_mock_test_answers,
         answers_data.student_id, 
         answers_data.testInstanceID, 
         answers_data.data
@@ -345,27 +418,71 @@ class CustomTestRequest(BaseModel):
 
 @app.post("/generate-custom-test/")
 async def generate_custom_test_endpoint(request: CustomTestRequest):
-    response, error = generate_custom_test(request.chapter_ids, request.total_questions)
+    response, error = await run_in_pool("db_read", generate_custom_test, request.chapter_ids, request.total_questions)
     if error:
         raise HTTPException(status_code=500, detail=error)
     return response
 
 ######################################################################################################
 
+def wants_event_stream(request: Request):
+    return "text/event-stream" in request.headers.get("accept", "")
+
+def sse_event(data, event=None):
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
+async def chat_events(new_question, past_history):
+    """
+    Server-Sent Events for a streamed chat answer: one "data: {"delta": ...}" event per fragment, then
+    an "event: done" with the full response, or an "event: error". When the client disconnects,
+    Starlette cancels this generator and the upstream call is closed with it.
+    """
+    answer = []
+    try:
+        async for delta in prepare_and_stream_neet_instructor(new_question, past_history):
+            answer.append(delta)
+            yield sse_event({"delta": delta})
+        chat_requests_total.inc("stream", "completed")
+        yield sse_event({"response": "".join(answer)}, event="done")
+    except asyncio.CancelledError:
+        chat_requests_total.inc("stream", "cancelled")
+        raise
+    except ChatBusyError as e:
+        chat_requests_total.inc("stream", "rejected")
+        yield sse_event({"detail": str(e)}, event="error")
+    except Exception as e:
+        chat_requests_total.inc("stream", "error")
+        logger.error(f"Chat stream failed: {e}")
+        yield sse_event({"detail": str(e)}, event="error")
+
 @app.post("/chat/")
-async def chat_endpoint(new_question: str = Body(..., embed=True), past_history: list = Body(default=[], embed=True)):
+async def chat_endpoint(request: Request, new_question: str = Body(..., embed=True), past_history: list = Body(default=[], embed=True)):
     """
     FastAPI endpoint to interact with a NEET instructor via OpenAI's ChatGPT model.
     Expects a JSON body with a new question and optional past history.
+    Clients sending "Accept: text/event-stream" get the answer streamed as Server-Sent Events
+    (see chat_events); others get {"response": ...} once the answer is complete.
     """
+    upstream_limiter.check_capacity()
+    if wants_event_stream(request):
+        return StreamingResponse(
+            chat_events(new_question, past_history),
+            media_type="text/event-stream",
+            # Keep proxies from buffering the stream
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     try:
-        response = prepare_and_chat_with_neet_instructor(new_question, past_history)
+        response = await prepare_and_chat_with_neet_instructor(new_question, past_history)
+        chat_requests_total.inc("json", "completed")
         return {"response": response}
+    except ChatBusyError:
+        raise
     except Exception as e:
+        chat_requests_total.inc("json", "error")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/check-test-completion")
-def api_get_test_completion(instanceId: int = Query(...), studentId: int = Query(...)):
+async def api_get_test_completion(instanceId: int = Query(...), studentId: int = Query(...)):
     """
     Endpoint to check if a given test instance is completed or not.
 
@@ -376,26 +493,47 @@ def api_get_test_completion(instanceId: int = Query(...), studentId: int = Query
       On success: A JSON object containing the test ID, test type, and completion status.
       On failure: An error message.
     """
-    completion_status, error = get_test_completion(instanceId, studentId)
+    completion_status, error = await run_in_pool("db_read", get_test_completion, instanceId, studentId)
     if error:
         return {"error": error}
     return {"completion_status": completion_status}
 
 
 @app.get("/student-test-history")
-def api_get_student_test_history(student_id: int = Query(...)):
-    # This endpoint retrieves the test history of a specific student.
-    # It returns a history of all the tests (practice, mock, etc.) taken by the student identified by 'student_id'.
-    # If there's an error (e.g., student not found or database error), it raises an HTTP exception with a status code of 500.
-    history, error = get_student_test_history(student_id)
+async def api_get_student_test_history(student_id: int = Query(...), limit: Optional[int] = Query(None, ge=1),
+                                 cursor: Optional[str] = Query(None), date_from: Optional[datetime] = Query(None, alias="from"),
+                                 date_to: Optional[datetime] = Query(None, alias="to"), test_type: Optional[str] = Query(None)):
+    # This endpoint retrieves the test history of a specific student, newest test first, one page at a time.
+    # Pass the returned 'next_cursor' as 'cursor' to fetch the next page; it is null on the last page.
+    # 'from', 'to' and 'test_type' narrow the history; subject averages and the chapterwise report are only
+    # included on the first page.
+    # Invalid filters or cursors return 400; other errors (e.g. database error) return 500.
+    history, error = await run_in_pool("db_read", get_student_test_history, student_id, limit, cursor, date_from, date_to, test_type)
     if error:
-        raise HTTPException(status_code=500, detail=error)
+        raise HTTPException(status_code=400 if error.startswith("Invalid") else 500, detail=error)
     return history
 
+@app.get("/leaderboard/rank")
+async def api_get_student_rank(student_id: int = Query(...)):
+    # This endpoint returns the student's rank and percentile among all students, based on their average mock test score.
+    # Ranks come from the precomputed leaderboard, so no per-request sorting of test history is done.
+    rank, error = await run_in_pool("db_read", get_student_rank, student_id)
+    if error:
+        raise HTTPException(status_code=404 if error.startswith("No mock test score") else 500, detail=error)
+    return rank
+
+@app.get("/leaderboard/top")
+async def api_get_leaderboard_top(n: int = Query(10, ge=1)):
+    # This endpoint returns the top 'n' students by average mock test score, best first.
+    top, error = await run_in_pool("db_read", get_leaderboard_top, n)
+    if error:
+        raise HTTPException(status_code=500, detail=error)
+    return {"leaderboard": top}
+
 @app.get("/get-student-test-history-excel")
 async def get_student_test_history_excel(student_id: int = Query(...)):
-    # Assuming get_student_test_history_excel is defined as shown above
-    excel_file = student_test_history_in_excel(student_id)
+    # Building the workbook is CPU-bound, so it runs on the dedicated export pool
+    excel_file = await run_in_pool("export", student_test_history_in_excel, student_id)
     if excel_file is None:
         return Response(content="Error generating Excel file", status_code=500)
     
@@ -405,33 +543,33 @@ async def get_student_test_history_excel(student_id: int = Query(...)):
     return StreamingResponse(excel_file, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
 
 @app.get("/chapter-proficiency")
-def api_get_chapter_proficiency(student_id: int = Query(...)):
+async def api_get_chapter_proficiency(request: Request, student_id: int = Query(...)):
     # This endpoint fetches the chapter-wise proficiency for a given student.
-    # It calculates and returns the student's proficiency in each chapter, 
-    # which could include metrics like correct and incorrect answers, percentage score, etc., for that chapter.
+    # It returns every chapter in the catalog with the student's correct and incorrect answer counts,
+    # reporting zero for chapters the student has not attempted yet.
+    # The response is revalidated on every use (no-cache) but answers 304 when nothing has changed.
     # In case of an error, it raises an HTTP exception with a status code of 500.
-    proficiency, error = get_chapter_proficiency(student_id)
+    proficiency, error = await run_in_pool("db_read", get_chapter_proficiency, student_id)
     if error:
         raise HTTPException(status_code=500, detail=error)
-    return proficiency
+    return cached_json_response(request, proficiency, "private, no-cache")
 
 @app.get("/subtopic-proficiency")
-def api_get_subtopic_proficiency(student_id: int = Query(...)):
+async def api_get_subtopic_proficiency(request: Request, student_id: int = Query(...)):
     # This endpoint is responsible for providing the subtopic-wise proficiency of a student.
-    # It details the student's performance in various subtopics under different chapters,
-    # potentially including metrics like accuracy, number of attempts, etc., per subtopic.
+    # It returns every subtopic in the catalog with the student's correct and incorrect answer counts.
     # If an error occurs, it triggers an HTTP exception with a status code of 500.
-    proficiency, error = get_subtopic_proficiency(student_id)
+    proficiency, error = await run_in_pool("db_read", get_subtopic_proficiency, student_id)
     if error:
         raise HTTPException(status_code=500, detail=error)
-    return proficiency
+    return cached_json_response(request, proficiency, "private, no-cache")
 
 
 @app.get("/get-question")
 async def api_get_question_details(question_id: int = Query(...)):
     # This endpoint retrieves the details of a specific question based on the provided question_id.
     # It returns a dictionary containing various elements of the question, like the question text, options, and related information.
-    question_details, error = get_question_details(question_id)
+    question_details, error = await run_coalesced("db_read", get_question_details, question_id)
     if error:
         # Raises an HTTPException if there's an error in fetching the question details.
         raise HTTPException(status_code=500, detail=error)
@@ -446,17 +584,17 @@ async def report_issue(issue: IssueReport):
     """
     Endpoint to report an app issue.
     """
-    result = report_app_issue(issue.user_id, issue.issue_description)
+    result = await run_in_pool("db_write", report_app_issue, issue.user_id, issue.issue_description)
     if "successfully" in result:
         return {"message": result}
     else:
         raise HTTPException(status_code=500, detail=result)
 
 @app.get("/get-answer")
-def api_get_answer(question_id: int = Query(...)):
+async def api_get_answer(question_id: int = Query(...)):
     # This endpoint provides the correct answer for a given question identified by question_id.
     # It returns the answer, which could be in various formats depending on how the answer is stored (e.g., option A, B, C, D).
-    result, error = get_answer(question_id)
+    result, error = await run_coalesced("db_read", get_answer, question_id)
     if error:
         # If there is an error in retrieving the answer, an HTTPException is raised.
         raise HTTPException(status_code=500, detail=error)
@@ -467,8 +605,8 @@ class QuestionIssue(BaseModel):
     issue_comment: str
 
 @app.post("/report-question-issue")
-def report_question_issue(issue: QuestionIssue):
-    result = add_question_issue(issue.question_id, issue.issue_comment)
+async def report_question_issue(issue: QuestionIssue):
+    result = await run_in_pool("db_write", add_question_issue, issue.question_id, issue.issue_comment)
     if "successfully" in result:
         return {"message": result}
     else:
@@ -483,28 +621,34 @@ async def set_target_score(request: TargetScoreRequest):
     """
     Sets or updates the target score for a given student.
     """
-    success = set_student_target_score(request.student_id, request.target_score)
+    success = await run_in_pool("db_write", set_student_target_score, request.student_id, request.target_score)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to set/update the student's target score")
     return {"message": "Student's target score updated successfully"}
 
 @app.get("/get-chapter-names/")
-async def api_get_chapter_names(subjectID: int = Query(...)):
+async def api_get_chapter_names(request: Request, subjectID: int = Query(...)):
     """
     Endpoint to retrieve chapter names based on the subject ID.
+    Chapter names only change on content upload, so responses are publicly cacheable and
+    tagged with the catalog version.
     """
-    chapter_names, error = get_chapter_names(subjectID)
+    chapter_names, error = await run_coalesced("db_read", get_chapter_names, subjectID)
     if error:
         raise HTTPException(status_code=500, detail=error)
-    return {"chapter_names": chapter_names}
+    etag = f'W/"catalog-{get_catalog_version()}-{subjectID}"'
+    return cached_json_response(request, {"chapter_names": chapter_names},
+                                f"public, max-age={CATALOG_CONFIG['chapter_names_max_age']}", etag)
     
 @app.post("/clear-cache")
 async def clear_cache(student_id: int = Query(...)):
     # This endpoint clears the cache for a specific student identified by student_id.
     # It is useful for ensuring that the student's latest data is fetched from the database rather than using outdated cached data.
     try:
-        clear_student_cache(student_id)
+        await run_in_pool("db_write", clear_student_cache, student_id)
         return {"message": f"Cache cleared for student {student_id}"}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         # If any exception occurs during cache clearing, an HTTPException is raised.
         raise HTTPException(status_code=500, detail=str(e))
@@ -514,10 +658,12 @@ async def reset_database():
     # This endpoint resets the database for the entire application and clears the cache for a specific student.
     try:
         # First, clear the cache for the specific student
-        clear_student_cache()
+        await run_in_pool("db_write", clear_student_cache)
         # Then, reset the database by clearing all specified tables
-        reset_result = delete_all_test_data()
+        reset_result = await run_in_pool("db_write", delete_all_test_data)
         return {"message": f"Database reset successfully"}
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         # If any exception occurs, raise an HTTPException
         raise HTTPException(status_code=500, detail=str(e))
@@ -526,6 +672,16 @@ async def reset_database():
 async def ping():
     return {"ping": "pong"}
 
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition of request, connection pool and executor metrics for this worker.
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/executors")
+async def api_get_executor_stats():
+    # This endpoint reports queue depth, wait and run times for each workload thread pool.
+    return executor_stats()
+
 @app.get("/robots933456.txt")
 async def robots_custom():
     # Log, handle or respond to this request as needed
@@ -0,0 +1,55 @@
+"""
+Checks the chat answer cache's near-duplicate matching on question pairs whose answers must
+never be shared, and on rewordings that may share one.
+
+    python tools/check_answer_cache.py
+
+Near-duplicate lookups are enabled for the check whatever CHAT_ANSWER_CACHE_CONFIG says.
+Exits with status 1 when a pair is matched, or not matched, against expectations.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import CHAT_ANSWER_CACHE_CONFIG
+from Backend.chatsystem.answer_cache import AnswerCache, normalize_question
+
+# (cached question, asked question, whether the cached answer may be served)
+CASES = [
+    ("Which of the following is a greenhouse gas in the atmosphere?",
+     "Which of the following is not a greenhouse gas in the atmosphere?", False),
+    ("Which of the following statements about mitosis is correct?",
+     "Which of the following statements about mitosis is incorrect?", False),
+    ("Which of the following is true about enzymes?",
+     "Which of the following is false about enzymes?", False),
+    ("All of the following are functions of the liver",
+     "All of the following are functions of the liver except", False),
+    ("Which halogen has the most electronegativity?",
+     "Which halogen has the least electronegativity?", False),
+    ("How many chromosomes are present in class 11 human cells?",
+     "How many chromosomes are present in class 12 human cells?", False),
+    ("Explain the structure of the human heart and its four chambers",
+     "Explain the structure of a human heart and its four chambers?", True),
+    ("Which of the following is a greenhouse gas in the atmosphere?",
+     "which of the following is a greenhouse gas in the atmosphere", True),
+]
+
+
+def main():
+    CHAT_ANSWER_CACHE_CONFIG["near_duplicates"] = True
+    failed = False
+    for cached, asked, expected in CASES:
+        cache = AnswerCache(max_entries=10, ttl_seconds=60)
+        cache.put("digest", normalize_question(cached), "cached answer")
+        answer, _ = cache.get("digest", normalize_question(asked))
+        served = answer is not None
+        status = "ok" if served == expected else "FAIL"
+        failed = failed or served != expected
+        print(f"{status:<5} {'served' if served else 'not served':<11} {cached!r} -> {asked!r}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Compares the two test generation engines of TEST_GENERATION_CONFIG ("python" and "database") on a
+loaded database (e.g. the synthetic dataset from tools/loadtest/generate_data.py).
+
+    DB_NAME=neet_load python tools/check_generation_parity.py [--runs 20] [--students 5] [--keep]
+
+Each engine generates the same number of practice and mock tests for the same sample students,
+starting from the same question_cache contents. Every generated test is checked for the
+invariants both engines must hold (questions per subject and section, no duplicate questions,
+questions from the right subject and active chapters, completion row and test instance). The
+selection itself is random, so the engines are compared statistically: the total variation distance
+between their shares of questions per chapter must stay within
+TEST_GENERATION_CONFIG["parity_max_chapter_distance"].
+
+Generated tests are deleted and the sample students' question_cache rows restored afterwards,
+unless --keep is given. Exits with status 1 when an invariant fails or the distributions differ.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import DB_CONFIG, TEST_GENERATION_CONFIG
+from Backend.practice.practice_test_management import generate_practice_test
+from Backend.mock.mock_test_management import generate_mock_test
+
+ENGINES = ("python", "database")
+
+
+def snapshot_question_cache(cur, students):
+    cur.execute("""
+        SELECT student_id, test_type, cached_questions::TEXT FROM question_cache WHERE student_id = ANY(%s)
+    """, (students,))
+    return cur.fetchall()
+
+
+def restore_question_cache(conn, students, snapshot):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM question_cache WHERE student_id = ANY(%s)", (students,))
+        for student_id, test_type, cached_questions in snapshot:
+            cur.execute("""
+                INSERT INTO question_cache (student_id, test_type, cached_questions) VALUES (%s, %s, %s::JSONB)
+            """, (student_id, test_type, cached_questions))
+    conn.commit()
+
+
+def generate(test_type, student_id):
+    """
+    :return: TestInstanceID of the generated test and an error message, if any.
+    """
+    if test_type == "practice":
+        result, error = generate_practice_test(student_id)
+        return (result or {}).get("testInstanceID"), error
+    result = generate_mock_test(student_id) or {}
+    return result.get("testInstanceID"), None if "testInstanceID" in result else result.get("message")
+
+
+def practice_questions(cur, test_instance_id):
+    cur.execute("""
+        SELECT PTS.SubjectName, NULL, Q.QuestionID, C.ChapterID, C.SubjectID, C.IsActive
+        FROM TestInstances TI
+        JOIN PracticeTestSubjects PTS ON PTS.PracticeTestID = TI.TestID
+        JOIN PracticeTestQuestions PTQ ON PTQ.PracticeTestSubjectID = PTS.PracticeTestSubjectID
+        JOIN Questions Q ON Q.QuestionID = PTQ.QuestionID
+        JOIN Chapters C ON C.ChapterID = Q.ChapterID
+        WHERE TI.TestInstanceID = %s
+    """, (test_instance_id,))
+    return cur.fetchall()
+
+
+def mock_questions(cur, test_instance_id):
+    cur.execute("""
+        SELECT C.SubjectID, MTQ.Section, Q.QuestionID, C.ChapterID, C.SubjectID, C.IsActive
+        FROM TestInstances TI
+        JOIN NEETMockTestQuestions MTQ ON MTQ.MockTestID = TI.TestID
+        JOIN Questions Q ON Q.QuestionID = MTQ.QuestionID
+        JOIN Chapters C ON C.ChapterID = Q.ChapterID
+        WHERE TI.TestInstanceID = %s
+    """, (test_instance_id,))
+    return cur.fetchall()
+
+
+def check_test(cur, test_type, test_instance_id, student_id):
+    """
+    :return: List of invariant violations and the ChapterIDs of the test's questions.
+    """
+    problems = []
+    cur.execute("SELECT TestType, TestID, StudentID FROM TestInstances WHERE TestInstanceID = %s", (test_instance_id,))
+    instance = cur.fetchone()
+    if not instance or instance[2] != student_id:
+        return [f"test instance {test_instance_id} missing"], []
+    expected_type, completion_table, id_column = (
+        ("Practice", "PracticeTestCompletion", "PracticeTestID") if test_type == "practice"
+        else ("Mock", "MockTestCompletion", "MockTestID"))
+    if instance[0] != expected_type:
+        problems.append(f"instance {test_instance_id} has TestType {instance[0]}")
+    cur.execute(f"SELECT IsCompleted FROM {completion_table} WHERE {id_column} = %s AND StudentID = %s",
+                (instance[1], student_id))
+    if cur.fetchone() != (False,):
+        problems.append(f"instance {test_instance_id} has no open {completion_table} row")
+
+    if test_type == "practice":
+        rows = practice_questions(cur, test_instance_id)
+        names = {details["name"]: subject_id for subject_id, details in TEST_GENERATION_CONFIG["practice_subjects"].items()}
+        expected = {(details["name"], None): details["total_questions"]
+                    for details in TEST_GENERATION_CONFIG["practice_subjects"].values()}
+        for name, _, question_id, _, subject_id, is_active in rows:
+            if names.get(name) != subject_id or not is_active:
+                problems.append(f"instance {test_instance_id}: question {question_id} is not an active {name} question")
+    else:
+        rows = mock_questions(cur, test_instance_id)
+        expected = {(subject_id, section): count
+                    for subject_id in TEST_GENERATION_CONFIG["mock_subject_ids"]
+                    for section, count in TEST_GENERATION_CONFIG["mock_section_questions"].items()}
+
+    counts = Counter((group, section) for group, section, *_ in rows)
+    if counts != Counter(expected):
+        problems.append(f"instance {test_instance_id}: questions per subject/section {dict(counts)}, expected {expected}")
+    question_ids = [row[2] for row in rows]
+    if len(set(question_ids)) != len(question_ids):
+        problems.append(f"instance {test_instance_id}: {len(question_ids) - len(set(question_ids))} duplicate questions")
+    return problems, [row[3] for row in rows]
+
+
+def chapter_distance(chapters_a, chapters_b):
+    """
+    Total variation distance between the chapter shares of two question samples (0 = identical, 1 = disjoint).
+    """
+    counts_a, counts_b = Counter(chapters_a), Counter(chapters_b)
+    total_a, total_b = sum(counts_a.values()) or 1, sum(counts_b.values()) or 1
+    return sum(abs(counts_a[c] / total_a - counts_b[c] / total_b) for c in counts_a.keys() | counts_b.keys()) / 2
+
+
+def delete_tests(conn, test_instance_ids):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT TestType, TestID FROM TestInstances WHERE TestInstanceID = ANY(%s)
+        """, (test_instance_ids,))
+        tests = cur.fetchall()
+        practice_ids = [test_id for test_type, test_id in tests if test_type == "Practice"]
+        mock_ids = [test_id for test_type, test_id in tests if test_type == "Mock"]
+        cur.execute("DELETE FROM TestInstances WHERE TestInstanceID = ANY(%s)", (test_instance_ids,))
+        cur.execute("""
+            DELETE FROM PracticeTestQuestions WHERE PracticeTestSubjectID IN (
+                SELECT PracticeTestSubjectID FROM PracticeTestSubjects WHERE PracticeTestID = ANY(%s))
+        """, (practice_ids,))
+        cur.execute("DELETE FROM PracticeTestSubjects WHERE PracticeTestID = ANY(%s)", (practice_ids,))
+        cur.execute("DELETE FROM PracticeTestCompletion WHERE PracticeTestID = ANY(%s)", (practice_ids,))
+        cur.execute("DELETE FROM PracticeTests WHERE PracticeTestID = ANY(%s)", (practice_ids,))
+        cur.execute("DELETE FROM NEETMockTestQuestions WHERE MockTestID = ANY(%s)", (mock_ids,))
+        cur.execute("DELETE FROM MockTestCompletion WHERE MockTestID = ANY(%s)", (mock_ids,))
+        cur.execute("DELETE FROM NEETMockTests WHERE MockTestID = ANY(%s)", (mock_ids,))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Python and database test generation engines.")
+    parser.add_argument("--runs", type=int, default=TEST_GENERATION_CONFIG["parity_runs"],
+                        help="Tests of each type generated per engine.")
+    parser.add_argument("--students", type=int, default=5, help="Sample students the tests are generated for.")
+    parser.add_argument("--test-type", choices=("practice", "mock", "both"), default="both")
+    parser.add_argument("--max-distance", type=float, default=TEST_GENERATION_CONFIG["parity_max_chapter_distance"])
+    parser.add_argument("--keep", action="store_true", help="Keep the generated tests and the updated question_cache.")
+    args = parser.parse_args()
+
+    test_types = ("practice", "mock") if args.test_type == "both" else (args.test_type,)
+    conn = psycopg2.connect(**DB_CONFIG)
+    configured_engine = TEST_GENERATION_CONFIG["engine"]
+    generated = []
+    failed = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT StudentID FROM TestInstances ORDER BY StudentID LIMIT %s", (args.students,))
+            students = [row[0] for row in cur.fetchall()] or list(range(1, args.students + 1))
+            snapshot = snapshot_question_cache(cur, students)
+        conn.commit()
+
+        for test_type in test_types:
+            chapters = {}
+            for engine in ENGINES:
+                TEST_GENERATION_CONFIG["engine"] = engine
+                restore_question_cache(conn, students, snapshot)
+                chapters[engine] = []
+                problems = []
+                started = time.perf_counter()
+                for run in range(args.runs):
+                    student_id = students[run % len(students)]
+                    test_instance_id, error = generate(test_type, student_id)
+                    if error or not test_instance_id:
+                        problems.append(f"generation failed for student {student_id}: {error}")
+                        continue
+                    generated.append(test_instance_id)
+                    with conn.cursor() as cur:
+                        test_problems, test_chapters = check_test(cur, test_type, test_instance_id, student_id)
+                    conn.commit()
+                    problems += test_problems
+                    chapters[engine] += test_chapters
+                elapsed = time.perf_counter() - started
+                print(f"{test_type:8} {engine:8} {args.runs} tests, {elapsed / args.runs * 1000:.1f} ms per test, "
+                      f"{len(problems)} invariant failures")
+                for problem in problems[:10]:
+                    print(f"    {problem}")
+                failed |= bool(problems)
+
+            distance = chapter_distance(chapters["python"], chapters["database"])
+            print(f"{test_type:8} chapter share distance {distance:.3f} (max {args.max_distance})")
+            failed |= distance > args.max_distance
+    finally:
+        TEST_GENERATION_CONFIG["engine"] = configured_engine
+        if not args.keep and generated:
+            conn.rollback()
+            delete_tests(conn, generated)
+            restore_question_cache(conn, students, snapshot)
+            print(f"Deleted {len(generated)} generated tests")
+        conn.close()
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
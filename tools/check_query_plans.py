@@ -0,0 +1,231 @@
+"""
+Checks the query plans of every SQL statement in the Backend package against a loaded database
+(e.g. the synthetic dataset from tools/loadtest/generate_data.py) and fails when a query plans a
+sequential scan of a large table.
+
+    DB_NAME=neet_load python tools/check_query_plans.py [--verbose]
+
+Statements are found statically: string literals (and module-level SQL constants) passed to
+cursor.execute/executemany or registered with register_statement(). f-string fragments are replaced by a parameter, which covers dynamic
+IN lists; statements that still cannot be prepared (dynamic table names, execute_values) are
+reported as skipped. Each statement is PREPAREd and its generic plan EXPLAINed, inside a
+transaction that is rolled back, so nothing is executed or written.
+
+Exits with status 1 when a plan scans a table with at least QUERY_PLAN_CONFIG["large_table_rows"]
+rows sequentially, unless the statement is listed in QUERY_PLAN_CONFIG["allowed_seq_scans"].
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import DB_CONFIG, QUERY_PLAN_CONFIG
+
+EXECUTE_METHODS = {"execute", "executemany"}
+PARAMETER = re.compile(r"%%|%\((\w+)\)s|%s")
+
+
+class QueryCollector(ast.NodeVisitor):
+    """
+    Collects (line, function, SQL) for the execute calls and registered statements of one module.
+    """
+
+    def __init__(self):
+        self.constants = {}
+        self.function = "<module>"
+        self.queries = []
+
+    def visit_Module(self, node):
+        for statement in node.body:
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+                text = self._sql_text(statement.value)
+                if text is not None:
+                    self.constants[statement.targets[0].id] = text
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        outer, self.function = self.function, node.name
+        self.generic_visit(node)
+        self.function = outer
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Attribute) and node.func.attr in EXECUTE_METHODS and node.args:
+            text = self._sql_text(node.args[0])
+            if text is not None and text.strip():
+                self.queries.append((node.lineno, self.function, text))
+        elif isinstance(node.func, ast.Name) and node.func.id == "register_statement" and len(node.args) == 2:
+            text = self._sql_text(node.args[1])
+            if text is not None:
+                self.queries.append((node.lineno, self.function, text))
+        self.generic_visit(node)
+
+    def _sql_text(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.constants.get(node.id)
+        if isinstance(node, ast.JoinedStr):
+            parts = []
+            for value in node.values:
+                if isinstance(value, ast.Constant):
+                    parts.append(value.value)
+                else:
+                    parts.append("%s")  # Dynamic IN lists and similar fragments
+            return "".join(parts)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            left, right = self._sql_text(node.left), self._sql_text(node.right)
+            if left is not None and right is not None:
+                return left + right
+        if isinstance(node, ast.Subscript):
+            # e.g. MERGE_STATISTICS_SQL[MERGE_STATISTICS_SQL.index("ON CONFLICT"):]
+            text = self._sql_text(node.value)
+            if text is not None and isinstance(node.slice, ast.Slice) and isinstance(node.slice.lower, ast.Call):
+                call = node.slice.lower
+                if isinstance(call.func, ast.Attribute) and call.func.attr == "index" and call.args \
+                        and isinstance(call.args[0], ast.Constant) and call.args[0].value in text:
+                    return text[text.index(call.args[0].value):]
+        return None
+
+
+def collect_queries(package_dir):
+    """
+    :return: List of (location, function, SQL) for every statement found under package_dir.
+    """
+    queries = []
+    for directory, _, files in os.walk(package_dir):
+        for file_name in sorted(files):
+            if not file_name.endswith(".py"):
+                continue
+            path = os.path.join(directory, file_name)
+            with open(path) as source:
+                tree = ast.parse(source.read(), path)
+            collector = QueryCollector()
+            collector.visit(tree)
+            relative = os.path.relpath(path, ROOT)
+            queries.extend((f"{relative}:{line}", f"{relative}:{function}", text) for line, function, text in collector.queries)
+    return queries
+
+
+def to_prepared(text):
+    """
+    Converts psycopg2 %s / %(name)s placeholders to $n. Returns (statement, parameter count).
+    """
+    names = {}
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(0) == "%%":
+            return "%"
+        name = match.group(1)
+        if name is not None:
+            if name not in names:
+                count += 1
+                names[name] = count
+            return f"${names[name]}"
+        count += 1
+        return f"${count}"
+
+    return PARAMETER.sub(replace, text).strip().rstrip(";"), count
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def large_tables(cur, min_rows):
+    cur.execute("""
+        SELECT C.relname, C.reltuples::BIGINT
+        FROM pg_class C JOIN pg_namespace N ON N.oid = C.relnamespace
+        WHERE N.nspname = current_schema() AND C.relkind IN ('r', 'p') AND C.reltuples >= %s
+    """, (min_rows,))
+    return dict(cur.fetchall())
+
+
+def check_plan(cur, text):
+    """
+    EXPLAINs the generic plan of one statement.
+
+    :return: (plan JSON, None) or (None, error message) when the statement cannot be prepared.
+    """
+    statement, parameter_count = to_prepared(text)
+    cur.execute("SAVEPOINT plan_check")
+    try:
+        cur.execute(f"PREPARE plan_check AS {statement}")
+        arguments = ", ".join(["NULL"] * parameter_count)
+        cur.execute(f"EXPLAIN (FORMAT JSON) EXECUTE plan_check{f'({arguments})' if parameter_count else ''}")
+        plan = cur.fetchone()[0][0]["Plan"]
+        cur.execute("DEALLOCATE plan_check")
+        cur.execute("RELEASE SAVEPOINT plan_check")
+        return plan, None
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT plan_check")
+        return None, str(e).strip().splitlines()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when Backend queries plan sequential scans of large tables.")
+    parser.add_argument("--package", default=os.path.join(ROOT, "Backend"))
+    parser.add_argument("--min-rows", type=int, default=QUERY_PLAN_CONFIG["large_table_rows"])
+    parser.add_argument("--verbose", action="store_true", help="Also list passing and skipped statements.")
+    args = parser.parse_args()
+
+    queries = collect_queries(args.package)
+    allowed = QUERY_PLAN_CONFIG["allowed_seq_scans"]
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    failures, skipped, passed = [], [], 0
+    try:
+        with conn.cursor() as cur:
+            tables = large_tables(cur, args.min_rows)
+            if not tables:
+                sys.exit(f"No table has {args.min_rows} rows; load the synthetic dataset first")
+            # The plan used for a prepared statement once its custom plans stop being cheaper
+            cur.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+
+            for location, function, text in queries:
+                plan, error = check_plan(cur, text)
+                if error:
+                    skipped.append((location, error))
+                    continue
+                scanned = sorted({node["Relation Name"] for node in _plan_nodes(plan)
+                                  if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables})
+                scanned = [table for table in scanned if table not in allowed.get(function, ())]
+                if scanned:
+                    failures.append((location, scanned, text, plan))
+                else:
+                    passed += 1
+                    if args.verbose:
+                        print(f"ok       {location}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if args.verbose:
+        for location, error in skipped:
+            print(f"skipped  {location}: {error}")
+    for location, scanned, text, plan in failures:
+        print(f"SEQ SCAN {location}: {', '.join(f'{table} ({tables[table]} rows)' for table in scanned)}")
+        print("    " + " ".join(text.split())[:300])
+        if args.verbose:
+            print(json.dumps(plan, indent=2))
+
+    print(f"{len(queries)} statements: {passed} ok, {len(failures)} with sequential scans of large tables, "
+          f"{len(skipped)} skipped (large tables: {', '.join(sorted(tables))})")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
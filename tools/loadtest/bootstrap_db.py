@@ -0,0 +1,119 @@
+"""
+Creates a local PostgreSQL database for load testing and applies Script.sql to it.
+
+The target database comes from the same DB_* environment variables the API reads
+(Backend/dbconfig/config.py), so the API, the data generator and this script all agree:
+
+    DB_HOST=localhost DB_PORT=5432 DB_USER=postgres DB_PASSWORD=postgres DB_NAME=neet_load \\
+        python tools/loadtest/bootstrap_db.py --drop
+
+DB_HOST and DB_NAME must be set explicitly: the config defaults point at production. The script
+refuses the production database name and non-local hosts unless --force-remote is given, and
+never drops a remote database that already holds questions.
+"""
+import argparse
+import os
+import sys
+
+import psycopg2
+from psycopg2 import sql
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import DB_CONFIG
+
+PRODUCTION_DATABASES = {"neuflolearndb"}
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+def is_local_host(host):
+    # A path is a Unix socket directory, i.e. a server on this machine
+    return host in LOCAL_HOSTS or host.startswith("/")
+
+
+def check_target(force_remote=False):
+    """
+    :return: Why DB_CONFIG must not be bootstrapped, or None if it may.
+    """
+    missing = [name for name in ("DB_HOST", "DB_NAME") if not os.getenv(name)]
+    if missing:
+        return f"Set {' and '.join(missing)} explicitly; the defaults point at the production database"
+    if force_remote:
+        return None
+    if DB_CONFIG["database"] in PRODUCTION_DATABASES:
+        return f"Refusing to bootstrap {DB_CONFIG['database']}, the production database name; pass --force-remote to override"
+    if not is_local_host(DB_CONFIG["host"]):
+        return f"Refusing to bootstrap a database on {DB_CONFIG['host']}, which is not local; pass --force-remote to override"
+    return None
+
+
+def _holds_questions():
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.OperationalError:
+        return False  # The database does not exist yet
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('questions') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                return False
+            cur.execute("SELECT EXISTS (SELECT 1 FROM Questions)")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def bootstrap(drop=False, force_remote=False, schema_path=os.path.join(ROOT, "Script.sql")):
+    """
+    Creates DB_CONFIG["database"] (dropping it first if asked) and applies the schema in one transaction.
+
+    :param force_remote: Allow a non-local host or the production database name (see check_target).
+    :return: True if the database was created.
+    """
+    refusal = check_target(force_remote)
+    if refusal:
+        print(refusal)
+        return False
+    database = DB_CONFIG["database"]
+    if drop and not is_local_host(DB_CONFIG["host"]) and _holds_questions():
+        print(f"Refusing to drop {database} on {DB_CONFIG['host']}: it already holds questions")
+        return False
+
+    admin_config = dict(DB_CONFIG, database="postgres")
+    admin = psycopg2.connect(**admin_config)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            if drop:
+                cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(database)))
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+            if cur.fetchone():
+                print(f"Database {database} already exists; use --drop to recreate it")
+                return False
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(database)))
+    finally:
+        admin.close()
+
+    with open(schema_path) as schema_file:
+        schema = schema_file.read()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(schema)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Created database {database} from {os.path.basename(schema_path)}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a load-test database from Script.sql.")
+    parser.add_argument("--drop", action="store_true", help="Drop the database first if it exists.")
+    parser.add_argument("--force-remote", action="store_true",
+                        help="Allow a non-local DB_HOST or the production database name.")
+    args = parser.parse_args()
+    if not bootstrap(drop=args.drop, force_remote=args.force_remote):
+        sys.exit(1)
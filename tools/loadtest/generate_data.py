@@ -0,0 +1,332 @@
+"""
+Fills a load-test database (see bootstrap_db.py) with a synthetic question bank and synthetic
+student activity, using COPY so millions of rows load in minutes.
+
+    DB_NAME=neet_load python tools/loadtest/generate_data.py --questions 100000 --students 5000 --tests-per-student 8
+
+Content: the four NEET subjects, --chapters-per-subject chapters with --subtopics-per-chapter
+subtopics each, --questions questions spread unevenly over chapters, and images for an
+--image-ratio share of them.
+
+Activity: per student, a random number of practice and mock tests around --tests-per-student,
+with questions, responses (from a per-student ability and per-question difficulty), completion
+rows, TestHistory and question_cache. Proficiency tables, mock weightage and the leaderboard are
+then derived in SQL. Generated test IDs start at --id-offset so they never collide with the IDs
+the API draws for new tests.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import DB_CONFIG
+
+SUBJECTS = {1: "Physics", 2: "Chemistry", 3: "Botany", 4: "Zoology"}
+# Practice tests combine Botany and Zoology as Biology
+PRACTICE_SUBJECTS = {"Physics": (1,), "Chemistry": (2,), "Biology": (3, 4)}
+PRACTICE_QUESTIONS_PER_SUBJECT = 30
+MOCK_SECTIONS = {"A": 35, "B": 15}
+IMAGE_CONTENT_TYPES = ["QUE", "EXP", "OptionA", "OptionB", "OptionC", "OptionD"]
+OPTIONS = ["a", "b", "c", "d"]
+WORDS = ("velocity acceleration molecule enzyme photosynthesis electron orbital reaction equilibrium "
+         "cell membrane nucleus chromosome mitosis meiosis force energy momentum current resistance "
+         "voltage wave frequency lens refraction isomer bond acid base salt oxidation reduction gene "
+         "protein tissue organ respiration digestion hormone ecosystem population species thermodynamics "
+         "entropy enthalpy kinetics pressure volume temperature gravity magnetic field charge").split()
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_rows(cur, table, columns, rows):
+    """
+    Loads rows into table with COPY FROM STDIN (text format).
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _sentence(rng, min_words, max_words):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).capitalize()
+
+
+def generate_content(cur, rng, chapters_per_subject, subtopics_per_chapter, total_questions, image_ratio):
+    """
+    Loads chapters, subtopics, questions and images.
+
+    :return: Dictionary of SubjectID to list of (QuestionID, ChapterID, SubtopicID, answer, difficulty).
+    """
+    chapters, subtopics = [], []
+    chapter_subject = {}
+    chapter_subtopics = {}
+    chapter_id = subtopic_id = 0
+    for subject_id, subject_name in SUBJECTS.items():
+        for number in range(1, chapters_per_subject + 1):
+            chapter_id += 1
+            chapters.append((chapter_id, subject_id, f"{subject_name} Chapter {number}: {_sentence(rng, 2, 4)}", number))
+            chapter_subject[chapter_id] = subject_id
+            chapter_subtopics[chapter_id] = []
+            for index in range(1, subtopics_per_chapter + 1):
+                subtopic_id += 1
+                subtopics.append((subtopic_id, chapter_id, f"{_sentence(rng, 2, 4)} {index}"))
+                chapter_subtopics[chapter_id].append(subtopic_id)
+    copy_rows(cur, "Chapters", ["ChapterID", "SubjectID", "ChapterTitle", "ChapterNumber"], chapters)
+    copy_rows(cur, "Subtopics", ["SubtopicID", "ChapterID", "SubtopicName"], subtopics)
+
+    # Uneven chapter sizes, like the real bank
+    chapter_ids = list(chapter_subject)
+    chapter_weights = [rng.paretovariate(1.5) for _ in chapter_ids]
+    question_chapters = rng.choices(chapter_ids, weights=chapter_weights, k=total_questions)
+
+    questions, images, bank = [], [], {subject_id: [] for subject_id in SUBJECTS}
+    question_numbers = {}
+    image_id = 0
+    for question_id, chapter in enumerate(question_chapters, start=1):
+        subtopic = rng.choice(chapter_subtopics[chapter]) if rng.random() < 0.9 else None
+        answer = rng.choice(OPTIONS)
+        has_image = rng.random() < image_ratio
+        question_numbers[chapter] = question_numbers.get(chapter, 0) + 1
+        questions.append((
+            question_id, chapter, subtopic, question_numbers[chapter],
+            _sentence(rng, 12, 60) + "?",
+            _sentence(rng, 1, 6), _sentence(rng, 1, 6), _sentence(rng, 1, 6), _sentence(rng, 1, 6),
+            f"{rng.randint(2000, 2023)}-01-01", answer, _sentence(rng, 20, 80), has_image
+        ))
+        if has_image:
+            for content_type in rng.sample(IMAGE_CONTENT_TYPES, rng.randint(1, 3)):
+                image_id += 1
+                images.append((image_id, question_id,
+                               f"https://example.invalid/neetimages/{SUBJECTS[chapter_subject[chapter]]}/Q{question_id}_{content_type}.jpg",
+                               content_type))
+        bank[chapter_subject[chapter]].append((question_id, chapter, subtopic, answer, rng.uniform(-0.25, 0.25)))
+
+    copy_rows(cur, "Questions", ["QuestionID", "ChapterID", "SubtopicID", "QuestionNo", "Question", "OptionA", "OptionB",
+                                 "OptionC", "OptionD", "Year", "Answer", "Explanation", "HasImage"], questions)
+    copy_rows(cur, "Images", ["ImageID", "QuestionID", "ImageURL", "ContentType"], images)
+    print(f"Loaded {len(chapters)} chapters, {len(subtopics)} subtopics, {len(questions)} questions, {len(images)} images")
+    return bank
+
+
+def _respond(rng, ability, question):
+    """
+    Returns (response, correct, answering time) for one question.
+    """
+    _, _, _, answer, difficulty = question
+    answering_time = max(5, int(rng.lognormvariate(4.0, 0.5)))
+    if rng.random() < 0.1:
+        return "", False, answering_time
+    if rng.random() < min(0.95, max(0.05, ability - difficulty)):
+        return answer, True, answering_time
+    return rng.choice([option for option in OPTIONS if option != answer]), False, answering_time
+
+
+def generate_activity(cur, rng, bank, students, tests_per_student, mock_share, days, id_offset, batch_size):
+    """
+    Loads test instances with their questions, responses and results, in batches of students.
+    """
+    now = datetime.now()
+    next_test_id = id_offset
+    next_subject_test_id = id_offset
+    totals = {"tests": 0, "responses": 0}
+
+    for first_student in range(1, students + 1, batch_size):
+        rows = {name: [] for name in ("PracticeTests", "PracticeTestSubjects", "PracticeTestQuestions", "PracticeTestCompletion",
+                                      "NEETMockTests", "NEETMockTestQuestions", "MockTestCompletion", "TestInstances",
+                                      "StudentResponses", "TestHistory", "question_cache")}
+        for student_id in range(first_student, min(first_student + batch_size, students + 1)):
+            ability = rng.uniform(0.3, 0.85)
+            served = {"practice": set(), "mock": set()}
+            for _ in range(rng.randint(0, 2 * tests_per_student)):
+                next_test_id += 1
+                test_id = instance_id = next_test_id
+                test_time = now - timedelta(seconds=rng.randint(0, days * 86400))
+                is_mock = rng.random() < mock_share
+
+                if is_mock:
+                    rows["NEETMockTests"].append((test_id, student_id))
+                    questions = []
+                    for subject_id in SUBJECTS:
+                        picked = rng.sample(bank[subject_id], min(len(bank[subject_id]), sum(MOCK_SECTIONS.values())))
+                        section_a = MOCK_SECTIONS["A"]
+                        for index, question in enumerate(picked):
+                            rows["NEETMockTestQuestions"].append((test_id, question[0], "A" if index < section_a else "B"))
+                        questions.extend(picked)
+                    rows["MockTestCompletion"].append((test_id, student_id, True, test_time + timedelta(hours=3)))
+                    rows["TestInstances"].append((instance_id, student_id, test_id, "Mock", test_time))
+                else:
+                    rows["PracticeTests"].append((test_id, student_id))
+                    questions = []
+                    for subject_name, subject_ids in PRACTICE_SUBJECTS.items():
+                        next_subject_test_id += 1
+                        rows["PracticeTestSubjects"].append((next_subject_test_id, test_id, subject_name, True))
+                        pool = [question for subject_id in subject_ids for question in bank[subject_id]]
+                        picked = rng.sample(pool, min(len(pool), PRACTICE_QUESTIONS_PER_SUBJECT))
+                        rows["PracticeTestQuestions"].extend((next_subject_test_id, question[0]) for question in picked)
+                        questions.extend(picked)
+                    rows["PracticeTestCompletion"].append((test_id, student_id, True, test_time + timedelta(hours=1)))
+                    rows["TestInstances"].append((instance_id, student_id, test_id, "Practice", test_time))
+
+                correct = incorrect = total_time = 0
+                response_time = test_time
+                for question in questions:
+                    response, is_correct, answering_time = _respond(rng, ability, question)
+                    response_time += timedelta(seconds=answering_time)
+                    rows["StudentResponses"].append((instance_id, student_id, question[0], response, answering_time,
+                                                     response_time, is_correct))
+                    correct += is_correct
+                    incorrect += bool(response) and not is_correct
+                    total_time += answering_time
+                    served["mock" if is_mock else "practice"].add(question[0])
+                rows["TestHistory"].append((instance_id, student_id, correct * 4 - incorrect, len(questions), correct, incorrect,
+                                            total_time / len(questions) if questions else None, response_time))
+                totals["tests"] += 1
+                totals["responses"] += len(questions)
+
+            for test_type, question_ids in served.items():
+                if question_ids:
+                    rows["question_cache"].append((student_id, test_type, json.dumps(sorted(question_ids))))
+
+        # Parents before children, for the foreign keys
+        copy_rows(cur, "PracticeTests", ["PracticeTestID", "StudentID"], rows["PracticeTests"])
+        copy_rows(cur, "PracticeTestSubjects", ["PracticeTestSubjectID", "PracticeTestID", "SubjectName", "IsCompleted"],
+                  rows["PracticeTestSubjects"])
+        copy_rows(cur, "PracticeTestQuestions", ["PracticeTestSubjectID", "QuestionID"], rows["PracticeTestQuestions"])
+        copy_rows(cur, "PracticeTestCompletion", ["PracticeTestID", "StudentID", "IsCompleted", "CompletionDate"],
+                  rows["PracticeTestCompletion"])
+        copy_rows(cur, "NEETMockTests", ["MockTestID", "StudentID"], rows["NEETMockTests"])
+        copy_rows(cur, "NEETMockTestQuestions", ["MockTestID", "QuestionID", "Section"], rows["NEETMockTestQuestions"])
+        copy_rows(cur, "MockTestCompletion", ["MockTestID", "StudentID", "IsCompleted", "CompletionDate"], rows["MockTestCompletion"])
+        copy_rows(cur, "TestInstances", ["TestInstanceID", "StudentID", "TestID", "TestType", "TestDateTime"], rows["TestInstances"])
+        copy_rows(cur, "StudentResponses", ["TestInstanceID", "StudentID", "QuestionID", "StudentResponse",
+                                            "AnsweringTimeInSeconds", "ResponseDate", "AnswerCorrect"], rows["StudentResponses"])
+        copy_rows(cur, "TestHistory", ["TestInstanceID", "StudentID", "Score", "QuestionsAttempted", "CorrectAnswers",
+                                       "IncorrectAnswers", "AverageAnsweringTimeInSeconds", "LastTestAttempt"], rows["TestHistory"])
+        copy_rows(cur, "question_cache", ["student_id", "test_type", "cached_questions"], rows["question_cache"])
+        print(f"  students {first_student}-{min(first_student + batch_size - 1, students)}: "
+              f"{totals['tests']} tests, {totals['responses']} responses so far")
+    return totals
+
+
+DERIVED_SQL = [
+    # Serial columns were loaded with explicit values
+    "SELECT setval(pg_get_serial_sequence('Chapters', 'chapterid'), COALESCE(MAX(ChapterID), 1)) FROM Chapters",
+    "SELECT setval(pg_get_serial_sequence('Subtopics', 'subtopicid'), COALESCE(MAX(SubtopicID), 1)) FROM Subtopics",
+    "SELECT setval(pg_get_serial_sequence('Questions', 'questionid'), COALESCE(MAX(QuestionID), 1)) FROM Questions",
+    "SELECT setval(pg_get_serial_sequence('Images', 'imageid'), COALESCE(MAX(ImageID), 1)) FROM Images",
+    "SELECT setval(pg_get_serial_sequence('PracticeTestSubjects', 'practicetestsubjectid'), COALESCE(MAX(PracticeTestSubjectID), 1)) FROM PracticeTestSubjects",
+    # Same weightage rule as the DO block in Script.sql
+    """
+    INSERT INTO MockTestChapterWeightage (ChapterID, SubjectID, Weightage)
+    SELECT C.ChapterID, C.SubjectID, COUNT(*)::NUMERIC * 100 / SUM(COUNT(*)) OVER (PARTITION BY C.SubjectID)
+    FROM Questions Q JOIN Chapters C ON C.ChapterID = Q.ChapterID
+    GROUP BY C.ChapterID, C.SubjectID
+    ON CONFLICT (ChapterID, SubjectID) DO UPDATE SET Weightage = EXCLUDED.Weightage
+    """,
+    """
+    INSERT INTO ChapterProficiency (StudentID, ChapterID, CorrectAnswers, IncorrectAnswers)
+    SELECT SR.StudentID, Q.ChapterID, COUNT(*) FILTER (WHERE SR.AnswerCorrect), COUNT(*) FILTER (WHERE NOT SR.AnswerCorrect)
+    FROM StudentResponses SR JOIN Questions Q ON Q.QuestionID = SR.QuestionID
+    GROUP BY SR.StudentID, Q.ChapterID
+    ON CONFLICT (StudentID, ChapterID) DO NOTHING
+    """,
+    """
+    INSERT INTO SubtopicProficiency (StudentID, SubtopicID, CorrectAnswers, IncorrectAnswers)
+    SELECT SR.StudentID, Q.SubtopicID, COUNT(*) FILTER (WHERE SR.AnswerCorrect), COUNT(*) FILTER (WHERE NOT SR.AnswerCorrect)
+    FROM StudentResponses SR JOIN Questions Q ON Q.QuestionID = SR.QuestionID
+    WHERE Q.SubtopicID IS NOT NULL
+    GROUP BY SR.StudentID, Q.SubtopicID
+    ON CONFLICT (StudentID, SubtopicID) DO NOTHING
+    """,
+    """
+    INSERT INTO PracticeTestProficiency (StudentID, AverageCorrectAnswers, AverageIncorrectAnswers, AverageScore,
+                                         AverageAnsweringTimeInSeconds, TotalTestsTaken, LastResponseDate)
+    SELECT TH.StudentID, AVG(TH.CorrectAnswers), AVG(TH.IncorrectAnswers), AVG(TH.Score),
+           AVG(TH.AverageAnsweringTimeInSeconds), COUNT(*), MAX(TH.LastTestAttempt)
+    FROM TestHistory TH JOIN TestInstances TI ON TI.TestInstanceID = TH.TestInstanceID
+    WHERE TI.TestType = 'Practice'
+    GROUP BY TH.StudentID
+    ON CONFLICT (StudentID) DO NOTHING
+    """,
+    """
+    INSERT INTO MockTestProficiency (StudentID, AverageCorrectAnswers, AverageIncorrectAnswers, AverageScore,
+                                     AverageAnsweringTimeInSeconds, TotalTestsTaken, LastResponseDate)
+    SELECT TH.StudentID, AVG(TH.CorrectAnswers), AVG(TH.IncorrectAnswers), AVG(TH.Score),
+           AVG(TH.AverageAnsweringTimeInSeconds), COUNT(*), MAX(TH.LastTestAttempt)
+    FROM TestHistory TH JOIN TestInstances TI ON TI.TestInstanceID = TH.TestInstanceID
+    WHERE TI.TestType = 'Mock'
+    GROUP BY TH.StudentID
+    ON CONFLICT (StudentID) DO NOTHING
+    """,
+    """
+    INSERT INTO MockTestLeaderboard (StudentID, Score)
+    SELECT StudentID, AverageScore FROM MockTestProficiency WHERE AverageScore IS NOT NULL
+    ON CONFLICT (StudentID) DO UPDATE SET Score = EXCLUDED.Score
+    """,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic question bank and student activity.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chapters-per-subject", type=int, default=25)
+    parser.add_argument("--subtopics-per-chapter", type=int, default=6)
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--image-ratio", type=float, default=0.15)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--tests-per-student", type=int, default=8, help="Average number of tests per student.")
+    parser.add_argument("--mock-share", type=float, default=0.3, help="Share of generated tests that are mock tests.")
+    parser.add_argument("--days", type=int, default=180, help="Spread test dates over this many past days.")
+    parser.add_argument("--id-offset", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=200, help="Students generated and loaded per COPY batch.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM Questions")
+            if cur.fetchone()[0]:
+                sys.exit("The database already has questions; recreate it with bootstrap_db.py --drop first")
+
+            bank = generate_content(cur, rng, args.chapters_per_subject, args.subtopics_per_chapter, args.questions, args.image_ratio)
+            conn.commit()
+            totals = generate_activity(cur, rng, bank, args.students, args.tests_per_student, args.mock_share,
+                                       args.days, args.id_offset, args.batch_size)
+            conn.commit()
+            for statement in DERIVED_SQL:
+                cur.execute(statement)
+            conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+
+    print(f"Generated {totals['tests']} tests and {totals['responses']} responses for {args.students} students "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Drives a running API with concurrent virtual students and reports per-endpoint latency.
+
+    python tools/loadtest/run_load.py --base-url http://localhost:8000 --users 50 --duration 120
+
+Each virtual user loops over a weighted mix of scenarios:
+
+- practice: generate a practice test, fetch its questions, submit all three subjects,
+  score them subject-wise and fetch the results
+- mock: generate a mock test, fetch its questions, submit answers and fetch the results
+- dashboard: test list, history, chapter/subtopic proficiency and leaderboard rank
+
+Student IDs are drawn from 1..--students, matching generate_data.py. The report lists count,
+errors, shed (503) requests, throughput and p50/p95/p99/max latency per endpoint; --output
+also writes it as JSON so runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+OPTIONS = ["a", "b", "c", "d"]
+PRACTICE_SUBJECT_CODES = {"Physics": 1, "Chemistry": 2, "Biology": 3}
+# Responses that are an expected outcome rather than a failure, per endpoint
+EXPECTED_STATUS = {"/leaderboard/rank": {404}}
+
+
+class LoadStats:
+    """
+    Collects latencies and errors per endpoint.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.shed = {}
+        self.statuses = {}
+
+    def record(self, endpoint, elapsed, status):
+        self.latencies.setdefault(endpoint, []).append(elapsed)
+        self.statuses.setdefault(endpoint, {}).setdefault(status, 0)
+        self.statuses[endpoint][status] += 1
+        if status == 503:
+            # Load shed by admission control or a saturated executor
+            self.shed[endpoint] = self.shed.get(endpoint, 0) + 1
+        elif status >= 400 and status not in EXPECTED_STATUS.get(endpoint, ()):
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, duration):
+        rows = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            rows.append({
+                "endpoint": endpoint,
+                "count": len(latencies),
+                "errors": self.errors.get(endpoint, 0),
+                "shed": self.shed.get(endpoint, 0),
+                "rps": round(len(latencies) / duration, 2),
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+                "max_ms": round(latencies[-1] * 1000, 1),
+                "statuses": {str(status): count for status, count in sorted(self.statuses[endpoint].items())}
+            })
+        return rows
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def call(client, stats, method, endpoint, **kwargs):
+    """
+    Issues one request and records its latency; returns the parsed JSON body or None on failure.
+    """
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, endpoint, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError:
+        response, status = None, 599
+    stats.record(endpoint, time.perf_counter() - start, status)
+    if response is None or status >= 400:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def _answer(rng):
+    """
+    Returns a simulated answer for one question; about one in ten questions is skipped.
+    """
+    if rng.random() < 0.1:
+        return {"answer": "", "time": rng.randint(5, 30)}
+    return {"answer": rng.choice(OPTIONS), "time": max(5, int(rng.lognormvariate(4.0, 0.5)))}
+
+
+async def practice_scenario(client, stats, rng, student_id, think_time):
+    test = await call(client, stats, "POST", "/generate-practice-test", json={"student_id": student_id})
+    if not test:
+        return
+    test_instance_id = test["testInstanceID"]
+    question_ids = await call(client, stats, "GET", "/practice-test/questions",
+                              params={"testInstanceID": test_instance_id, "student_id": student_id})
+    await call(client, stats, "POST", "/get-practice-test-questions",
+               json={"test_instance_id": test_instance_id, "student_id": student_id})
+    if not question_ids:
+        return
+
+    for subject, subject_code in PRACTICE_SUBJECT_CODES.items():
+        await asyncio.sleep(think_time * rng.random())
+        answers = {str(question_id): _answer(rng) for question_id in question_ids.get(subject, [])}
+        await call(client, stats, "POST", "/submit-practice-test-answers/",
+                   json={"student_id": student_id, "testInstanceID": test_instance_id,
+                         "subject_test_id": subject_code, "answers": answers})
+        await call(client, stats, "POST", "/calculate-practice-test-results-subjectwise/",
+                   json={"student_id": student_id, "test_instance_id": test_instance_id, "subject_code": subject_code})
+
+    await call(client, stats, "POST", "/test-results", json={"student_id": student_id, "test_instance_id": test_instance_id})
+
+
+async def mock_scenario(client, stats, rng, student_id, think_time):
+    test = await call(client, stats, "POST", "/generate-mock-test", json={"student_id": student_id})
+    if not test or "testInstanceID" not in test:
+        return
+    test_instance_id = test["testInstanceID"]
+    question_ids = await call(client, stats, "GET", "/get-mock-questions",
+                              params={"testInstanceID": test_instance_id, "student_id": student_id})
+    await call(client, stats, "POST", "/get-mock-test-questions",
+               json={"test_instance_id": test_instance_id, "student_id": student_id})
+    if not question_ids:
+        return
+
+    await asyncio.sleep(think_time * rng.random())
+    answers = {}
+    for subject, sections in question_ids["questions"].items():
+        for section, ids in sections.items():
+            for question_id in ids:
+                answers[f"{subject}_{section}_{question_id}"] = _answer(rng)
+    await call(client, stats, "POST", "/submit-mock-test-answers",
+               json={"student_id": student_id, "testInstanceID": test_instance_id, "data": answers})
+    await call(client, stats, "POST", "/test-results", json={"student_id": student_id, "test_instance_id": test_instance_id})
+
+
+async def dashboard_scenario(client, stats, rng, student_id, think_time):
+    params = {"student_id": student_id}
+    await call(client, stats, "GET", "/list-tests", params={**params, "limit": 20})
+    await call(client, stats, "GET", "/student-test-history", params={**params, "limit": 20})
+    await call(client, stats, "GET", "/chapter-proficiency", params=params)
+    await call(client, stats, "GET", "/subtopic-proficiency", params=params)
+    await call(client, stats, "GET", "/leaderboard/rank", params=params)
+    await call(client, stats, "GET", "/get-chapter-names/", params={"subjectID": rng.randint(1, 3)})
+
+
+SCENARIOS = {
+    "practice": practice_scenario,
+    "mock": mock_scenario,
+    "dashboard": dashboard_scenario,
+}
+
+
+async def virtual_user(client, stats, seed, args, deadline):
+    rng = random.Random(seed)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    while time.monotonic() < deadline:
+        scenario = SCENARIOS[rng.choices(names, weights=weights)[0]]
+        await scenario(client, stats, rng, rng.randint(1, args.students), args.think_time)
+        await asyncio.sleep(args.think_time * rng.random())
+
+
+async def run(args):
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.monotonic()
+        deadline = start + args.duration
+        users = []
+        for user in range(args.users):
+            users.append(asyncio.create_task(virtual_user(client, stats, args.seed + user, args, deadline)))
+            await asyncio.sleep(args.ramp_up / max(1, args.users))
+        await asyncio.gather(*users)
+        duration = time.monotonic() - start
+    return stats.report(duration), duration
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a scenario-based load test against the API.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="Number of concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=60, help="Test duration in seconds.")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which users are started.")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Maximum pause between steps, in seconds.")
+    parser.add_argument("--students", type=int, default=5000, help="Student IDs are drawn from 1..students.")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("practice=2,mock=1,dashboard=4"),
+                        help="Scenario weights, e.g. practice=2,mock=1,dashboard=4.")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    rows, duration = asyncio.run(run(args))
+
+    print(f"{'endpoint':<48}{'count':>8}{'errors':>8}{'shed':>8}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for row in rows:
+        print(f"{row['endpoint']:<48}{row['count']:>8}{row['errors']:>8}{row['shed']:>8}{row['rps']:>8}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+    print(f"{sum(row['count'] for row in rows)} requests in {duration:.1f}s with {args.users} users")
+
+    if args.output:
+        with open(args.output, "w") as report_file:
+            json.dump({"users": args.users, "duration": duration, "mix": args.mix, "endpoints": rows}, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
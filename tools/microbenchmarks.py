@@ -0,0 +1,402 @@
+"""
+Microbenchmarks for the hot pure-Python paths of test generation, grading and payload assembly.
+
+Every case runs against an in-memory fake cursor, so no database is needed, with fixed-seed
+synthetic inputs at several sizes. Results are saved as JSON and can be compared against a
+saved baseline:
+
+    python tools/microbenchmarks.py run --save baseline
+    python tools/microbenchmarks.py run --save current [--filter selection]
+    python tools/microbenchmarks.py compare baseline current [--threshold 0.10]
+
+`compare` exits with status 1 when a case's median got slower than the baseline by more than
+MICROBENCHMARK_CONFIG["regression_threshold"].
+
+tools/benchmark_results/baseline.json is a reference run; its "machine" and "commit" fields
+say where it came from. Timings only compare on the same machine, so on another one re-run
+`run --save baseline` on the commit you are comparing against (git stash or a worktree), then
+measure your change with `run --save current`. Commit a refreshed baseline.json together with
+changes that are meant to move the numbers.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+from psycopg2.extensions import adapt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import MICROBENCHMARK_CONFIG, SHARED_CACHE_CONFIG
+from Backend.mock import mock_test_management
+from Backend.practice import practice_test_management
+from Backend.testmanagement import question_bank, student_proficiency, test_result_calculation
+
+SEED = 1234
+OPTIONS = ["a", "b", "c", "d"]
+
+
+class FakeCursor:
+    """
+    Minimal DB-API cursor answering queries from in-memory handlers.
+
+    :param handlers: List of (query substring, function of params returning rows); the first
+                     handler whose substring occurs in the query answers it. Unmatched
+                     queries return no rows.
+    """
+
+    def __init__(self, handlers=()):
+        self.handlers = handlers
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, query, params=None):
+        for pattern, handler in self.handlers:
+            if pattern in query:
+                self._rows = list(handler(params))
+                break
+        else:
+            self._rows = []
+        self.rowcount = len(self._rows)
+
+    def executemany(self, query, params_list):
+        for params in params_list:
+            self.execute(query, params)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def mogrify(self, query, params):
+        # Client-side quoting as psycopg2 does it, minus the connection encoding
+        return (query % tuple(adapt(value).getquoted().decode() for value in params)).encode()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeConnection:
+    def __init__(self, handlers=()):
+        self.handlers = handlers
+
+    def cursor(self):
+        return FakeCursor(self.handlers)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@contextlib.contextmanager
+def fake_database(handlers, *modules):
+    """
+    Makes create_pg_connection in each module hand out a FakeConnection serving handlers.
+    The shared cache tier is off meanwhile, so every call runs the code under test.
+    """
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.dict(SHARED_CACHE_CONFIG, enabled=False))
+        for module in modules:
+            stack.enter_context(mock.patch.object(module, "create_pg_connection", lambda pool: FakeConnection(handlers)))
+            stack.enter_context(mock.patch.object(module, "release_pg_connection", lambda pool, conn: None))
+        yield
+
+
+BENCHMARKS = {}
+
+
+def benchmark(sizes):
+    """
+    Registers a benchmark case. The decorated function receives (size, rng) and returns
+    (callable, context manager); the callable is timed while the context is active.
+    """
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, sizes)
+        return setup
+    return register
+
+
+def _question_bank(rng, questions, chapters):
+    """
+    Returns a dict of QuestionID to ChapterID with uneven chapter sizes.
+    """
+    weights = [rng.paretovariate(1.5) for _ in range(chapters)]
+    chapter_ids = rng.choices(range(1, chapters + 1), weights=weights, k=questions)
+    return {question_id: chapter_id for question_id, chapter_id in enumerate(chapter_ids, start=1)}
+
+
+def _chapter_lookup_handler(bank):
+    return "SELECT QuestionID, ChapterID FROM Questions WHERE QuestionID IN", \
+        lambda params: [(question_id, bank[question_id]) for question_id in params if question_id in bank]
+
+
+@benchmark(sizes=[100, 1000, 10000])
+def evaluate_response(size, rng):
+    """Grading a test's worth of responses (size = responses)."""
+    pairs = []
+    for _ in range(size):
+        answer = rng.choice(OPTIONS)
+        response = rng.choice(OPTIONS + [" A ", "", "na", None])
+        pairs.append((response, answer))
+
+    def run():
+        for response, answer in pairs:
+            test_result_calculation.evaluate_response(response, answer)
+    return run, contextlib.nullcontext()
+
+
+@benchmark(sizes=[1000, 10000, 50000])
+def weighted_question_selection(size, rng):
+    """Mock-test section selection from a candidate pool (size = candidate questions)."""
+    bank = _question_bank(rng, size, 25)
+    weightage = {chapter_id: 4.0 for chapter_id in range(1, 26)}
+    used_questions = set(rng.sample(list(bank), size // 10))
+
+    def run():
+        mock_test_management.weighted_question_selection(list(bank), weightage, 35, used_questions)
+    return run, fake_database([_chapter_lookup_handler(bank)], mock_test_management)
+
+
+@benchmark(sizes=[2000, 10000, 40000])
+def select_questions(size, rng):
+    """Practice-test subject selection over 25 chapters (size = questions in the subject)."""
+    bank = _question_bank(rng, size, 25)
+    by_chapter = {}
+    for question_id, chapter_id in bank.items():
+        by_chapter.setdefault(chapter_id, []).append((question_id,))
+    used_questions = set(rng.sample(list(bank), size // 10))
+    chapters = list(range(1, 26))
+    weightage = {str(chapter_id): 4.0 for chapter_id in chapters}  # JSONB keys come back as strings
+    cursor = FakeCursor([("FROM Questions q", lambda params: by_chapter.get(params[0], []))])
+    handlers = [
+        ("FROM StudentChapterWeightage", lambda params: [(weightage,)]),
+        _chapter_lookup_handler(bank)
+    ]
+
+    def run():
+        practice_test_management.select_questions(cursor, chapters, used_questions, 30, 1, 1)
+    return run, fake_database(handlers, practice_test_management)
+
+
+@benchmark(sizes=[90, 200, 1000])
+def update_proficiency_bulk(size, rng):
+    """Building the bulk proficiency UPDATE/INSERT (size = scored responses)."""
+    data = [(1, rng.randint(1, 100), rng.random() < 0.6) for _ in range(size)]
+    cursor = FakeCursor()
+
+    def run():
+        test_result_calculation.update_proficiency_bulk(cursor, data, "ChapterProficiency", "ChapterID")
+    return run, mock.patch("builtins.print")
+
+
+@benchmark(sizes=[50, 100, 400])
+def calculate_chapterwise_report(size, rng):
+    """Strengths/weaknesses post-processing (size = chapters with responses)."""
+    rows = []
+    for chapter in range(size):
+        total = rng.randint(1, 200)
+        correct = rng.randint(0, total)
+        rows.append((rng.choice(["Physics", "Chemistry", "Biology"]), f"Chapter {chapter}", correct, total - correct, total))
+    handlers = [("FROM AllStudentResponses sr", lambda params: rows)]
+
+    def run():
+        student_proficiency.calculate_chapterwise_report(1)
+    return run, fake_database(handlers, student_proficiency)
+
+
+@benchmark(sizes=[200, 1000])
+def get_mock_test_questions(size, rng):
+    """Question dict assembly for a mock test from the question bank snapshot (size = questions; 200 is a full NEET mock)."""
+    rows = []
+    payloads = []
+    for question_id in range(1, size + 1):
+        has_image = rng.random() < 0.15
+        rows.append((rng.choice(["Physics", "Chemistry", "Botany", "Zoology"]), rng.choice("AB"), question_id))
+        images = [{"URL": f"https://example.invalid/Q{question_id}_{kind}.jpg", "Type": kind}
+                  for kind in rng.sample(["QUE", "EXP", "OptionA"], rng.randint(1, 2))] if has_image else []
+        payloads.append((question_id, {
+            "Question": "Question text " * rng.randint(5, 40),
+            "Options": {"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"},
+            "Answer": "a", "Explanation": "Explanation " * rng.randint(5, 40), "HasImage": has_image, "Images": images
+        }))
+    rows.sort()
+    handlers = [
+        ("FROM TestInstances", lambda params: [("Mock", 1)]),
+        ("FROM NEETMockTestQuestions mtq", lambda params: rows)
+    ]
+    return lambda: mock_test_management.get_mock_test_questions(1, 1), _question_bank_snapshot(payloads, handlers)
+
+
+@contextlib.contextmanager
+def _question_bank_snapshot(payloads, handlers):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "question_bank.snapshot")
+        question_bank.write_snapshot(path, 1, payloads)
+        snapshot = question_bank.QuestionBankSnapshot(path)
+        with fake_database(handlers, mock_test_management), \
+                mock.patch.object(question_bank, "get_snapshot", lambda cur=None: snapshot):
+            yield
+
+
+def _measure(func, rounds, min_round_seconds):
+    """
+    Times func like timeit: calibrates a loop count so one round lasts at least
+    min_round_seconds, then runs the rounds and returns per-call statistics in seconds.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - start >= min_round_seconds:
+            break
+        loops *= 2
+
+    timings = []
+    for _ in range(rounds):
+        random.seed(SEED)   # The code under test draws from the global generator
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+
+    return {
+        "min": min(timings),
+        "max": max(timings),
+        "mean": statistics.mean(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "median": statistics.median(timings),
+        "rounds": rounds,
+        "loops": loops
+    }
+
+
+def run_benchmarks(name_filter=None, rounds=None, min_round_seconds=None):
+    """
+    Runs the registered benchmarks.
+
+    :param name_filter: Only run cases whose name contains this string.
+    :return: Dictionary of "case[size]" to timing statistics.
+    """
+    rounds = rounds or MICROBENCHMARK_CONFIG["rounds"]
+    min_round_seconds = min_round_seconds or MICROBENCHMARK_CONFIG["min_round_seconds"]
+    results = {}
+    for name, (setup, sizes) in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        for size in sizes:
+            func, context = setup(size, random.Random(SEED))
+            with context:
+                stats = _measure(func, rounds, min_round_seconds)
+            key = f"{name}[{size}]"
+            results[key] = stats
+            print(f"{key:<45}median {stats['median'] * 1e6:>12.1f} us   stddev {stats['stddev'] * 1e6:>10.1f} us   "
+                  f"({stats['rounds']} rounds x {stats['loops']} loops)")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def _results_path(name):
+    if name.endswith(".json") or os.sep in name:
+        return name
+    return os.path.join(ROOT, MICROBENCHMARK_CONFIG["results_dir"], f"{name}.json")
+
+
+def save_results(name, results):
+    path = _results_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as results_file:
+        json.dump({
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor()},
+            "commit": _git_commit(),
+            "datetime": datetime.now().isoformat(timespec="seconds"),
+            "benchmarks": results
+        }, results_file, indent=2)
+    print(f"Saved {len(results)} results to {path}")
+
+
+def compare_results(baseline_name, current_name, threshold):
+    """
+    Prints the median change per case and returns the cases that regressed beyond threshold.
+    """
+    with open(_results_path(baseline_name)) as baseline_file:
+        baseline = json.load(baseline_file)["benchmarks"]
+    with open(_results_path(current_name)) as current_file:
+        current = json.load(current_file)["benchmarks"]
+
+    regressions = []
+    print(f"{'benchmark':<45}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    for key in list(baseline) + [key for key in current if key not in baseline]:
+        if key not in baseline or key not in current:
+            print(f"{key:<45}{'only in ' + ('baseline' if key in baseline else 'current'):>38}")
+            continue
+        before, after = baseline[key]["median"], current[key]["median"]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<45}{before * 1e6:>14.1f}{after * 1e6:>14.1f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and compare the fake-cursor microbenchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("--filter", help="Only run cases whose name contains this string.")
+    run_parser.add_argument("--rounds", type=int, default=MICROBENCHMARK_CONFIG["rounds"])
+    run_parser.add_argument("--min-round-seconds", type=float, default=MICROBENCHMARK_CONFIG["min_round_seconds"])
+    run_parser.add_argument("--save", help="Save the results under this name (or .json path).")
+
+    compare_parser = commands.add_parser("compare", help="Compare two saved result sets.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=MICROBENCHMARK_CONFIG["regression_threshold"])
+
+    commands.add_parser("list", help="List the benchmark cases.")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, (setup, sizes) in BENCHMARKS.items():
+            print(f"{name:<30}{str(sizes):<22}{setup.__doc__}")
+    elif args.command == "run":
+        results = run_benchmarks(args.filter, args.rounds, args.min_round_seconds)
+        if args.save:
+            save_results(args.save, results)
+    else:
+        regressions = compare_results(args.baseline, args.current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Applies pending SQL migrations from migrations/ to the database in DB_CONFIG, in file name order,
+and records each one in SchemaMigrations.
+
+    python tools/migrate.py            # apply pending migrations
+    python tools/migrate.py --status   # list applied and pending migrations
+
+A migration normally runs in a single transaction. A file whose first line is
+`-- migrate: no-transaction` runs statement by statement in autocommit mode instead, which
+CREATE INDEX CONCURRENTLY requires; such files must be safe to re-run (IF NOT EXISTS).
+"""
+import argparse
+import os
+import sys
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Backend.dbconfig.config import DB_CONFIG
+
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+
+def list_migrations(migrations_dir=MIGRATIONS_DIR):
+    """
+    :return: List of (version, path) sorted by version.
+    """
+    return [(file_name[:-4], os.path.join(migrations_dir, file_name))
+            for file_name in sorted(os.listdir(migrations_dir)) if file_name.endswith(".sql")]
+
+
+def _statements(sql):
+    # Migrations that run outside a transaction hold plain DDL only, one statement per ';'
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def applied_versions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            Version TEXT PRIMARY KEY,
+            AppliedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT Version FROM SchemaMigrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def apply_migration(conn, version, path):
+    with open(path) as migration_file:
+        sql = migration_file.read()
+
+    if sql.startswith(NO_TRANSACTION):
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in _statements(sql):
+                    cur.execute(statement)
+                cur.execute("INSERT INTO SchemaMigrations (Version) VALUES (%s) ON CONFLICT (Version) DO NOTHING", (version,))
+        finally:
+            conn.autocommit = False
+    else:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute("INSERT INTO SchemaMigrations (Version) VALUES (%s)", (version,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending SQL migrations.")
+    parser.add_argument("--status", action="store_true", help="Only list applied and pending migrations.")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            applied = applied_versions(cur)
+        conn.commit()
+
+        pending = [(version, path) for version, path in list_migrations() if version not in applied]
+        if args.status:
+            for version, _ in list_migrations():
+                print(f"{'applied' if version in applied else 'pending'}  {version}")
+            return
+
+        for version, path in pending:
+            print(f"Applying {version}...")
+            apply_migration(conn, version, path)
+        print(f"{len(pending)} migration(s) applied" if pending else "Database is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures how long a fresh interpreter takes to import the API (service.py), using
+`python -X importtime`, and reports the slowest modules.
+
+Exits with status 1 when the import takes longer than STARTUP_CONFIG["import_budget_seconds"],
+so it can gate CI and deployments:
+
+    python tools/startup_benchmark.py [--runs 3] [--budget 1.0] [--module service]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.dbconfig.config import STARTUP_CONFIG
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def measure_import(module):
+    """
+    Imports module in a fresh interpreter with -X importtime.
+
+    :return: Dictionary of module name to (self microseconds, cumulative microseconds, depth).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure and budget the import time of the API.")
+    parser.add_argument("--module", default="service")
+    parser.add_argument("--runs", type=int, default=3, help="Number of fresh interpreters; the fastest run is reported.")
+    parser.add_argument("--budget", type=float, default=STARTUP_CONFIG["import_budget_seconds"])
+    parser.add_argument("--top", type=int, default=STARTUP_CONFIG["report_top_modules"])
+    args = parser.parse_args()
+
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda timings: timings[args.module][1])
+    total_seconds = best[args.module][1] / 1e6
+
+    # Top-level packages (depth 1 below the measured module) show where import time goes
+    print(f"Slowest imports of {args.module} (cumulative ms):")
+    children = [(name, timing) for name, timing in best.items() if timing[2] == 1]
+    for name, (_, cumulative_us, _) in sorted(children, key=lambda item: item[1][1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f}  {name}")
+
+    print(f"Import of {args.module}: {total_seconds:.3f}s (best of {args.runs}), budget {args.budget:.3f}s")
+    if total_seconds > args.budget:
+        print("Startup budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()